@@ -0,0 +1,53 @@
+# bench_ann.py
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+
+from vector_store.ann import ANN_INDEX_TYPES, build_ann_index, factory_string, recall_report
+
+
+def load_vectors(path: str, n: int, dim: int) -> np.ndarray:
+    """
+    Vectors of a saved flat index (a directory written by save_faiss_index), or clustered synthetic vectors.
+    """
+    if path:
+        index = faiss.read_index(os.path.join(path, "index.faiss"))
+        return index.reconstruct_n(0, min(n, index.ntotal)) if n else index.reconstruct_n(0, index.ntotal)
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=3.0, size=(max(1, n // 1000), dim))
+    return (centers[rng.integers(len(centers), size=n)] + rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build time, size, recall@k and latency of FAISS index types")
+    parser.add_argument("--index", default="", help="saved flat index directory to take vectors from (default: synthetic)")
+    parser.add_argument("--n", type=int, default=200_000, help="number of vectors (0 = all of --index)")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(ANN_INDEX_TYPES), choices=ANN_INDEX_TYPES)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.index, args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=args.queries, replace=False)]
+    queries = queries + rng.normal(scale=0.05 * float(vectors.std()), size=queries.shape).astype(np.float32)
+    print(f"{len(vectors)} vectors of dim {vectors.shape[1]}, {len(queries)} queries")
+
+    for index_type in args.types:
+        start = time.perf_counter()
+        index = build_ann_index(vectors, index_type)
+        build_s = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+        print(f"\n{index_type} ({factory_string(index_type, vectors.shape[1], len(vectors))}): "
+              f"built in {build_s:.1f}s, {size_mb:.0f} MB")
+        for row in recall_report(index, vectors, queries, k=args.k):
+            params = ", ".join(f"{name}={value}" for name, value in row.items() if name in ("nprobe", "ef_search"))
+            print(f"  {params or 'exact':<16} recall@{args.k} {row[f'recall@{args.k}']:.3f}  {row['ms_per_query']:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
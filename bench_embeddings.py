@@ -0,0 +1,58 @@
+# bench_embeddings.py
+import argparse
+import itertools
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from config import EMBEDDING_MODEL_NAME
+from embeddings.pool import EmbeddingPool
+from ingestion.document_store import DocumentStore
+
+
+def load_texts(path: str, limit: int) -> List[str]:
+    """
+    Texts to embed: page contents streamed from a DocumentStore, or synthetic texts of mixed length.
+    """
+    if path:
+        with DocumentStore(path) as store:
+            return list(itertools.islice((doc.page_content for doc in store if doc.page_content.strip()), limit))
+    rng = random.Random(0)
+    words = "инцидент проблема изменение услуга конфигурация incident problem change service request".split()
+    return [" ".join(rng.choices(words, k=rng.randint(5, 400))) for _ in range(limit)]
+
+
+def bench(name: str, embed, texts: List[str]) -> np.ndarray:
+    start = time.perf_counter()
+    vectors = np.asarray(embed(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(texts) / elapsed:10.1f} texts/s  ({elapsed:.1f}s)")
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-process embedding with the multi-process EmbeddingPool")
+    parser.add_argument("--docstore", default="", help="DocumentStore directory (default: synthetic texts)")
+    parser.add_argument("--n", type=int, default=2000, help="number of texts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = load_texts(args.docstore, args.n)
+    print(f"{len(texts)} texts, model {EMBEDDING_MODEL_NAME}")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    baseline = bench("HuggingFaceEmbeddings", HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME).embed_documents, texts)
+    for n_workers in args.workers:
+        pool = EmbeddingPool(EMBEDDING_MODEL_NAME, n_workers=n_workers, batch_size=args.batch_size)
+        # Start every worker and load its model before timing.
+        pool.embed_documents(["warm up"] * n_workers * args.batch_size)
+        vectors = bench(f"EmbeddingPool x{n_workers}", pool.embed_documents_array, texts)
+        print(f"{'':<28} max |diff| vs baseline: {np.abs(vectors - baseline).max():.2e}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
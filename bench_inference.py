@@ -0,0 +1,73 @@
+# bench_inference.py
+import argparse
+import time
+
+import numpy as np
+
+from config import EMBEDDING_MODEL_NAME, RERANKING_MODEL
+from embeddings.quantized import (
+    INFERENCE_BACKENDS,
+    PARITY_PASSAGES,
+    PARITY_QUERIES,
+    embedding_parity,
+    load_cross_encoder,
+    load_embeddings,
+    ranking_parity,
+)
+
+
+def latency_ms(func, repeats: int) -> tuple:
+    """
+    p50 / p99 of func() in milliseconds, after one warm-up call.
+    """
+    func()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(times, 50)), float(np.percentile(times, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU latency and fp32 parity of the embedder and reranker backends")
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS), choices=INFERENCE_BACKENDS)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=32, help="texts per embedding batch")
+    parser.add_argument("--candidates", type=int, default=20, help="passages per reranked query")
+    args = parser.parse_args()
+
+    query = PARITY_QUERIES[0]
+    batch = (PARITY_PASSAGES * args.batch)[:args.batch]
+    candidates = [(query, passage) for passage in (PARITY_PASSAGES * args.candidates)[:args.candidates]]
+    pairs = [[(q, passage) for passage in PARITY_PASSAGES] for q in PARITY_QUERIES]
+    print(f"embedder {EMBEDDING_MODEL_NAME}, reranker {RERANKING_MODEL}")
+
+    reference_vectors = reference_scores = None
+    for backend in args.backends:
+        start = time.perf_counter()
+        embeddings = load_embeddings(EMBEDDING_MODEL_NAME, backend, model_kwargs={"device": "cpu"})
+        reranker = load_cross_encoder(RERANKING_MODEL, backend)
+        load_s = time.perf_counter() - start
+
+        query_p50, query_p99 = latency_ms(lambda: embeddings.embed_query(query), args.repeats)
+        batch_p50, _ = latency_ms(lambda: embeddings.embed_documents(batch), max(1, args.repeats // 4))
+        rerank_p50, rerank_p99 = latency_ms(lambda: list(reranker.score(candidates)), args.repeats)
+
+        vectors = np.asarray(embeddings.embed_documents(PARITY_PASSAGES))
+        scores = [list(reranker.score(p)) for p in pairs]
+        if reference_vectors is None:
+            # The first backend (torch by default) is the reference.
+            reference_vectors, reference_scores = vectors, scores
+        cosine = embedding_parity(reference_vectors, vectors)
+        ranking = ranking_parity(reference_scores, scores)
+        print(f"\n{backend} (loaded in {load_s:.1f}s)")
+        print(f"  query embedding   p50 {query_p50:7.1f} ms  p99 {query_p99:7.1f} ms")
+        print(f"  {args.batch} texts          p50 {batch_p50:7.1f} ms")
+        print(f"  rerank {args.candidates:>3} pairs   p50 {rerank_p50:7.1f} ms  p99 {rerank_p99:7.1f} ms")
+        print(f"  parity: min cosine {cosine['min_cosine']:.5f}, rerank top-1 {ranking['top1_agreement']:.2f}, "
+              f"Spearman {ranking['mean_spearman']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_query_service.py
+import argparse
+import asyncio
+import tempfile
+import time
+
+import numpy as np
+
+from query_service.api import RetrievalService, create_app, load_service
+
+
+def synthetic_service(n_docs: int, dim: int, embed_ms: float, embed_item_ms: float) -> RetrievalService:
+    """
+    A flat index of random vectors and a stand-in embedder that costs embed_ms per call plus
+    embed_item_ms per query, like a transformer forward pass on CPU.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents.base import Document
+    from vector_store.docstore import SQLiteDocstore, SQLiteIdMap
+    from vector_store.streaming import build_index_streaming
+
+    def embed(texts):
+        time.sleep((embed_ms + embed_item_ms * len(texts)) / 1000)
+        return np.asarray([np.random.default_rng(abs(hash(text)) % 2 ** 32).standard_normal(dim) for text in texts],
+                          dtype=np.float32)
+
+    path = tempfile.mkdtemp()
+    docs = (Document(page_content=f"doc {i}", metadata={"i": i}) for i in range(n_docs))
+    build_index_streaming(docs, path, lambda texts: np.random.default_rng(len(texts)).standard_normal((len(texts), dim)),
+                          index_type="flat")
+    docstore = SQLiteDocstore(f"{path}/docstore.sqlite", read_only=True)
+    store = FAISS(embedding_function=None, index=faiss.read_index(f"{path}/index.faiss"), docstore=docstore,
+                  index_to_docstore_id=SQLiteIdMap(docstore))
+    return RetrievalService({"synthetic": store}, embed)
+
+
+async def load_test(service: RetrievalService, clients: int, requests: int, k: int) -> dict:
+    """
+    `clients` concurrent callers send `requests` searches in total through the ASGI app, in-process.
+    """
+    app = create_app(lambda: service)
+    remaining = iter(range(requests))
+
+    async def client():
+        for i in remaining:
+            body = f'{{"query": "benchmark query {i}", "k": {k}}}'.encode()
+            messages = [{"type": "http.request", "body": body}]
+
+            async def receive():
+                return messages.pop(0)
+
+            async def send(message):
+                if message["type"] == "http.response.start" and message["status"] != 200:
+                    raise RuntimeError(f"status {message['status']}")
+
+            await app({"type": "http", "method": "POST", "path": "/search", "headers": []}, receive, send)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    wall = time.perf_counter() - start
+    snapshot = service.metrics.snapshot()
+    service.close()
+    return {**snapshot, "qps": requests / wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query service throughput: per-request processing vs micro-batching")
+    parser.add_argument("--synthetic", action="store_true", help="random index and simulated embedder instead of QUERY_INDEXES")
+    parser.add_argument("--docs", type=int, default=100_000, help="synthetic index size")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--embed-ms", type=float, default=40.0, help="synthetic embedder cost per call")
+    parser.add_argument("--embed-item-ms", type=float, default=3.0, help="synthetic embedder cost per query")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    base = (synthetic_service(args.docs, args.dim, args.embed_ms, args.embed_item_ms) if args.synthetic
+            else load_service())
+    print(f"{args.clients} clients, {args.requests} requests, k={args.k}")
+    for label, batch_size, wait_ms in (("per-request", 1, 0.0), ("micro-batched", args.batch_size, args.wait_ms)):
+        service = RetrievalService(base.stores, base.embed_fn, batch_size, wait_ms)
+        result = asyncio.run(load_test(service, args.clients, args.requests, args.k))
+        print(f"  {label:<14} {result['qps']:8.1f} QPS  p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  "
+              f"mean batch {result['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench_tree_retrieval.py
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from raptor.retriever import TreeRetriever
+from raptor.tree_store import TreeStore, write_tree_store
+
+
+def synthetic_tree(n_leaves: int, branching: int, dim: int, seed: int = 0):
+    """
+    Three-level tree of nested Gaussian blobs with about `branching` children per summary;
+    summary vectors are the means of their children, like embeddings of good summaries.
+    """
+    rng = np.random.default_rng(seed)
+    n_mid = max(1, n_leaves // branching)
+    n_top = max(1, n_mid // branching)
+    top = rng.normal(scale=4.0, size=(n_top, dim)).astype(np.float32)
+    top_of_mid = rng.integers(n_top, size=n_mid)
+    mid = top[top_of_mid] + rng.normal(scale=2.0, size=(n_mid, dim)).astype(np.float32)
+    mid_of_leaf = rng.integers(n_mid, size=n_leaves)
+    leaves = mid[mid_of_leaf] + rng.normal(size=(n_leaves, dim)).astype(np.float32)
+
+    def means(vectors, groups, n_groups):
+        sums = np.zeros((n_groups, dim), dtype=np.float64)
+        np.add.at(sums, groups, vectors)
+        return (sums / np.maximum(np.bincount(groups, minlength=n_groups), 1)[:, None]).astype(np.float32)
+
+    mid_means = means(leaves, mid_of_leaf, n_mid)
+    top_means = means(mid_means, top_of_mid, n_top)
+    tree = {
+        1: (
+            pd.DataFrame({"text": [f"leaf {i}" for i in range(n_leaves)], "embd": list(leaves),
+                          "cluster": list(mid_of_leaf.reshape(-1, 1))}),
+            pd.DataFrame({"summaries": [f"mid {i}" for i in range(n_mid)], "level": 1, "cluster": np.arange(n_mid)}),
+        ),
+        2: (
+            pd.DataFrame({"text": [f"mid {i}" for i in range(n_mid)], "embd": list(mid_means),
+                          "cluster": list(top_of_mid.reshape(-1, 1))}),
+            pd.DataFrame({"summaries": [f"top {i}" for i in range(n_top)], "level": 2, "cluster": np.arange(n_top)}),
+        ),
+    }
+    return tree, lambda texts: top_means[[int(text.split()[1]) for text in texts]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tree-traversal retrieval vs. flat leaf scan over a synthetic RAPTOR tree")
+    parser.add_argument("--tree", default="", help="existing tree store directory (default: build a synthetic tree)")
+    parser.add_argument("--leaves", type=int, default=1_000_000)
+    parser.add_argument("--branching", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--beam", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    if args.tree:
+        store = TreeStore(args.tree)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "tree")
+        start = time.perf_counter()
+        tree, embed_fn = synthetic_tree(args.leaves, args.branching, args.dim)
+        store = write_tree_store(tree, path, embed_fn=embed_fn)
+        print(f"Built synthetic tree in {time.perf_counter() - start:.1f}s: {path}")
+    start = time.perf_counter()
+    store = TreeStore(store.path)
+    print(f"{len(store)} nodes, dim {store.dim}, opened in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    retriever = TreeRetriever(store)
+    rng = np.random.default_rng(1)
+    leaves = store.level_nodes(0)
+    picks = rng.choice(leaves, size=args.queries, replace=False)
+    queries = np.asarray(store.embeddings[np.sort(picks)]) + rng.normal(scale=0.5, size=(args.queries, store.dim))
+
+    start = time.perf_counter()
+    truth = [{hit.node for hit in retriever.collapsed_search(q, args.k, level=0)} for q in queries]
+    flat_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"{'flat leaf scan':<16} {flat_ms:8.2f} ms/query  recall@{args.k} 1.000  scored {len(leaves)}")
+    for beam in args.beam:
+        start = time.perf_counter()
+        results = [retriever.traverse(q, args.k, beam_width=beam) for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        recall = np.mean([len({hit.node for hit in r.hits} & t) / args.k for r, t in zip(results, truth)])
+        scored = np.mean([r.n_scored for r in results])
+        print(f"{f'beam {beam}':<16} {ms:8.2f} ms/query  recall@{args.k} {recall:.3f}  scored {scored:.0f} "
+              f"({scored / len(store):.2%} of nodes)")
+
+
+if __name__ == "__main__":
+    main()
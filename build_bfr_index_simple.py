@@ -2,10 +2,10 @@
 #from loader import load_documents
 from document_parser import load_documents
 from ingestion.chunker import chunk_documents
+from ingestion.document_store import write_document_store
 from raptor.tree_builder import recursive_embed_cluster_summarize
 from vector_store.faiss_store import build_faiss_index_from_docs, save_faiss_index
 from config import DOCUMENT_DIR, FAISS_INDEX_PATH
-import pickle
 
 DOCUMENT_DIR = "data/bfts"
 FAISS_INDEX_PATH = "index/bft_index"
@@ -26,9 +26,8 @@ def main():
     save_faiss_index(index, FAISS_INDEX_PATH)
     print("FAISS index built and saved at:", FAISS_INDEX_PATH)
 
-    # Optionally, save the loaded documents to a pickle file.
-    with open(f'{FAISS_INDEX_PATH}/docstore.pkl', 'wb') as file:
-        pickle.dump(documents, file)
+    # Optionally, save the loaded documents to a document store next to the index.
+    write_document_store(f'{FAISS_INDEX_PATH}/documents', documents).close()
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,16 @@
 # main.py
 from loader import load_documents
 from ingestion.chunker import chunk_documents
+from ingestion.document_store import open_document_store, write_document_store
 from raptor.tree_builder import recursive_embed_cluster_summarize
 from vector_store.faiss_store import build_faiss_index_from_docs_chunked, save_faiss_index
-from config import DOCUMENT_DIR, FAISS_INDEX_PATH
-import pickle, os
+from config import DOCUMENT_DIR, DOCUMENT_STORE_PATH, FAISS_INDEX_PATH, LEGACY_DOCSTORE_PICKLE
 
 FAISS_INDEX_PATH = "index/itil_index"
 def main():
     # Recursively load documents from the local test_data folder.
-    if os.path.isfile("data/documents/itil_docstore.pkl"):
-        with open('data/documents/itil_docstore.pkl', 'rb') as file:
-            documents = pickle.load(file)
+    with open_document_store(DOCUMENT_STORE_PATH, legacy_pickle=LEGACY_DOCSTORE_PICKLE) as store:
+        documents = list(store)
     print(f"Loaded {len(documents)} documents.")
 
     # Optionally, split (chunk) documents if they are too long.
@@ -25,9 +24,8 @@ def main():
     save_faiss_index(index, FAISS_INDEX_PATH)
     print("FAISS index built and saved at:", FAISS_INDEX_PATH)
 
-    # Optionally, save the loaded documents to a pickle file.
-    with open(f'{FAISS_INDEX_PATH}/docstore.pkl', 'wb') as file:
-        pickle.dump(documents, file)
+    # Optionally, save the loaded documents to a document store next to the index.
+    write_document_store(f'{FAISS_INDEX_PATH}/documents', documents).close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,36 @@
+# build_index_streaming.py
+from typing import Iterable, Iterator
+
+from langchain_core.documents.base import Document
+
+from loader import iter_documents
+from ingestion.chunker import iter_chunks
+from ingestion.document_store import DocumentStore, write_document_store
+from vector_store.faiss_store import build_faiss_index_streaming
+from vector_store.streaming import batched
+from config import DOCUMENT_DIR, FAISS_INDEX_PATH
+
+DOCUMENT_DIR = "data/digitme"
+FAISS_INDEX_PATH = "index/digitme_index"
+
+def stored(documents: Iterable[Document], store: DocumentStore, batch_size: int = 1000) -> Iterator[Document]:
+    """
+    Passes documents through, appending them to store on the way.
+    """
+    for batch in batched(documents, batch_size):
+        store.add_documents(batch)
+        yield from batch
+
+def main():
+    """
+    Same index as build_index_simple.py, but documents flow from the loader through the chunker into the
+    index batch by batch: memory is bounded by the batch and prefetch sizes, not by the corpus.
+    """
+    print("Streaming documents from:", DOCUMENT_DIR)
+    with write_document_store(f'{FAISS_INDEX_PATH}/documents', []) as store:
+        chunks = iter_chunks(stored(iter_documents(DOCUMENT_DIR), store))
+        n_chunks = build_faiss_index_streaming(chunks, FAISS_INDEX_PATH)
+        print(f"Indexed {n_chunks} chunks of {len(store)} documents at:", FAISS_INDEX_PATH)
+
+if __name__ == "__main__":
+    main()
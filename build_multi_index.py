@@ -2,9 +2,9 @@
 
 import os
 from typing import List
-from langchain_experimental.open_clip import OpenCLIPEmbeddings
 from langchain_community.vectorstores.faiss import FAISS
 from utils_multi_index import generate_clip_embeddings
+from embeddings.embedder import get_clip_model
 from config import IMAGE_DATA_DIR, INDEX_DIR
 
 def create_faiss_index(images_path: str) -> FAISS:
@@ -12,11 +12,7 @@ def create_faiss_index(images_path: str) -> FAISS:
     Build and save a FAISS index from CLIP embeddings of images under `images_path`.
     """
     # 1) Initialize the CLIP embedder (ViT-B-32 / laion2b_s34b_b79k)
-    clip_embedder = OpenCLIPEmbeddings(
-        model_name="ViT-B-32",
-        checkpoint="laion2b_s34b_b79k",
-        load_fn_kwargs={"device": "cpu"},
-    )  # Multi-modal CLIP embeddings :contentReference[oaicite:4]{index=4}
+    clip_embedder = get_clip_model()  # Multi-modal CLIP embeddings :contentReference[oaicite:4]{index=4}
 
     # 2) Generate embeddings + URI list
     embeddings, image_paths = generate_clip_embeddings(images_path, clip_embedder)
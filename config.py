@@ -15,14 +15,118 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
 # config.py
 DOCUMENT_DIR = "data"
+# Append-only store of the loaded ITIL documents (see ingestion.document_store) and the pickle it replaces
+DOCUMENT_STORE_PATH = os.environ.get('DOCUMENT_STORE_PATH') or "data/documents/itil_store"
+LEGACY_DOCSTORE_PICKLE = "data/documents/itil_docstore.pkl"
+INGEST_MANIFEST_PATH = os.environ.get('INGEST_MANIFEST_PATH') or "data/documents/itil_manifest.sqlite"
+# Document loading: parser processes (1 = load in-process), seconds before a file is abandoned (0 = never),
+# and files running or waiting to be collected at once (0 = 4 * workers)
+LOADER_WORKERS = int(os.environ.get('LOADER_WORKERS') or 1)
+LOADER_FILE_TIMEOUT = float(os.environ.get('LOADER_FILE_TIMEOUT') or 600)
+LOADER_MAX_PENDING = int(os.environ.get('LOADER_MAX_PENDING') or 0)
 EMBEDDING_MODEL_NAME=os.environ.get('EMBEDDING_MODEL_NAME') or "intfloat/multilingual-e5-large"
+# Persistent embedding cache ("" disables it): vector dtype (float32/float16) and LRU bound (0 = unbounded)
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', "cache/embeddings")
+EMBEDDING_CACHE_DTYPE = os.environ.get('EMBEDDING_CACHE_DTYPE') or "float32"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES') or 0)
+# "local" embeds in-process; "pool" shards documents across EMBEDDING_POOL_WORKERS CPU processes
+# (0 = cores / 4), each with EMBEDDING_POOL_TORCH_THREADS torch threads (0 = cores / workers)
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND') or "local"
+EMBEDDING_POOL_WORKERS = int(os.environ.get('EMBEDDING_POOL_WORKERS') or 0)
+EMBEDDING_POOL_TORCH_THREADS = int(os.environ.get('EMBEDDING_POOL_TORCH_THREADS') or 0)
+EMBEDDING_POOL_BATCH_SIZE = int(os.environ.get('EMBEDDING_POOL_BATCH_SIZE') or 32)
+# CPU inference for the embedder and reranker: "torch" (fp32), "int8" (torch dynamic quantization),
+# "onnx" or "onnx_int8" (ONNX Runtime, exported once to ONNX_MODEL_DIR; int8 kernels for ONNX_QUANTIZATION:
+# avx2, avx512, avx512_vnni or arm64)
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND') or "torch"
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR') or "models/onnx"
+ONNX_QUANTIZATION = os.environ.get('ONNX_QUANTIZATION') or "avx512_vnni"
 CHUNK_SIZE = 2000
 CHUNK_OVERLAP = 250
+# Chunking processes (1 = chunk in-process); a pool is only started once CHUNK_POOL_MIN_DOCS documents
+# are waiting, and each task carries CHUNK_POOL_BATCH_SIZE documents
+CHUNK_WORKERS = int(os.environ.get('CHUNK_WORKERS') or 1)
+CHUNK_POOL_MIN_DOCS = int(os.environ.get('CHUNK_POOL_MIN_DOCS') or 2000)
+CHUNK_POOL_BATCH_SIZE = int(os.environ.get('CHUNK_POOL_BATCH_SIZE') or 64)
 CLUSTER_THRESHOLD = 0.1
 CLUSTER_DIM = 10
 RECURSION_LEVELS = 3
+# Incremental tree updates re-cluster a level once this share of its new texts are outliers
+INCREMENTAL_DRIFT_THRESHOLD = float(os.environ.get('INCREMENTAL_DRIFT_THRESHOLD') or 0.2)
+# Checkpointed tree builds write finished cluster summaries to disk every this many clusters
+CHECKPOINT_SUMMARY_BATCH = int(os.environ.get('CHECKPOINT_SUMMARY_BATCH') or 64)
+# Tree-traversal retrieval keeps this many best-scoring nodes per level while descending
+TRAVERSAL_BEAM_WIDTH = int(os.environ.get('TRAVERSAL_BEAM_WIDTH') or 8)
+# GMM model selection: worker processes (0 = all cores), "exhaustive" or "coarse_to_fine",
+# and the number of consecutive BIC increases that stops the sweep (0 = never stop early).
+# Selections over fewer embeddings than CLUSTER_PARALLEL_MIN_SAMPLES (most local clusters) run
+# sequentially: there the process pool costs more than it saves
+CLUSTER_N_JOBS = int(os.environ.get('CLUSTER_N_JOBS') or 0)
+CLUSTER_PARALLEL_MIN_SAMPLES = int(os.environ.get('CLUSTER_PARALLEL_MIN_SAMPLES') or 500)
+CLUSTER_SEARCH = os.environ.get('CLUSTER_SEARCH') or "exhaustive"
+CLUSTER_PATIENCE = int(os.environ.get('CLUSTER_PATIENCE') or 0)
+# Local (per global cluster) UMAP+GMM passes: "" runs them one after another, "thread" or "process"
+# runs them on a pool of CLUSTER_LOCAL_WORKERS workers (0 = all cores)
+CLUSTER_LOCAL_EXECUTOR = os.environ.get('CLUSTER_LOCAL_EXECUTOR') or ""
+CLUSTER_LOCAL_WORKERS = int(os.environ.get('CLUSTER_LOCAL_WORKERS') or 0)
+# Cluster summarization: parallel LLM requests, retries per request and rate limits (0 = unlimited)
+SUMMARY_MAX_CONCURRENCY = int(os.environ.get('SUMMARY_MAX_CONCURRENCY') or 8)
+SUMMARY_MAX_RETRIES = int(os.environ.get('SUMMARY_MAX_RETRIES') or 5)
+SUMMARY_REQUESTS_PER_MINUTE = int(os.environ.get('SUMMARY_REQUESTS_PER_MINUTE') or 0)
+SUMMARY_TOKENS_PER_MINUTE = int(os.environ.get('SUMMARY_TOKENS_PER_MINUTE') or 0)
+# Persistent summary cache ("" disables it) and its LRU bounds (0 = unbounded)
+SUMMARY_CACHE_PATH = os.environ.get('SUMMARY_CACHE_PATH', "cache/summaries.sqlite")
+SUMMARY_CACHE_MAX_ENTRIES = int(os.environ.get('SUMMARY_CACHE_MAX_ENTRIES') or 0)
+SUMMARY_CACHE_MAX_BYTES = int(os.environ.get('SUMMARY_CACHE_MAX_BYTES') or 0)
 FAISS_INDEX_PATH = "index/bfts_index"
+# RAPTOR tree store written by main.py next to its index (node table, levels, links, embeddings; see raptor.tree_store)
+TREE_STORE_PATH = os.environ.get('TREE_STORE_PATH') or "index/kb_index/tree"
+# FAISS index type: "flat" (exact), "ivf_flat", "ivf_pq" or "hnsw"; 0 picks a size-based default.
+# IVF: inverted lists, PQ sub-quantizers and training sample size; HNSW: graph degree and build effort.
+# ANN_NPROBE / ANN_EF_SEARCH trade recall for latency at query time.
+ANN_INDEX_TYPE = os.environ.get('ANN_INDEX_TYPE') or "flat"
+# Memory-map indexes loaded read-only (load_faiss_index(read_only=True), e.g. the query service) and read
+# their SQLite docstore lazily ("0" reads them into RAM); writable loads always read everything into RAM
+FAISS_MMAP = (os.environ.get('FAISS_MMAP') or "1") == "1"
+ANN_NLIST = int(os.environ.get('ANN_NLIST') or 0)
+ANN_PQ_M = int(os.environ.get('ANN_PQ_M') or 0)
+ANN_TRAIN_SAMPLE = int(os.environ.get('ANN_TRAIN_SAMPLE') or 0)
+ANN_HNSW_M = int(os.environ.get('ANN_HNSW_M') or 32)
+ANN_EF_CONSTRUCTION = int(os.environ.get('ANN_EF_CONSTRUCTION') or 200)
+ANN_NPROBE = int(os.environ.get('ANN_NPROBE') or 16)
+ANN_EF_SEARCH = int(os.environ.get('ANN_EF_SEARCH') or 64)
+# Streaming index builds: chunks embedded per batch, batches loaded and chunked ahead of the embedder,
+# and vectors buffered to train IVF indexes on (set ANN_NLIST for corpora much larger than this)
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE') or 512)
+STREAM_PREFETCH_BATCHES = int(os.environ.get('STREAM_PREFETCH_BATCHES') or 4)
+STREAM_TRAIN_SIZE = int(os.environ.get('STREAM_TRAIN_SIZE') or 100_000)
+# Multi-index search: per-index timeout after which an index is left out of the fusion, and the RRF constant
+MULTI_INDEX_TIMEOUT_MS = float(os.environ.get('MULTI_INDEX_TIMEOUT_MS') or 2000)
+MULTI_INDEX_RRF_K = int(os.environ.get('MULTI_INDEX_RRF_K') or 60)
+# Sparse (BM25) index saved next to every FAISS index ("0" to skip it), its BM25 parameters,
+# and the share of BM25 in hybrid dense + sparse scores
+SPARSE_INDEX = (os.environ.get('SPARSE_INDEX') or "1") == "1"
+BM25_K1 = float(os.environ.get('BM25_K1') or 1.2)
+BM25_B = float(os.environ.get('BM25_B') or 0.75)
+HYBRID_SPARSE_WEIGHT = float(os.environ.get('HYBRID_SPARSE_WEIGHT') or 0.5)
+# Query service: indexes to serve as "name=path,name=path" (default: FAISS_INDEX_PATH as "default"),
+# queries embedded and searched together at most, and how long the first query of a batch waits for others
+QUERY_INDEXES = os.environ.get('QUERY_INDEXES') or ""
+QUERY_MAX_BATCH_SIZE = int(os.environ.get('QUERY_MAX_BATCH_SIZE') or 32)
+QUERY_MAX_WAIT_MS = float(os.environ.get('QUERY_MAX_WAIT_MS') or 5)
+# Load the cross-encoder at startup so /search requests can ask for reranking ("1")
+QUERY_RERANK = (os.environ.get('QUERY_RERANK') or "0") == "1"
 RERANKING_MODEL=os.environ.get('RERANKING_MODEL') or '/models/bge-reranker-large'
+# Reranking: (query, passage) pairs scored together at most and how long the first request waits for others,
+# pairs per forward pass, passage token budget, cached scores (LRU) and candidates fetched per reranked query
+RERANK_MAX_BATCH_PAIRS = int(os.environ.get('RERANK_MAX_BATCH_PAIRS') or 128)
+RERANK_MAX_WAIT_MS = float(os.environ.get('RERANK_MAX_WAIT_MS') or 5)
+RERANK_BATCH_SIZE = int(os.environ.get('RERANK_BATCH_SIZE') or 16)
+RERANK_MAX_PASSAGE_TOKENS = int(os.environ.get('RERANK_MAX_PASSAGE_TOKENS') or 384)
+RERANK_CACHE_SIZE = int(os.environ.get('RERANK_CACHE_SIZE') or 100_000)
+RERANK_CANDIDATES = int(os.environ.get('RERANK_CANDIDATES') or 20)
+CLIP_MODEL_NAME = os.environ.get('CLIP_MODEL_NAME') or "ViT-B-32"
+CLIP_CHECKPOINT = os.environ.get('CLIP_CHECKPOINT') or "laion2b_s34b_b79k"
 
 # Root data directory
 RAW_DATA_DIR = os.getenv("RAW_DATA_DIR", "test_data/Notion0code")  
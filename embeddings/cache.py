@@ -0,0 +1,221 @@
+# cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_stores: Dict[str, "EmbeddingStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    On-disk vector store for one embedding model.
+    Vectors live in a memory-mapped float32/float16 matrix (vectors.bin); a SQLite table maps
+    text hashes to matrix rows. Rows freed by eviction are reused by later inserts.
+    One instance per directory per process (see get_embedding_store); concurrent writers
+    from several processes are not supported.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", max_entries: Optional[int] = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries or None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+        self._conn.commit()
+        meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+        self.dtype = np.dtype(meta.get("dtype", dtype))
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self._capacity = int(meta.get("capacity", 0))
+        self._next_row = int(meta.get("next_row", 0))
+        self._tick = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM entries").fetchone()[0]
+        self._vectors: Optional[np.memmap] = None
+        if self.dim is not None and self._capacity:
+            self._open(self._capacity)
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.bin")
+
+    def _open(self, capacity: int):
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+
+    def _set_meta(self, **values):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()]
+        )
+
+    def _ensure_capacity(self, rows_needed: int):
+        if rows_needed <= self._capacity:
+            return
+        capacity = max(rows_needed, 2 * self._capacity, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._capacity = capacity
+        self._open(capacity)
+        self._set_meta(capacity=capacity)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Bulk lookup; returns the stored vectors (as float32) of the keys that are present.
+        """
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            rows: Dict[str, int] = {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows |= dict(self._conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            self.hits += len(rows)
+            self.misses += len(keys) - len(rows)
+            if not rows:
+                return {}
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?", [(self._next_tick(), k) for k in rows]
+            )
+            self._conn.commit()
+            found_keys = list(rows)
+            vectors = np.asarray(self._vectors[np.fromiter(rows.values(), dtype=np.int64)], dtype=np.float32)
+        return dict(zip(found_keys, vectors))
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        """
+        Stores vectors for keys that are not present yet, then evicts down to max_entries.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta(dim=self.dim, dtype=self.dtype.name)
+            existing = set(self.get_keys(keys))
+            new = [(k, v) for k, v in dict(zip(keys, vectors)).items() if k not in existing]
+            if not new:
+                return
+            free = [r for (r,) in self._conn.execute("SELECT row FROM free_rows ORDER BY row LIMIT ?", (len(new),))]
+            self._conn.executemany("DELETE FROM free_rows WHERE row = ?", [(r,) for r in free])
+            fresh = list(range(self._next_row, self._next_row + len(new) - len(free)))
+            self._next_row += len(fresh)
+            rows = free + fresh
+            self._ensure_capacity(self._next_row)
+            self._vectors[np.asarray(rows, dtype=np.int64)] = np.stack([v for _, v in new]).astype(self.dtype)
+            self._vectors.flush()
+            self._conn.executemany(
+                "INSERT INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                [(k, row, self._next_tick()) for (k, _), row in zip(new, rows)],
+            )
+            self._set_meta(next_row=self._next_row)
+            self._evict()
+            self._conn.commit()
+
+    def get_keys(self, keys: Sequence[str]) -> List[str]:
+        present = []
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            present += [k for (k,) in self._conn.execute(
+                f"SELECT key FROM entries WHERE key IN ({placeholders})", batch
+            )]
+        return present
+
+    def _next_tick(self) -> int:
+        self._tick += 1
+        return self._tick
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count <= self.max_entries:
+            return
+        victims = self._conn.execute(
+            "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (count - self.max_entries,)
+        ).fetchall()
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+        self._conn.executemany("INSERT OR IGNORE INTO free_rows (row) VALUES (?)", [(r,) for _, r in victims])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._conn.close()
+
+
+def get_embedding_store(cache_dir: str, model_name: str, dtype: str = "float32",
+                        max_entries: Optional[int] = None) -> EmbeddingStore:
+    """
+    Returns the process-wide store for model_name under cache_dir, so every embedder of a model shares it.
+    """
+    path = os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", model_name))
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = EmbeddingStore(path, dtype=dtype, max_entries=max_entries)
+        return _stores[path]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that looks every document text up in an EmbeddingStore first
+    and embeds only the missing (deduplicated) texts, in batches.
+    Queries are passed straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore, batch_size: int = 256):
+        self.embeddings = embeddings
+        self.store = store
+        self.batch_size = batch_size
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        keys = [text_key(text) for text in texts]
+        found = self.store.get_many(keys)
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in found))
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            vectors = np.asarray(self.embeddings.embed_documents(batch), dtype=np.float32)
+            batch_keys = [text_key(text) for text in batch]
+            self.store.put_many(batch_keys, vectors)
+            found |= dict(zip(batch_keys, vectors))
+        if not texts:
+            return np.zeros((0, self.store.dim or 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        from embeddings.quantized import embed_query_batch
+        return embed_query_batch(self.embeddings, texts)
@@ -1,9 +1,75 @@
 # embedder.py
-from langchain_huggingface import HuggingFaceEmbeddings
-from config import EMBEDDING_MODEL_NAME
+from config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_BACKEND,
+    EMBEDDING_POOL_WORKERS,
+    EMBEDDING_POOL_TORCH_THREADS,
+    EMBEDDING_POOL_BATCH_SIZE,
+    INFERENCE_BACKEND,
+    RERANKING_MODEL,
+    CLIP_MODEL_NAME,
+    CLIP_CHECKPOINT,
+)
+from embeddings.cache import CachedEmbeddings, get_embedding_store
+from embeddings.registry import get_model
 
-def get_embedding_model():
+def _load_embeddings():
+    from embeddings.quantized import load_embeddings
+    return load_embeddings(EMBEDDING_MODEL_NAME)
+
+def _load_embedding_pool():
+    from embeddings.pool import EmbeddingPool
+    return EmbeddingPool(
+        EMBEDDING_MODEL_NAME,
+        n_workers=EMBEDDING_POOL_WORKERS or None,
+        torch_threads=EMBEDDING_POOL_TORCH_THREADS or None,
+        batch_size=EMBEDDING_POOL_BATCH_SIZE,
+    )
+
+def _load_cached_embeddings():
+    # Quantized backends give slightly different vectors: they get a cache of their own.
+    cache_name = EMBEDDING_MODEL_NAME if INFERENCE_BACKEND == "torch" else f"{EMBEDDING_MODEL_NAME}@{INFERENCE_BACKEND}"
+    store = get_embedding_store(EMBEDDING_CACHE_DIR, cache_name, EMBEDDING_CACHE_DTYPE, EMBEDDING_CACHE_MAX_ENTRIES)
+    embeddings = get_embedding_model(cached=False)
+    # Hand the pool large slices so all of its workers stay busy.
+    batch_size = embeddings.window_size if EMBEDDING_BACKEND == "pool" else 256
+    return CachedEmbeddings(embeddings, store, batch_size=batch_size)
+
+def get_embedding_model(cached: bool = True):
+    """
+    Returns the process-wide HuggingFaceEmbeddings object for EMBEDDING_MODEL_NAME, loaded on first use.
+    With EMBEDDING_BACKEND="pool" documents are embedded by a multi-process EmbeddingPool instead.
+    INFERENCE_BACKEND picks fp32 torch or a quantized / ONNX Runtime model (see embeddings.quantized).
+    Unless disabled (cached=False or an empty EMBEDDING_CACHE_DIR), document embeddings go through
+    the shared on-disk cache of the model, so every text is embedded at most once per model.
+    """
+    if not cached or not EMBEDDING_CACHE_DIR:
+        if EMBEDDING_BACKEND == "pool":
+            return get_model(f"embedding-pool:{INFERENCE_BACKEND}:{EMBEDDING_MODEL_NAME}", _load_embedding_pool)
+        return get_model(f"embedding:{INFERENCE_BACKEND}:{EMBEDDING_MODEL_NAME}", _load_embeddings)
+    return get_model(f"embedding-cached:{EMBEDDING_BACKEND}:{INFERENCE_BACKEND}:{EMBEDDING_MODEL_NAME}", _load_cached_embeddings)
+
+def get_reranker_model():
+    """
+    Returns the process-wide cross-encoder for RERANKING_MODEL on INFERENCE_BACKEND, loaded on first use.
+    """
+    def load():
+        from embeddings.quantized import load_cross_encoder
+        return load_cross_encoder(RERANKING_MODEL)
+    return get_model(f"reranker:{INFERENCE_BACKEND}:{RERANKING_MODEL}", load)
+
+def get_clip_model():
     """
-    Returns a HuggingFaceEmbeddings object using the specified model.
+    Returns the process-wide OpenCLIPEmbeddings used for the image index, loaded on first use.
     """
-    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    def load():
+        from langchain_experimental.open_clip import OpenCLIPEmbeddings
+        return OpenCLIPEmbeddings(
+            model_name=CLIP_MODEL_NAME,
+            checkpoint=CLIP_CHECKPOINT,
+            load_fn_kwargs={"device": "cpu"},
+        )
+    return get_model(f"clip:{CLIP_MODEL_NAME}:{CLIP_CHECKPOINT}", load)
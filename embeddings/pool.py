@@ -0,0 +1,126 @@
+# pool.py
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_worker_model = None
+
+
+def load_worker_model(model_name: str, torch_threads: int) -> Embeddings:
+    """
+    Default model loader of the workers: pins torch to its share of the cores and loads one model copy.
+    """
+    import torch
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    from embeddings.quantized import load_embeddings
+    return load_embeddings(model_name, model_kwargs={"device": "cpu"})
+
+
+def _init_worker(model_name: str, torch_threads: int, model_loader: Callable[[str, int], Embeddings]):
+    """
+    Runs once per worker process.
+    """
+    global _worker_model
+    _worker_model = model_loader(model_name, torch_threads)
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+
+def _embed_query(text: str) -> List[float]:
+    return _worker_model.embed_query(text)
+
+
+def _embed_query_batch(texts: List[str]) -> np.ndarray:
+    from embeddings.quantized import embed_query_batch
+    return embed_query_batch(_worker_model, texts)
+
+
+def token_lengths(texts: List[str]) -> np.ndarray:
+    from ingestion.utils import num_tokens_from_strings
+    return np.asarray(num_tokens_from_strings(texts), dtype=np.int64)
+
+
+class EmbeddingPool(Embeddings):
+    """
+    CPU embedding engine that shards texts across worker processes, each holding one model copy
+    with torch pinned to cpu_count / n_workers threads.
+    Texts are processed in windows; inside a window they are sorted by token length so every batch
+    holds texts of similar length (less padding). Results are streamed back in the original order.
+    model_loader(model_name, torch_threads) builds each worker's model; it must be picklable.
+    """
+
+    def __init__(self, model_name: str, n_workers: Optional[int] = None, torch_threads: Optional[int] = None,
+                 batch_size: int = 32, window_batches: int = 8,
+                 model_loader: Callable[[str, int], Embeddings] = load_worker_model):
+        cpu_count = os.cpu_count() or 1
+        self.model_name = model_name
+        self.n_workers = n_workers or max(1, cpu_count // 4)
+        self.torch_threads = torch_threads or max(1, cpu_count // self.n_workers)
+        self.batch_size = batch_size
+        self.window_size = batch_size * self.n_workers * window_batches
+        logging.info(
+            f"Starting embedding pool: {self.n_workers} workers x {self.torch_threads} torch threads, model {model_name}"
+        )
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, self.torch_threads, model_loader),
+        )
+        atexit.register(self.close)
+
+    def _submit_window(self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray] = _embed_batch
+                       ) -> Tuple[np.ndarray, List[Future]]:
+        order = np.argsort(token_lengths(texts), kind="stable")
+        futures = [
+            self._executor.submit(embed_fn, [texts[i] for i in order[start:start + self.batch_size]])
+            for start in range(0, len(order), self.batch_size)
+        ]
+        return order, futures
+
+    def iter_embeddings(self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray] = _embed_batch
+                        ) -> Iterator[np.ndarray]:
+        """
+        Yields one (window_size, dim) float32 block per window, rows in the order of `texts`.
+        The next window is already queued while the current one is collected.
+        embed_fn is the worker function applied to each batch (document embedding by default).
+        """
+        windows = [texts[start:start + self.window_size] for start in range(0, len(texts), self.window_size)]
+        pending = self._submit_window(windows[0], embed_fn) if windows else None
+        for i in range(len(windows)):
+            order, futures = pending
+            pending = self._submit_window(windows[i + 1], embed_fn) if i + 1 < len(windows) else None
+            sorted_vectors = np.vstack([future.result() for future in futures])
+            vectors = np.empty_like(sorted_vectors)
+            vectors[order] = sorted_vectors
+            yield vectors
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        blocks = list(self.iter_embeddings(list(texts)))
+        return np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._executor.submit(_embed_query, text).result()
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """
+        Query embeddings of a batch, sharded across the workers like documents; each worker encodes its
+        share as queries in as few model calls as its model allows (embeddings.quantized.embed_query_batch).
+        """
+        blocks = list(self.iter_embeddings(list(texts), _embed_query_batch))
+        return np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,188 @@
+# quantized.py
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import INFERENCE_BACKEND, ONNX_MODEL_DIR, ONNX_QUANTIZATION
+
+INFERENCE_BACKENDS = ("torch", "int8", "onnx", "onnx_int8")
+
+# Fixed sample for the accuracy-parity checks (tests/test_quantized.py, bench_inference.py).
+PARITY_QUERIES = [
+    "Зачем нужен признак госзакупки в карточке клиента и в ЛЗ?",
+    "Как зарегистрировать инцидент в сервис-деске?",
+    "What is the difference between an incident and a problem in ITIL?",
+    "Когда вебинар",
+]
+PARITY_PASSAGES = [
+    "Инцидент — это незапланированное прерывание ИТ-услуги или снижение её качества.",
+    "Проблема — это причина одного или нескольких инцидентов; управление проблемами ищет корневую причину.",
+    "Признак госзакупки в карточке клиента определяет порядок согласования лицевого заказа.",
+    "Service desk agents log every incident with its category, priority and affected configuration item.",
+    "Запросы на изменение проходят оценку рисков и согласование на CAB.",
+    "Вебинар для новых сотрудников проходит каждый четверг в 15:00.",
+    "A known error is a problem that has a documented root cause and a workaround.",
+    "Требование 1024: система должна сохранять историю изменений карточки клиента.",
+]
+
+
+def onnx_model_path(model_name: str) -> str:
+    return os.path.join(ONNX_MODEL_DIR, re.sub(r"[^\w.-]+", "_", model_name))
+
+
+def quantized_onnx_file() -> str:
+    return f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+
+def export_onnx_model(model_name: str, cross_encoder: bool = False) -> str:
+    """
+    Exports a sentence-transformers model (or cross-encoder) to ONNX under ONNX_MODEL_DIR, together with a
+    dynamically int8-quantized copy for ONNX_QUANTIZATION CPUs. Done once; later calls return the directory.
+    """
+    from sentence_transformers import CrossEncoder, SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = onnx_model_path(model_name)
+    if os.path.exists(os.path.join(path, quantized_onnx_file())):
+        return path
+    logging.info(f"Exporting {model_name} to ONNX in {path}")
+    model_class = CrossEncoder if cross_encoder else SentenceTransformer
+    # Without an onnx/model.onnx in the repository, sentence-transformers exports it through optimum.
+    model = model_class(model_name, backend="onnx", device="cpu")
+    model.save_pretrained(path)
+    export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, path)
+    return path
+
+
+def _quantize_linear_layers(module):
+    """
+    torch dynamic quantization: Linear weights are stored in int8 and activations quantized on the fly.
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _load(model_name: str, backend: str, cross_encoder: bool = False):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    model_class = CrossEncoder if cross_encoder else SentenceTransformer
+    if backend in ("torch", "int8"):
+        model = model_class(model_name, device="cpu")
+        if backend == "int8":
+            _quantize_linear_layers(model.model if cross_encoder else model)
+        return model
+    path = export_onnx_model(model_name, cross_encoder)
+    file_name = quantized_onnx_file() if backend == "onnx_int8" else "onnx/model.onnx"
+    return model_class(path, backend="onnx", device="cpu",
+                       model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider"})
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    LangChain embeddings over a sentence-transformers model on one of the CPU backends.
+    Encodes exactly as HuggingFaceEmbeddings does (same pooling and normalization modules).
+    """
+
+    def __init__(self, model_name: str, backend: str = INFERENCE_BACKEND, batch_size: int = 32):
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.client = _load(model_name, backend)
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.client.encode(texts, batch_size=self.batch_size, show_progress_bar=False,
+                                             convert_to_numpy=True), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """
+        Queries are encoded like documents: a batch of them takes one encode call.
+        """
+        return self.embed_documents_array(texts)
+
+
+class QuantizedCrossEncoder:
+    """
+    Cross-encoder with HuggingFaceCrossEncoder's interface (score(pairs), client) on a CPU backend.
+    """
+
+    def __init__(self, model_name: str, backend: str = INFERENCE_BACKEND, batch_size: int = 32):
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.client = _load(model_name, backend, cross_encoder=True)
+
+    def score(self, text_pairs: List[Tuple[str, str]]) -> List[float]:
+        scores = self.client.predict(text_pairs, batch_size=self.batch_size, show_progress_bar=False)
+        # Two-logit models give (not relevant, relevant): keep the relevant one, as HuggingFaceCrossEncoder does.
+        scores = np.asarray(scores)
+        return (scores[:, 1] if scores.ndim > 1 else scores).tolist()
+
+
+def load_embeddings(model_name: str, backend: Optional[str] = None, model_kwargs: Optional[Dict[str, Any]] = None) -> Embeddings:
+    """
+    The embedding model on the requested backend (INFERENCE_BACKEND by default): HuggingFaceEmbeddings
+    for "torch" (with model_kwargs), SentenceTransformerEmbeddings on the CPU otherwise.
+    """
+    backend = backend or INFERENCE_BACKEND
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs or {})
+    return SentenceTransformerEmbeddings(model_name, backend)
+
+
+def load_cross_encoder(model_name: str, backend: Optional[str] = None):
+    backend = backend or INFERENCE_BACKEND
+    if backend == "torch":
+        from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+        return HuggingFaceCrossEncoder(model_name=model_name)
+    return QuantizedCrossEncoder(model_name, backend)
+
+
+def embed_query_batch(embeddings, texts: List[str]) -> np.ndarray:
+    """
+    Query embeddings of a batch of texts in as few model calls as the model allows: its own
+    embed_queries, one embed_documents call when HuggingFaceEmbeddings encodes queries like documents
+    (no separate query_encode_kwargs), and one embed_query per text only for models whose query
+    encoding really differs.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return np.asarray(embeddings.embed_queries(texts), dtype=np.float32)
+    query_kwargs = getattr(embeddings, "query_encode_kwargs", None)
+    if hasattr(embeddings, "encode_kwargs") and (not query_kwargs or query_kwargs == embeddings.encode_kwargs):
+        return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    return np.asarray([embeddings.embed_query(text) for text in texts], dtype=np.float32)
+
+
+def embedding_parity(reference: np.ndarray, vectors: np.ndarray) -> Dict[str, float]:
+    """
+    Row-wise cosine similarity between reference (fp32) embeddings and another backend's.
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    vectors = np.asarray(vectors, dtype=np.float64)
+    cosine = (reference * vectors).sum(axis=1) / (np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1))
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def ranking_parity(reference: Sequence[Sequence[float]], scores: Sequence[Sequence[float]]) -> Dict[str, float]:
+    """
+    Per-query agreement of two sets of reranker scores over the same candidates: share of queries with the
+    same top passage and the mean Spearman correlation of the rankings.
+    """
+    top1, spearman = [], []
+    for ref, other in zip(reference, scores):
+        ref, other = np.asarray(ref, dtype=np.float64), np.asarray(other, dtype=np.float64)
+        top1.append(ref.argmax() == other.argmax())
+        ref_ranks, other_ranks = ref.argsort().argsort(), other.argsort().argsort()
+        spearman.append(np.corrcoef(ref_ranks, other_ranks)[0, 1] if len(ref) > 1 else 1.0)
+    return {"top1_agreement": float(np.mean(top1)), "mean_spearman": float(np.mean(spearman))}
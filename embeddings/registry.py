@@ -0,0 +1,57 @@
+# registry.py
+import gc
+import logging
+import sys
+import threading
+from typing import Any, Callable, Dict, List
+
+_models: Dict[str, Any] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_model(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Returns the process-wide instance registered under name, calling factory() on first use.
+    Loading is serialized per name, so concurrent callers wait for a single load
+    while other models can load in parallel.
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _models:
+            logging.info(f"Loading model {name}...")
+            _models[name] = factory()
+        return _models[name]
+
+
+def release_model(name: str) -> bool:
+    """
+    Drops the registered instance so its memory can be reclaimed. Returns False if it was not loaded.
+    Callers must not keep their own references to the model for the memory to be freed.
+    """
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        model = _models.pop(name, None)
+    if model is None:
+        return False
+    del model
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    logging.info(f"Released model {name}.")
+    return True
+
+
+def release_all():
+    for name in loaded_models():
+        release_model(name)
+
+
+def loaded_models() -> List[str]:
+    return list(_models)
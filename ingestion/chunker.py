@@ -1,26 +1,65 @@
 # chunker.py
+import multiprocessing
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
-from langchain.docstore.document import Document
+from langchain_core.documents.base import Document
 from ingestion import utils
-from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL_NAME
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_WORKERS, CHUNK_POOL_MIN_DOCS, CHUNK_POOL_BATCH_SIZE, EMBEDDING_MODEL_NAME
 
-def chunk_text(text: str) -> List[str]:
-    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+@lru_cache(maxsize=None)
+def get_splitter(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> RecursiveCharacterTextSplitter:
+    """
+    The token-length splitter, built once per process: building it loads the tiktoken encoding.
+    Splitting is stateless, so the instance is shared.
+    """
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
         #model_name=EMBEDDING_MODEL_NAME,
-        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
     )
-    return splitter.split_text(text)
 
-def chunk_documents(docs: List[Document]) -> List[Document]:
+def chunk_text(text: str) -> List[str]:
+    return get_splitter().split_text(text)
+
+def _chunk_texts(texts: List[str]) -> List[List[str]]:
+    """
+    Runs in the pool workers: only texts go in and chunk texts come back, metadata stays in the parent.
+    """
+    return [chunk_text(text) for text in texts]
+
+def chunk_documents(docs: List[Document], workers: int = None) -> List[Document]:
     """
     For each document, split its text into chunks (if needed) and return a new list of Documents.
     """
-    chunked_docs = []
-    for doc in docs:
-        chunks = chunk_text(doc.page_content)
-        chunked_docs.extend(
-            Document(page_content=chunk, metadata=doc.metadata)
-            for chunk in chunks
-        )
-    return chunked_docs
+    return list(iter_chunks(docs, workers))
+
+def iter_chunks(docs: Iterable[Document], workers: int = None) -> Iterator[Document]:
+    """
+    Streaming chunk_documents: pulls one document at a time and yields its chunks.
+    With workers > 1 (CHUNK_WORKERS by default), documents are taken CHUNK_POOL_MIN_DOCS at a time and
+    chunked on a pool of spawned processes; smaller inputs never start the pool. The chunks are the same,
+    in the same order, either way.
+    """
+    workers = workers or CHUNK_WORKERS or 1
+    docs = iter(docs)
+    pool = None
+    try:
+        while True:
+            window = list(islice(docs, CHUNK_POOL_MIN_DOCS if workers > 1 else 1))
+            if not window:
+                return
+            texts = [doc.page_content for doc in window]
+            if workers > 1 and (pool is not None or len(window) == CHUNK_POOL_MIN_DOCS):
+                if pool is None:
+                    pool = multiprocessing.get_context("spawn").Pool(workers)
+                batches = [texts[i:i + CHUNK_POOL_BATCH_SIZE] for i in range(0, len(texts), CHUNK_POOL_BATCH_SIZE)]
+                chunk_lists = [chunks for batch in pool.map(_chunk_texts, batches) for chunks in batch]
+            else:
+                chunk_lists = _chunk_texts(texts)
+            for doc, chunks in zip(window, chunk_lists):
+                for chunk in chunks:
+                    yield Document(page_content=chunk, metadata=doc.metadata)
+    finally:
+        if pool is not None:
+            pool.terminate()
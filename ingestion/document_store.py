@@ -0,0 +1,246 @@
+# document_store.py
+import json
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from langchain_core.documents.base import Document
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _segment_path(path: str, segment: int) -> str:
+    return os.path.join(path, f"segment-{segment:05d}.jsonl")
+
+
+def _to_line(id_: str, doc: Document) -> bytes:
+    record = {"id": id_, "page_content": doc.page_content, "metadata": doc.metadata}
+    return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def _from_line(line: bytes) -> Document:
+    record = json.loads(line)
+    return Document(page_content=record["page_content"], metadata=record["metadata"], id=record["id"])
+
+
+class DocumentStore:
+    """
+    Append-only document store: Documents are JSON lines in size-capped segment files, and a SQLite
+    index maps each id to (segment, offset, length).
+    Appends write to the last segment only; iteration streams the segments in insertion order;
+    get() reads one line by seeking; delete() only drops index rows. A write that was interrupted
+    before it was indexed is cut off the next time the store is opened.
+    """
+
+    def __init__(self, path: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "seq INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, segment INTEGER NOT NULL, "
+            "offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+        )
+        # End of the committed data: (segment, size). Updated in the same transaction as the index rows.
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self._recover()
+
+    def _recover(self):
+        """
+        Truncates the last segment to the end of the last committed write and drops later segments.
+        """
+        meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+        if meta:
+            self._segment, end = meta["segment"], meta["size"]
+        else:
+            # Stores written before the meta table existed: the last index row marks the end.
+            row = self._conn.execute("SELECT segment, offset + length FROM documents ORDER BY seq DESC LIMIT 1").fetchone()
+            self._segment, end = row if row else (0, 0)
+        segment_path = _segment_path(self.path, self._segment)
+        if os.path.exists(segment_path) and os.path.getsize(segment_path) > end:
+            logging.warning(f"Dropping {os.path.getsize(segment_path) - end} unindexed bytes from {segment_path}")
+            with open(segment_path, "r+b") as file:
+                file.truncate(end)
+        stale = self._segment + 1
+        while os.path.exists(_segment_path(self.path, stale)):
+            os.remove(_segment_path(self.path, stale))
+            stale += 1
+        self._segment_size = end
+
+    def add_documents(self, documents: Iterable[Document], ids: Optional[Sequence[str]] = None,
+                      batch_size: int = 1000) -> List[str]:
+        """
+        Appends documents (ids: given, else the Document's own id, else a new uuid) and returns their ids.
+        Documents are written and indexed in batches, so any iterable can be streamed in.
+        """
+        added: List[str] = []
+        batch: List[tuple] = []
+        for i, doc in enumerate(documents):
+            id_ = ids[i] if ids is not None else (doc.id or uuid.uuid4().hex)
+            batch.append((id_, doc))
+            if len(batch) >= batch_size:
+                added += self._append(batch)
+                batch = []
+        if batch:
+            added += self._append(batch)
+        return added
+
+    def _append(self, batch: List[tuple]) -> List[str]:
+        with self._lock:
+            rows = []
+            file = open(_segment_path(self.path, self._segment), "ab")
+            try:
+                for id_, doc in batch:
+                    line = _to_line(id_, doc)
+                    if self._segment_size and self._segment_size + len(line) > self.segment_max_bytes:
+                        file.close()
+                        self._segment, self._segment_size = self._segment + 1, 0
+                        file = open(_segment_path(self.path, self._segment), "ab")
+                    file.write(line)
+                    rows.append((id_, self._segment, self._segment_size, len(line)))
+                    self._segment_size += len(line)
+                file.flush()
+                os.fsync(file.fileno())
+            finally:
+                file.close()
+            try:
+                self._conn.executemany("INSERT INTO documents (id, segment, offset, length) VALUES (?, ?, ?, ?)", rows)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    [("segment", self._segment), ("size", self._segment_size)],
+                )
+                self._conn.commit()
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                self._recover()
+                raise ValueError("Duplicate document id in batch or store")
+            return [id_ for id_, _, _, _ in rows]
+
+    def get(self, id_: str) -> Optional[Document]:
+        return self.get_many([id_]).get(id_)
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, Document]:
+        """
+        Random access by id: one indexed lookup and one seek per document, grouped by segment.
+        """
+        ids = list(dict.fromkeys(ids))
+        with self._lock:
+            rows = []
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                rows += self._conn.execute(
+                    f"SELECT id, segment, offset, length FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+        found: Dict[str, Document] = {}
+        rows.sort(key=lambda row: (row[1], row[2]))
+        segment, file = None, None
+        try:
+            for id_, row_segment, offset, length in rows:
+                if row_segment != segment:
+                    if file is not None:
+                        file.close()
+                    segment, file = row_segment, open(_segment_path(self.path, row_segment), "rb")
+                file.seek(offset)
+                found[id_] = _from_line(file.read(length))
+        finally:
+            if file is not None:
+                file.close()
+        return found
+
+    def __iter__(self) -> Iterator[Document]:
+        """
+        Streams all live documents in insertion order, reading the segments front to back.
+        """
+        last_seq, segment, file = -1, None, None
+        try:
+            while True:
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT seq, segment, offset, length FROM documents WHERE seq > ? ORDER BY seq LIMIT 10000",
+                        (last_seq,),
+                    ).fetchall()
+                if not rows:
+                    return
+                for seq, row_segment, offset, length in rows:
+                    if row_segment != segment:
+                        if file is not None:
+                            file.close()
+                        segment, file = row_segment, open(_segment_path(self.path, row_segment), "rb")
+                    if file.tell() != offset:
+                        file.seek(offset)
+                    yield _from_line(file.read(length))
+                    last_seq = seq
+        finally:
+            if file is not None:
+                file.close()
+
+    def delete(self, ids: Sequence[str]):
+        """
+        Removes documents from the index. Their lines stay in the segments (the files are never rewritten)
+        but are no longer returned, and their ids can be added again.
+        """
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(id_,) for id_ in ids])
+            self._conn.commit()
+
+    def ids(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM documents ORDER BY seq").fetchall()
+        return (id_ for (id_,) in rows)
+
+    def __contains__(self, id_: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE id = ?", (id_,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_document_store(path: str, documents: Iterable[Document]) -> DocumentStore:
+    """
+    Replaces whatever is at path with a new store holding documents.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    store = DocumentStore(path)
+    store.add_documents(documents)
+    return store
+
+
+def migrate_pickle(pickle_path: str, path: str) -> DocumentStore:
+    """
+    One-off conversion of a pickled list of Documents (the old docstore.pkl files) into a DocumentStore.
+    """
+    with open(pickle_path, "rb") as file:
+        documents = pickle.load(file)
+    logging.info(f"Migrating {len(documents)} documents from {pickle_path} to {path}")
+    return write_document_store(path, documents)
+
+
+def open_document_store(path: str, legacy_pickle: Optional[str] = None) -> DocumentStore:
+    """
+    Opens the store at path, first migrating legacy_pickle into it if the store does not exist yet.
+    """
+    if legacy_pickle and not os.path.exists(os.path.join(path, "index.sqlite")) and os.path.isfile(legacy_pickle):
+        return migrate_pickle(legacy_pickle, path)
+    return DocumentStore(path)
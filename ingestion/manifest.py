@@ -0,0 +1,207 @@
+# manifest.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileState(NamedTuple):
+    path: str  # relative to the ingested directory
+    size: int
+    mtime_ns: int
+    sha256: str
+    settings: str
+
+
+class IngestPlan(NamedTuple):
+    changed: List[str]  # new or modified files to parse (full paths)
+    deleted: List[str]  # relative paths of files that are gone
+    unchanged: int
+    states: Dict[str, FileState]  # full path -> current state of every changed file
+
+
+class IngestManifest:
+    """
+    SQLite record of every ingested file: relative path, size, mtime, content hash, loader settings
+    and the ids of the documents it produced. Deleted files are kept as tombstones.
+    A file needs parsing when it is new, its content hash or its loader settings changed, or it was
+    deleted before; size and mtime only decide whether the hash has to be recomputed.
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL, "
+            "settings TEXT NOT NULL, doc_ids TEXT NOT NULL, ingested_at REAL NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.commit()
+
+    def _rows(self) -> Dict[str, tuple]:
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns, sha256, settings, deleted FROM files").fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def plan(self, directory_path: str, paths: Sequence[str], settings_fn: Callable[[str], str]) -> IngestPlan:
+        """
+        Compares the files under directory_path with the manifest.
+        Files whose hash is unchanged but whose mtime moved (e.g. after a copy) get their stat refreshed.
+        """
+        known = self._rows()
+        changed, states, touched = [], {}, []
+        seen = set()
+        for full_path in paths:
+            rel_path = os.path.relpath(full_path, directory_path)
+            seen.add(rel_path)
+            stat = os.stat(full_path)
+            settings = settings_fn(full_path)
+            row = known.get(rel_path)
+            if row is not None and not row[4] and row[3] == settings and (row[0], row[1]) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            sha = file_sha256(full_path)
+            state = FileState(rel_path, stat.st_size, stat.st_mtime_ns, sha, settings)
+            if row is not None and not row[4] and row[3] == settings and row[2] == sha:
+                touched.append(state)
+                continue
+            changed.append(full_path)
+            states[full_path] = state
+        if touched:
+            with self._lock:
+                self._conn.executemany(
+                    "UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                    [(s.size, s.mtime_ns, s.path) for s in touched],
+                )
+                self._conn.commit()
+        deleted = sorted(path for path, row in known.items() if not row[4] and path not in seen)
+        return IngestPlan(changed, deleted, len(paths) - len(changed), states)
+
+    def record(self, state: FileState, doc_ids: Sequence[str]) -> List[str]:
+        """
+        Stores the state of a freshly parsed file; returns the doc ids of its previous version.
+        """
+        with self._lock:
+            old = self._conn.execute("SELECT doc_ids, deleted FROM files WHERE path = ?", (state.path,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, settings, doc_ids, ingested_at, deleted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (*state, json.dumps(list(doc_ids)), time.time()),
+            )
+            self._conn.commit()
+        return json.loads(old[0]) if old and not old[1] else []
+
+    def tombstone(self, rel_path: str) -> List[str]:
+        """
+        Marks a file as deleted; returns the doc ids it had produced.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT doc_ids FROM files WHERE path = ? AND deleted = 0", (rel_path,)).fetchone()
+            self._conn.execute("UPDATE files SET deleted = 1, ingested_at = ? WHERE path = ?", (time.time(), rel_path))
+            self._conn.commit()
+        return json.loads(row[0]) if row else []
+
+    def adopt(self, directory_path: str, paths: Sequence[str], documents, settings_fn: Callable[[str], str]) -> int:
+        """
+        Seeds an empty manifest from documents ingested before it existed: every current file that has
+        documents (matched by their relative_path metadata) is recorded as up to date with their ids.
+        Returns the number of files adopted.
+        """
+        ids_by_path: Dict[str, List[str]] = {}
+        for doc in documents:
+            if doc.metadata.get("relative_path"):
+                ids_by_path.setdefault(doc.metadata["relative_path"], []).append(doc.id)
+        adopted = 0
+        for full_path in paths:
+            rel_path = os.path.relpath(full_path, directory_path)
+            if rel_path in ids_by_path:
+                stat = os.stat(full_path)
+                state = FileState(rel_path, stat.st_size, stat.st_mtime_ns, file_sha256(full_path), settings_fn(full_path))
+                self.record(state, ids_by_path[rel_path])
+                adopted += 1
+        return adopted
+
+    def doc_ids(self, rel_path: str) -> List[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT doc_ids FROM files WHERE path = ? AND deleted = 0", (rel_path,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files WHERE deleted = 0").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def document_ids(state: FileState, n_documents: int) -> List[str]:
+    """
+    Stable ids for the documents of one version of a file: re-ingesting identical content yields the same ids.
+    """
+    prefix = hashlib.sha256(f"{state.path}\0{state.sha256}\0{state.settings}".encode("utf-8")).hexdigest()[:20]
+    return [f"{prefix}-{i}" for i in range(n_documents)]
+
+
+class IngestDelta(NamedTuple):
+    added: List  # Documents of new and changed files, with their store ids
+    removed_ids: List[str]  # ids of documents of changed and deleted files that were dropped
+    failed: List[str]  # files that could not be parsed; retried on the next run
+
+
+def apply_ingest(directory_path: str, paths: Sequence[str], manifest: IngestManifest, store,
+                 parse: Callable[[List[str]], Iterable], settings_fn: Callable[[str], str]) -> IngestDelta:
+    """
+    Parses only the new and changed files among paths and brings store and manifest up to date.
+    parse(paths) yields one ingestion.parallel.FileResult per path (value: its Documents).
+    New documents are added before the old version's are removed, so an interrupted run never loses a file.
+    """
+    if not len(manifest) and len(store):
+        adopted = manifest.adopt(directory_path, paths, iter(store), settings_fn)
+        logging.info(f"Manifest seeded from {adopted} files already in the document store")
+    plan = manifest.plan(directory_path, paths, settings_fn)
+    logging.info(f"Ingest plan: {len(plan.changed)} new or changed, {len(plan.deleted)} deleted, {plan.unchanged} unchanged")
+    added, removed, failed = [], [], []
+    for result in parse(plan.changed):
+        if result.error is not None:
+            failed.append(result.path)
+            continue
+        state = plan.states[result.path]
+        docs = result.value
+        ids = document_ids(state, len(docs))
+        for doc, id_ in zip(docs, ids):
+            doc.id = id_
+        missing = [(doc, id_) for doc, id_ in zip(docs, ids) if id_ not in store]
+        if missing:
+            store.add_documents([doc for doc, _ in missing], ids=[id_ for _, id_ in missing])
+        stale = [id_ for id_ in manifest.record(state, ids) if id_ not in set(ids)]
+        store.delete(stale)
+        added.extend(docs)
+        removed.extend(stale)
+    for rel_path in plan.deleted:
+        ids = manifest.tombstone(rel_path)
+        store.delete(ids)
+        removed.extend(ids)
+    logging.info(f"Ingest delta: {len(added)} documents added, {len(removed)} removed, {len(failed)} files failed")
+    return IngestDelta(added, removed, failed)
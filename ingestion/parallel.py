@@ -0,0 +1,132 @@
+# parallel.py
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Sequence
+
+# Worker processes are replaced after this many files, so leaks in parsers do not accumulate.
+MAX_TASKS_PER_CHILD = 100
+
+
+class FileResult(NamedTuple):
+    path: str
+    value: Any  # func(path), or None if it failed
+    error: Optional[str]
+    seconds: float
+    timed_out: bool = False
+
+
+def _run(func: Callable[[str], Any], path: str) -> FileResult:
+    """
+    Runs in the worker: exceptions are turned into messages, since they may not be picklable.
+    """
+    start = time.perf_counter()
+    try:
+        return FileResult(path, func(path), None, time.perf_counter() - start)
+    except Exception as e:
+        return FileResult(path, None, f"{type(e).__name__}: {e}", time.perf_counter() - start)
+
+
+def imap_files(func: Callable[[str], Any], paths: Sequence[str], workers: int, timeout: Optional[float] = None,
+               max_pending: Optional[int] = None) -> Iterator[FileResult]:
+    """
+    Applies func to every path on a pool of `workers` spawned processes and yields the results in the order of paths.
+    A file still running `timeout` seconds after it started is reported as timed out; the pool is then
+    terminated and restarted, and the other files that were running are resubmitted.
+    At most `max_pending` files (default 4 * workers) are running or finished but not yet yielded,
+    so memory stays bounded however many files there are.
+    """
+    max_pending = max(workers, max_pending or 4 * workers)
+    context = multiprocessing.get_context("spawn")
+    done: "queue.Queue" = queue.Queue()
+    results: Dict[int, FileResult] = {}
+    running: Dict[int, float] = {}  # index -> deadline
+    generation = 0
+    pool = None
+    next_submit = next_yield = 0
+
+    def start_pool():
+        nonlocal pool, generation
+        generation += 1
+        pool = context.Pool(workers, maxtasksperchild=MAX_TASKS_PER_CHILD)
+
+    def submit(i: int):
+        gen = generation
+        running[i] = time.monotonic() + timeout if timeout else float("inf")
+        pool.apply_async(
+            _run, (func, paths[i]),
+            callback=lambda result, i=i, gen=gen: done.put((gen, i, result)),
+            error_callback=lambda e, i=i, gen=gen: done.put((gen, i, FileResult(paths[i], None, repr(e), 0.0))),
+        )
+
+    start_pool()
+    try:
+        while next_yield < len(paths):
+            while (next_submit < len(paths) and len(running) < workers
+                   and len(running) + len(results) < max_pending):
+                submit(next_submit)
+                next_submit += 1
+            wait = min(running.values()) - time.monotonic() if running else None
+            try:
+                gen, i, result = done.get(timeout=None if wait is None or wait == float("inf") else max(wait, 0))
+                if gen == generation and i in running:
+                    del running[i]
+                    results[i] = result
+            except queue.Empty:
+                now = time.monotonic()
+                expired = [i for i, deadline in running.items() if deadline <= now]
+                for i in expired:
+                    logging.error(f"Timed out after {timeout}s: {paths[i]}")
+                    results[i] = FileResult(paths[i], None, f"timed out after {timeout}s", float(timeout), True)
+                    del running[i]
+                # A worker stuck in native code cannot be interrupted: replace the whole pool.
+                pool.terminate()
+                start_pool()
+                for i in sorted(running):
+                    submit(i)
+            while next_yield in results:
+                yield results.pop(next_yield)
+                next_yield += 1
+    finally:
+        pool.terminate()
+
+
+class IngestStats:
+    """
+    Per-extension counters for an ingestion run, logged as throughput at the end.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.by_ext: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def add(self, result: FileResult, n_documents: int = 0):
+        stats = self.by_ext[os.path.splitext(result.path)[1].lower() or "<none>"]
+        stats["files"] += 1
+        stats["documents"] += n_documents
+        stats["seconds"] += result.seconds
+        stats["errors"] += result.error is not None and not result.timed_out
+        stats["timeouts"] += result.timed_out
+        try:
+            stats["bytes"] += os.path.getsize(result.path)
+        except OSError:
+            pass
+
+    def log(self):
+        wall = time.perf_counter() - self.started
+        files = sum(stats["files"] for stats in self.by_ext.values())
+        logging.info(f"Ingested {files:.0f} files in {wall:.1f}s ({files / max(wall, 1e-9):.2f} files/s)")
+        for ext, stats in sorted(self.by_ext.items(), key=lambda item: -item[1]["seconds"]):
+            seconds = max(stats["seconds"], 1e-9)
+            logging.info(
+                f"  {ext}: {stats['files']:.0f} files, {stats['documents']:.0f} documents, "
+                f"{stats['bytes'] / 2 ** 20:.1f} MB, {stats['seconds']:.1f}s worker time "
+                f"({stats['files'] / seconds:.2f} files/s, {stats['bytes'] / 2 ** 20 / seconds:.2f} MB/s), "
+                f"{stats['errors']:.0f} errors, {stats['timeouts']:.0f} timeouts"
+            )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {ext: dict(stats) for ext, stats in self.by_ext.items()}
@@ -1,9 +1,24 @@
 # utils.py
+from functools import lru_cache
+from typing import List, Sequence
+
 import tiktoken
 
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """
+    Returns the tiktoken encoding, loaded once per process.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
 def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> int:
     """
     Returns the number of tokens in a text string using the specified encoding.
     """
-    encoding = tiktoken.get_encoding(encoding_name)
-    return len(encoding.encode(string))
+    return len(get_encoding(encoding_name).encode(string))
+
+def num_tokens_from_strings(strings: Sequence[str], encoding_name: str = "cl100k_base", num_threads: int = 8) -> List[int]:
+    """
+    Batched num_tokens_from_string: the strings are encoded on tiktoken's native thread pool.
+    """
+    return [len(tokens) for tokens in get_encoding(encoding_name).encode_batch(list(strings), num_threads=num_threads)]
@@ -1,7 +1,8 @@
 # ingestion/loader.py
-import logging, sys, os, chardet
+import logging, sys, os, time, chardet
 from json import JSONDecodeError
 from pathlib import Path
+from typing import Iterator
 
 from langchain.docstore.document import Document
 from langchain_community.document_loaders.base import BaseLoader
@@ -32,6 +33,12 @@ logging.basicConfig(
 )
 
 import config
+from functools import partial
+from ingestion.parallel import FileResult, IngestStats, imap_files
+from ingestion.manifest import IngestDelta, IngestManifest, apply_ingest
+
+# Bump when get_loader / load_file change in a way that alters their output: every file is then re-parsed.
+LOADER_VERSION = 1
 
 
 def convert_audio_to_wav(input_file, output_file, audio_type):
@@ -121,7 +128,56 @@ def fallback_text(full_path: str)-> list[Document]:
     return loader.load()
 
 
-def load_documents(directory_path: str, extentions: list[str] = None) -> list[Document]:
+def load_file(directory_path: str, full_path: str) -> list[Document]:
+    """
+    Loads one file with the loader for its extension (with the JSON / text encoding fallbacks)
+    and sets its source and relative_path metadata. Raises on failure.
+    """
+    root, filename = os.path.split(full_path)
+    ext = os.path.splitext(filename)[1].lower()
+    logging.info(f"Processing {full_path}...")
+    loader = get_loader(root, filename)
+    if loader is None:
+        logging.warning(f"Unsupported file type {ext} for file {filename}")
+        return []
+    try:
+        docs = loader.load()
+    except Exception as e:
+        docs = None
+        if isinstance(loader, JSONLoader) and isinstance(e, JSONDecodeError):
+            docs = fallback_json(full_path)
+        elif isinstance(loader, TextLoader) and isinstance(e, RuntimeError):
+            docs = fallback_text(full_path)
+        if docs is None:
+            raise e
+    # Compute relative path from the base directory
+    rel_path = os.path.relpath(full_path, directory_path)
+    # Set metadata for each loaded document
+    for doc in docs:
+        doc.metadata["source"] = filename
+        doc.metadata["relative_path"] = rel_path
+    logging.info(f"...{full_path} processed.")
+    return docs
+
+
+def list_files(directory_path: str, extentions: list[str] = None) -> list[str]:
+    """
+    All files under directory_path (filtered by extension), in a deterministic order: directories and
+    files are walked sorted by name.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory_path):
+        dirs.sort()
+        for filename in sorted(files):
+            ext = os.path.splitext(filename)[1].lower()
+            if extentions and ext not in extentions:
+                continue
+            paths.append(os.path.join(root, filename))
+    return paths
+
+
+def load_documents(directory_path: str, extentions: list[str] = None, workers: int = None,
+                   file_timeout: float = None) -> list[Document]:
     """
     Recursively scans the given directory, loads supported files, and returns a list of LangChain Documents.
     
@@ -136,58 +192,82 @@ def load_documents(directory_path: str, extentions: list[str] = None) -> list[Do
     
     Args:
         directory_path (str): The path to the base directory containing documents.
+        workers (int): Parser processes (config.LOADER_WORKERS by default); 1 loads the files in this process.
+        file_timeout (float): With workers > 1, seconds after which a file is abandoned (config.LOADER_FILE_TIMEOUT).
     
     Returns:
-        List[Document]: List of loaded LangChain Document objects.
+        List[Document]: List of loaded LangChain Document objects, in file order whatever the number of workers.
     """
-    documents = []
-    # Walk through directories recursively
-    for root, _, files in os.walk(directory_path):
-        for filename in files:
-            full_path = os.path.join(root, filename)
-            ext = os.path.splitext(filename)[1].lower()
-            if extentions and ext not in extentions:
-                continue
-            logging.info(f"Processing {full_path}...")
-            try:
-                loader = get_loader(root, filename)
-                if loader is None:
-                    logging.warning(f"Unsupported file type {ext} for file {filename}")
-                    continue
+    return list(iter_documents(directory_path, extentions, workers, file_timeout))
+
+
+def iter_documents(directory_path: str, extentions: list[str] = None, workers: int = None,
+                   file_timeout: float = None) -> Iterator[Document]:
+    """
+    Streaming load_documents: yields the Documents of each file as soon as it is parsed, so only the
+    files in flight are held in memory.
+    """
+    for result in parse_files(directory_path, list_files(directory_path, extentions), workers, file_timeout):
+        if result.error is None:
+            yield from result.value
+
+
+def parse_files(directory_path: str, paths: list[str], workers: int = None,
+                file_timeout: float = None) -> Iterator[FileResult]:
+    """
+    Yields one FileResult per path, in order: parsed on a process pool when workers > 1, else here.
+    Errors are logged and the per-extension stats are logged at the end.
+    """
+    workers = workers or config.LOADER_WORKERS or 1
+    file_timeout = file_timeout or config.LOADER_FILE_TIMEOUT or None
+    if workers > 1:
+        results = imap_files(partial(load_file, directory_path), paths, workers, file_timeout, config.LOADER_MAX_PENDING)
+    else:
+        def run_sequentially():
+            for full_path in paths:
+                start = time.perf_counter()
                 try:
-                    docs = loader.load()
+                    docs, error = load_file(directory_path, full_path), None
                 except Exception as e:
-                    docs = None
-                    if isinstance(loader, JSONLoader) and isinstance(e, JSONDecodeError):
-                        docs = fallback_json(full_path)
-                    elif isinstance(loader, TextLoader) and isinstance(e, RuntimeError):
-                        docs = fallback_text(full_path)
-                    if docs is None:
-                        raise e
-                # Compute relative path from the base directory
-                rel_path = os.path.relpath(full_path, directory_path)
-                # Set metadata for each loaded document
-                for doc in docs:
-                    doc.metadata["source"] = filename
-                    doc.metadata["relative_path"] = rel_path
-                documents.extend(docs)
-                logging.info(f"...{full_path} processed.")
-            except Exception as e:
-                logging.error(f"Error loading file {filename}: {e}")
-    return documents
+                    docs, error = None, str(e)
+                yield FileResult(full_path, docs, error, time.perf_counter() - start)
+        results = run_sequentially()
+
+    stats = IngestStats()
+    for result in results:
+        if result.error is not None:
+            logging.error(f"Error loading file {os.path.basename(result.path)}: {result.error}")
+        stats.add(result, len(result.value or []))
+        yield result
+    stats.log()
+
+
+def loader_settings(full_path: str) -> str:
+    """
+    Everything besides the file content that decides what load_file returns for full_path.
+    """
+    return f"loader-v{LOADER_VERSION}:{os.path.splitext(full_path)[1].lower()}"
+
+
+def ingest_directory(directory_path: str, store, manifest: IngestManifest, extentions: list[str] = None,
+                     workers: int = None, file_timeout: float = None) -> IngestDelta:
+    """
+    Incremental load_documents: parses only files that are new or changed since the last run
+    (per the manifest), adds their documents to store and drops the documents of changed and deleted files.
+    Returns the delta, so downstream indexes can be updated without re-reading the store.
+    """
+    parse = lambda paths: parse_files(directory_path, paths, workers, file_timeout)
+    return apply_ingest(directory_path, list_files(directory_path, extentions), manifest, store, parse, loader_settings)
 
 
 if __name__ == "__main__":
-    import pickle
+    from config import DOCUMENT_STORE_PATH, INGEST_MANIFEST_PATH, LEGACY_DOCSTORE_PICKLE
+    from ingestion.document_store import open_document_store
 
     DOCUMENT_DIR = "data/itil"
-    documents = []
-    if os.path.isfile("data/documents/itil_docstore.pkl"):
-        with open('data/documents/itil_docstore.pkl', 'rb') as file:
-            documents = pickle.load(file)
-    newdocs = load_documents(DOCUMENT_DIR) #, extentions=[".txt"])
-    documents.extend(newdocs)
-    with open('data/documents/itil_docstore.pkl', 'wb') as file:
-        pickle.dump(documents, file)
-
-    print(f"Loaded {len(documents)} documents.")
\ No newline at end of file
+    # Only new and changed files are parsed; unchanged ones are skipped by hash.
+    with open_document_store(DOCUMENT_STORE_PATH, legacy_pickle=LEGACY_DOCSTORE_PICKLE) as store, \
+            IngestManifest(INGEST_MANIFEST_PATH) as manifest:
+        delta = ingest_directory(DOCUMENT_DIR, store, manifest) #, extentions=[".txt"])
+        print(f"Loaded {len(delta.added)} documents, removed {len(delta.removed_ids)}, "
+              f"{len(delta.failed)} files failed, {len(store)} in store.")
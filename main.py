@@ -1,13 +1,35 @@
 # main.py
-from loader import load_documents
+import os
+import sys
+from loader import ingest_directory, load_documents
 from ingestion.chunker import chunk_documents
-from raptor.tree_builder import recursive_embed_cluster_summarize
-from vector_store.faiss_store import build_faiss_index, save_faiss_index
-from config import DOCUMENT_DIR, FAISS_INDEX_PATH
-import pickle
+from ingestion.document_store import DocumentStore, write_document_store
+from ingestion.manifest import IngestManifest
+from raptor.checkpoint import resume_tree
+from raptor.tree_store import write_tree_store
+from raptor.incremental import build_tree, update_tree
+from vector_store.faiss_store import build_faiss_index_from_embeddings, save_faiss_index
+from config import DOCUMENT_DIR, FAISS_INDEX_PATH, TREE_STORE_PATH
 
 DOCUMENT_DIR = "data"
 FAISS_INDEX_PATH = "index/kb_index"
+# Fitted cluster models and tree levels, kept next to the index for incremental updates.
+RAPTOR_STATE_PATH = f"{FAISS_INDEX_PATH}/raptor_state"
+# Documents behind the index and the manifest of the files they came from (see ingestion.manifest).
+INDEX_DOCUMENTS_PATH = f"{FAISS_INDEX_PATH}/documents"
+INDEX_MANIFEST_PATH = f"{FAISS_INDEX_PATH}/manifest.sqlite"
+
+def index_tree(tree_results):
+    """
+    Persists the tree structure and builds the FAISS index from its nodes.
+    Every indexed text carries its node id, level and cluster, so hits can be mapped back into the tree.
+    """
+    store = write_tree_store(tree_results, TREE_STORE_PATH)
+    print(f"Total number of texts for vector index: {len(store)}")
+    print("Building FAISS index...")
+    index = build_faiss_index_from_embeddings(store.records())
+    save_faiss_index(index, FAISS_INDEX_PATH)
+    print("FAISS index built and saved at:", FAISS_INDEX_PATH)
 
 def main():
     # Recursively load documents from the local test_data folder.
@@ -24,24 +46,53 @@ def main():
     
     # Build the RAPTOR tree recursively.
     print("Building RAPTOR tree...")
-    tree_results = recursive_embed_cluster_summarize(leaf_texts, level=1, n_levels=3)
+    tree_results = build_tree(leaf_texts, RAPTOR_STATE_PATH, n_levels=3)
 
-    # Flatten the tree by gathering leaf texts and all summaries.
-    all_texts = leaf_texts.copy()
-    for level in sorted(tree_results.keys()):
-        summaries = tree_results[level][1]["summaries"].tolist()
-        all_texts.extend(summaries)
-    print(f"Total number of texts for vector index: {len(all_texts)}")
+    # Persist the tree and index all of its nodes, keeping the vectors computed while clustering.
+    index_tree(tree_results)
 
-    # Build the FAISS vector store.
-    print("Building FAISS index...")
-    index = build_faiss_index(all_texts)
-    save_faiss_index(index, FAISS_INDEX_PATH)
-    print("FAISS index built and saved at:", FAISS_INDEX_PATH)
+    # Optionally, save the loaded documents to a document store next to the index.
+    write_document_store(INDEX_DOCUMENTS_PATH, documents).close()
+    # The next update() seeds a fresh manifest from the new store.
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(INDEX_MANIFEST_PATH + suffix):
+            os.remove(INDEX_MANIFEST_PATH + suffix)
 
-    # Optionally, save the loaded documents to a pickle file.
-    with open(f'{FAISS_INDEX_PATH}/docstore.pkl', 'wb') as file:
-        pickle.dump(documents, file)
+def resume():
+    """
+    Finishes an interrupted tree build from its checkpoint and builds the index.
+    Completed levels and already summarized clusters are not recomputed.
+    """
+    print("Resuming RAPTOR tree from:", RAPTOR_STATE_PATH)
+    tree_results = resume_tree(RAPTOR_STATE_PATH)
+    index_tree(tree_results)
+
+def update(document_dir: str):
+    """
+    Adds the documents under document_dir to the existing tree instead of rebuilding it.
+    Only files that are new or changed since the last run are parsed (see ingestion.manifest),
+    only changed clusters are re-summarized; the index is rebuilt from the updated tree,
+    and the embedding cache makes unchanged texts free.
+    """
+    print("Loading new and changed documents from:", document_dir)
+    with DocumentStore(INDEX_DOCUMENTS_PATH) as store, IngestManifest(INDEX_MANIFEST_PATH) as manifest:
+        delta = ingest_directory(document_dir, store, manifest)
+    if delta.removed_ids:
+        # The tree can only grow: text of changed or deleted files stays in it until the next full build.
+        print(f"{len(delta.removed_ids)} documents were changed or deleted; run a full build to drop them from the tree.")
+    if not delta.added:
+        print("No new documents.")
+        return
+    chunked_docs = chunk_documents(delta.added)
+    leaf_texts = [doc.page_content for doc in chunked_docs if doc.page_content.strip()]
+    print(f"Adding {len(leaf_texts)} chunks to the RAPTOR tree...")
+    tree_results = update_tree(leaf_texts, RAPTOR_STATE_PATH, n_levels=3)
+    index_tree(tree_results)
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 2 and sys.argv[1] == "--update":
+        update(sys.argv[2])
+    elif len(sys.argv) > 1 and sys.argv[1] == "--resume":
+        resume()
+    else:
+        main()
@@ -1,9 +1,9 @@
 # main.py
 #from loader import load_documents
 from ingestion.chunker import chunk_documents
-from raptor.tree_builder import recursive_embed_cluster_summarize
-from vector_store.faiss_store import build_faiss_index, save_faiss_index
-import pickle
+from ingestion.document_store import write_document_store
+from raptor.tree_builder import recursive_embed_cluster_summarize, tree_records
+from vector_store.faiss_store import build_faiss_index_from_embeddings, save_faiss_index
 from config import DOCUMENT_DIR, FAISS_INDEX_PATH
 
 DOCUMENT_DIR = "data"
@@ -25,9 +25,8 @@ def main():
     documents = loader.load()[1:]
     print(f"Loaded {len(documents)} documents.")
 
-    # Optionally, save the loaded documents to a pickle file.
-    with open(f'{FAISS_INDEX_PATH}/docstore.pkl', 'wb') as file:
-        pickle.dump(documents, file)
+    # Optionally, save the loaded documents to a document store next to the index.
+    write_document_store(f'{FAISS_INDEX_PATH}/documents', documents).close()
 
     # Optionally, split (chunk) documents if they are too long.
     chunked_docs = chunk_documents(documents)
@@ -40,16 +39,13 @@ def main():
     print("Building RAPTOR tree...")
     tree_results = recursive_embed_cluster_summarize(leaf_texts, level=1, n_levels=3)
 
-    # Flatten the tree by gathering leaf texts and all summaries.
-    all_texts = leaf_texts.copy()
-    for level in sorted(tree_results.keys()):
-        summaries = tree_results[level][1]["summaries"].tolist()
-        all_texts.extend(summaries)
-    print(f"Total number of texts for vector index: {len(all_texts)}")
+    # Flatten the tree into leaf texts and all summaries, keeping the vectors computed while clustering.
+    records = tree_records(tree_results)
+    print(f"Total number of texts for vector index: {len(records)}")
 
     # Build the FAISS vector store.
     print("Building FAISS index...")
-    index = build_faiss_index(all_texts)
+    index = build_faiss_index_from_embeddings(records)
     save_faiss_index(index, FAISS_INDEX_PATH)
     print("FAISS index built and saved at:", FAISS_INDEX_PATH)
 
@@ -0,0 +1,232 @@
+# api.py
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from langchain_core.documents.base import Document
+
+from config import FAISS_INDEX_PATH, QUERY_INDEXES, QUERY_MAX_BATCH_SIZE, QUERY_MAX_WAIT_MS, QUERY_RERANK, RERANK_CANDIDATES
+from embeddings.quantized import embed_query_batch
+from query_service.batching import MicroBatcher
+from query_service.metrics import LatencyMetrics
+
+
+class SearchRequest(NamedTuple):
+    query: str
+    k: int
+    index: str
+
+
+def embed_queries(embeddings, texts: List[str]) -> np.ndarray:
+    """
+    Embeds a micro-batch of queries, in one model call wherever the embedder allows it
+    (see embeddings.quantized.embed_query_batch).
+    """
+    return embed_query_batch(embeddings, texts)
+
+
+class RetrievalService:
+    """
+    Long-lived search over one or more loaded LangChain FAISS stores.
+    Concurrent queries are micro-batched: their embeddings are computed in one forward pass and each
+    index is searched once with the matrix of all query vectors that target it.
+    With a reranker (query_service.reranker.BatchedReranker), reranked queries fetch RERANK_CANDIDATES
+    candidates and their cross-encoder scoring is batched across requests as well.
+    """
+
+    def __init__(self, stores: Dict[str, Any], embed_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = QUERY_MAX_BATCH_SIZE, max_wait_ms: float = QUERY_MAX_WAIT_MS,
+                 reranker=None):
+        if not stores:
+            raise ValueError("No indexes to serve")
+        self.stores = stores
+        self.default_index = next(iter(stores))
+        self.embed_fn = embed_fn
+        self.reranker = reranker
+        self.metrics = LatencyMetrics()
+        self.batcher = MicroBatcher(self.search_batch, max_batch_size, max_wait_ms, metrics=self.metrics)
+
+    def search_batch(self, requests: Sequence[SearchRequest]) -> List[List[dict]]:
+        """
+        Answers a batch of requests synchronously: one embedding call, one FAISS search per index.
+        """
+        vectors = np.ascontiguousarray(self.embed_fn([request.query for request in requests]), dtype=np.float32)
+        results: List[List[dict]] = [[] for _ in requests]
+        by_index: Dict[str, List[int]] = {}
+        for i, request in enumerate(requests):
+            by_index.setdefault(request.index, []).append(i)
+        for name, rows in by_index.items():
+            store = self.stores[name]
+            k = max(requests[i].k for i in rows)
+            distances, positions = store.index.search(vectors[rows], k)
+            for row, i in enumerate(rows):
+                for distance, position in zip(distances[row][:requests[i].k], positions[row][:requests[i].k]):
+                    if position < 0:
+                        continue
+                    doc_id = store.index_to_docstore_id[int(position)]
+                    doc = store.docstore.search(doc_id)
+                    results[i].append({
+                        "id": doc_id,
+                        "page_content": doc.page_content,
+                        "metadata": doc.metadata,
+                        "score": float(distance),
+                        "index": name,
+                    })
+        return results
+
+    async def search(self, query: str, k: int = 5, index: Optional[str] = None, rerank: bool = False) -> List[dict]:
+        index = index or self.default_index
+        if index not in self.stores:
+            raise KeyError(index)
+        if rerank and self.reranker is None:
+            raise ValueError("Reranking is not enabled (QUERY_RERANK)")
+        start = time.perf_counter()
+        try:
+            if rerank:
+                results = await self.batcher.submit(SearchRequest(query, max(k, RERANK_CANDIDATES), index))
+                docs = [Document(page_content=r["page_content"], metadata=r["metadata"], id=r["id"]) for r in results]
+                scores = await self.reranker.ascore(query, docs)
+                for result, score in zip(results, scores):
+                    result["rerank_score"] = score
+                results = sorted(results, key=lambda result: -result["rerank_score"])[:k]
+            else:
+                results = await self.batcher.submit(SearchRequest(query, k, index))
+        except Exception:
+            self.metrics.record(time.perf_counter() - start, error=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return results
+
+    def close(self):
+        self.batcher.close()
+        if self.reranker is not None:
+            self.reranker.close()
+
+
+def parse_indexes(spec: str) -> Dict[str, str]:
+    """
+    "name=path,name=path" -> {name: path}; a bare path is served as "default".
+    """
+    indexes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, path = item.rpartition("=")
+        indexes[name or "default"] = path
+    return indexes
+
+
+def load_service() -> RetrievalService:
+    """
+    Loads the QUERY_INDEXES read-only (memory-mapped, see load_faiss_index), the embedding model and,
+    with QUERY_RERANK, the cross-encoder once.
+    """
+    from embeddings.embedder import get_embedding_model
+    from vector_store.faiss_store import load_faiss_index
+
+    embeddings = get_embedding_model(cached=False)
+    stores = {name: load_faiss_index(path, read_only=True) for name, path in parse_indexes(QUERY_INDEXES or FAISS_INDEX_PATH).items()}
+    logging.info(f"Serving indexes {', '.join(f'{name} ({store.index.ntotal} vectors)' for name, store in stores.items())}")
+    reranker = None
+    if QUERY_RERANK:
+        from query_service.reranker import BatchedReranker
+        reranker = BatchedReranker()
+    return RetrievalService(stores, lambda texts: embed_queries(embeddings, texts), reranker=reranker)
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, status: int, payload: Any):
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app(service_factory: Callable[[], RetrievalService] = load_service):
+    """
+    Plain ASGI application (run with any ASGI server, e.g. `uvicorn query_service.api:app`):
+      POST /search  {"query": str, "k": int = 5, "index": str = first index, "rerank": bool = false}
+                    -> {"results": [...]}
+      GET  /metrics -> p50/p99 latency, QPS and mean batch size
+      GET  /health
+    The service is created at lifespan startup (or on the first request if the server has no lifespan).
+    """
+    state: Dict[str, Any] = {"service": None}
+    lock = asyncio.Lock()
+
+    async def get_service() -> RetrievalService:
+        async with lock:
+            if state["service"] is None:
+                state["service"] = await asyncio.get_running_loop().run_in_executor(None, service_factory)
+        return state["service"]
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await get_service()
+                except Exception as e:
+                    logging.exception("Query service failed to start")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if state["service"] is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, state["service"].close)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        route = (scope["method"], scope["path"].rstrip("/") or "/")
+        if route == ("GET", "/health"):
+            service = await get_service()
+            return await _send_json(send, 200, {"status": "ok", "indexes": list(service.stores)})
+        if route == ("GET", "/metrics"):
+            service = await get_service()
+            return await _send_json(send, 200, service.metrics.snapshot())
+        if route[1] not in ("/search", "/health", "/metrics"):
+            return await _send_json(send, 404, {"error": f"Not found: {scope['path']}"})
+        if route != ("POST", "/search"):
+            return await _send_json(send, 405, {"error": f"Method {scope['method']} not allowed"})
+
+        try:
+            request = json.loads(await _read_body(receive) or b"{}")
+            query, k, index = request["query"], int(request.get("k", 5)), request.get("index")
+            rerank = bool(request.get("rerank", False))
+            if not isinstance(query, str) or not query.strip() or k < 1:
+                raise ValueError("query must be a non-empty string and k positive")
+        except (ValueError, KeyError, TypeError) as e:
+            return await _send_json(send, 400, {"error": f"Bad request: {e}"})
+        service = await get_service()
+        if index is not None and index not in service.stores:
+            return await _send_json(send, 404, {"error": f"Unknown index {index!r}"})
+        if rerank and service.reranker is None:
+            return await _send_json(send, 400, {"error": "Reranking is not enabled"})
+        try:
+            results = await service.search(query, k, index, rerank)
+        except Exception as e:
+            return await _send_json(send, 500, {"error": str(e)})
+        return await _send_json(send, 200, {"results": results})
+
+    return app
+
+
+app = create_app()
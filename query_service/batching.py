@@ -0,0 +1,121 @@
+# batching.py
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from query_service.metrics import LatencyMetrics
+
+
+class _Entry(NamedTuple):
+    item: Any
+    future: Future
+    submitted: float
+
+
+class MicroBatcher:
+    """
+    Groups items submitted concurrently (from threads or from the event loop) into batches for one
+    batch function. The first item of a batch opens a window of max_wait_ms from its arrival; the batch
+    is closed when the window ends or it holds max_batch_size worth of items (size_fn(item), 1 each by
+    default). batch_fn(items) runs on a single worker thread, one batch at a time, so items that arrive
+    meanwhile form the next batch: under load, batches grow on their own. batch_fn returns one result
+    per item; if it raises, every item of the batch gets the exception.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, metrics: Optional[LatencyMetrics] = None,
+                 size_fn: Optional[Callable[[Any], int]] = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics
+        self.size_fn = size_fn or (lambda item: 1)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._carry: Optional[_Entry] = None  # the item that did not fit into the previous batch
+
+    def submit_future(self, item: Any) -> Future:
+        """
+        Thread-safe: queues item and returns the Future of its result.
+        """
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="micro-batch", daemon=True)
+                self._worker.start()
+        future: Future = Future()
+        self._queue.put(_Entry(item, future, time.monotonic()))
+        return future
+
+    def submit_wait(self, item: Any) -> Any:
+        return self.submit_future(item).result()
+
+    async def submit(self, item: Any) -> Any:
+        return await asyncio.wrap_future(self.submit_future(item))
+
+    def _collect(self) -> Optional[List[_Entry]]:
+        first, self._carry = self._carry or self._queue.get(), None
+        if first is None:
+            return None
+        batch, size = [first], self.size_fn(first.item)
+        deadline = first.submitted + self.max_wait
+        while size < self.max_batch_size:
+            # Items already waiting join without delay, the window only bounds how long we wait for more.
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if entry is None:
+                self._queue.put(None)
+                break
+            if size + self.size_fn(entry.item) > self.max_batch_size:
+                self._carry = entry
+                break
+            batch.append(entry)
+            size += self.size_fn(entry.item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Items whose caller gave up (cancelled futures) are dropped here.
+            batch = [entry for entry in batch if entry.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [entry.item for entry in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch function returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logging.exception(f"Batch of {len(items)} failed")
+                for entry in batch:
+                    entry.future.set_exception(e)
+                continue
+            if self.metrics is not None:
+                self.metrics.record_batch(len(items))
+            for entry, result in zip(batch, results):
+                entry.future.set_result(result)
+
+    def close(self):
+        """
+        Finishes the queued items, then stops the worker thread.
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+            self._queue = queue.Queue()
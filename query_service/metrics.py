@@ -0,0 +1,51 @@
+# metrics.py
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+
+class LatencyMetrics:
+    """
+    Rolling request latencies and batch sizes: percentiles over the last max_samples requests,
+    throughput over the last window_seconds.
+    """
+
+    def __init__(self, max_samples: int = 10_000, window_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._requests = deque(maxlen=max_samples)  # (finished at, seconds)
+        self._batches = deque(maxlen=max_samples)
+        self._total = 0
+        self._errors = 0
+
+    def record(self, seconds: float, error: bool = False):
+        with self._lock:
+            self._requests.append((time.monotonic(), seconds))
+            self._total += 1
+            self._errors += error
+
+    def record_batch(self, size: int):
+        with self._lock:
+            self._batches.append(size)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            requests = list(self._requests)
+            batches = list(self._batches)
+            total, errors = self._total, self._errors
+        now = time.monotonic()
+        window = min(self.window_seconds, max(now - self.started, 1e-9))
+        recent = sum(1 for finished, _ in requests if finished >= now - window)
+        latencies = np.asarray([seconds for _, seconds in requests]) * 1000
+        return {
+            "requests": total,
+            "errors": errors,
+            "qps": recent / window,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            "mean_batch_size": float(np.mean(batches)) if batches else 0.0,
+        }
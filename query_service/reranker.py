@@ -0,0 +1,179 @@
+# reranker.py
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents.base import Document
+from langchain_core.documents.compressor import BaseDocumentCompressor
+from pydantic import ConfigDict
+
+from config import (
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_SIZE,
+    RERANK_MAX_BATCH_PAIRS,
+    RERANK_MAX_PASSAGE_TOKENS,
+    RERANK_MAX_WAIT_MS,
+)
+from query_service.batching import MicroBatcher
+
+# Fallback truncation when the model exposes no tokenizer: about this many characters per token.
+CHARS_PER_TOKEN = 4
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def passage_id(doc: Document) -> str:
+    """
+    The document's id, or a hash of its content for documents that have none.
+    """
+    return doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """
+    In-memory LRU of reranker scores keyed by (query hash, passage id).
+    """
+
+    def __init__(self, max_entries: int = RERANK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get_many(self, keys: Sequence[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    found[key] = self._scores[key]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores: Dict[Tuple[str, str], float]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, score in scores.items():
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._scores)
+
+
+def tokenizer_truncation(model, max_tokens: int) -> Callable[[str], str]:
+    """
+    Cuts passages to max_tokens tokens of the cross-encoder's own tokenizer (at a token boundary of the
+    original text), or to max_tokens * CHARS_PER_TOKEN characters if the model has no fast tokenizer.
+    """
+    tokenizer = getattr(getattr(model, "client", None), "tokenizer", None)
+    if tokenizer is None or not getattr(tokenizer, "is_fast", False):
+        return lambda text: text[:max_tokens * CHARS_PER_TOKEN]
+
+    def truncate(text: str) -> str:
+        encoded = tokenizer(text, add_special_tokens=False, truncation=True, max_length=max_tokens,
+                            return_offsets_mapping=True)
+        offsets = encoded["offset_mapping"]
+        return text[:offsets[-1][1]] if offsets else text
+
+    return truncate
+
+
+class BatchedReranker:
+    """
+    Cross-encoder scoring shared by all in-flight requests. Each request's (query, passage) pairs that
+    are not cached are queued together; the pairs of concurrent requests are scored as one batch of up to
+    max_batch_pairs, sorted by length and fed to the model model_batch_size at a time (less padding).
+    Passages are cut to max_passage_tokens first, and scores are cached by query hash and passage id,
+    so passages that keep coming back for the same queries skip inference.
+    """
+
+    def __init__(self, model=None, max_batch_pairs: int = RERANK_MAX_BATCH_PAIRS,
+                 max_wait_ms: float = RERANK_MAX_WAIT_MS, model_batch_size: int = RERANK_BATCH_SIZE,
+                 max_passage_tokens: int = RERANK_MAX_PASSAGE_TOKENS, cache_size: int = RERANK_CACHE_SIZE,
+                 truncate_fn: Optional[Callable[[str], str]] = None):
+        if model is None:
+            from embeddings.embedder import get_reranker_model
+            model = get_reranker_model()
+        self.model = model
+        self.model_batch_size = model_batch_size
+        self.truncate = truncate_fn or tokenizer_truncation(model, max_passage_tokens)
+        self.cache = ScoreCache(cache_size)
+        self.batcher = MicroBatcher(self._score_requests, max_batch_pairs, max_wait_ms, size_fn=len)
+
+    def _score_requests(self, requests: List[List[Tuple[str, str]]]) -> List[List[float]]:
+        pairs = [pair for request in requests for pair in request]
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        scores = np.empty(len(pairs), dtype=np.float64)
+        for start in range(0, len(order), self.model_batch_size):
+            rows = order[start:start + self.model_batch_size]
+            scores[rows] = list(self.model.score([pairs[i] for i in rows]))
+        results, start = [], 0
+        for request in requests:
+            results.append(scores[start:start + len(request)].tolist())
+            start += len(request)
+        return results
+
+    def _split(self, query: str, documents: Sequence[Document]):
+        qhash = query_hash(query)
+        keys = [(qhash, passage_id(doc)) for doc in documents]
+        cached = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        pairs = [(query, self.truncate(documents[i].page_content)) for i in missing]
+        return keys, cached, missing, pairs
+
+    def _merge(self, keys, cached, missing, new_scores) -> List[float]:
+        fresh = {keys[i]: score for i, score in zip(missing, new_scores)}
+        self.cache.put_many(fresh)
+        return [cached[key] if key in cached else fresh[key] for key in keys]
+
+    def score(self, query: str, documents: Sequence[Document]) -> List[float]:
+        keys, cached, missing, pairs = self._split(query, documents)
+        new_scores = self.batcher.submit_wait(pairs) if pairs else []
+        return self._merge(keys, cached, missing, new_scores)
+
+    async def ascore(self, query: str, documents: Sequence[Document]) -> List[float]:
+        keys, cached, missing, pairs = self._split(query, documents)
+        new_scores = await self.batcher.submit(pairs) if pairs else []
+        return self._merge(keys, cached, missing, new_scores)
+
+    def rerank(self, query: str, documents: Sequence[Document], top_n: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """
+        Documents with their scores, best first.
+        """
+        ranked = sorted(zip(documents, self.score(query, documents)), key=lambda pair: -pair[1])
+        return ranked[:top_n] if top_n else ranked
+
+    def close(self):
+        self.batcher.close()
+
+
+class BatchedCrossEncoderReranker(BaseDocumentCompressor):
+    """
+    Drop-in replacement for LangChain's CrossEncoderReranker backed by a shared BatchedReranker.
+    """
+
+    reranker: Any
+    top_n: int = 3
+
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="forbid")
+
+    def compress_documents(self, documents: Sequence[Document], query: str,
+                           callbacks: Callbacks = None) -> Sequence[Document]:
+        return [doc for doc, _ in self.reranker.rerank(query, documents, self.top_n)]
+
+    async def acompress_documents(self, documents: Sequence[Document], query: str,
+                                  callbacks: Callbacks = None) -> Sequence[Document]:
+        scores = await self.reranker.ascore(query, documents)
+        ranked = sorted(zip(documents, scores), key=lambda pair: -pair[1])
+        return [doc for doc, _ in ranked[:self.top_n]]
@@ -0,0 +1,180 @@
+# batch_summarizer.py
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from config import (
+    SUMMARY_CACHE_MAX_BYTES,
+    SUMMARY_CACHE_MAX_ENTRIES,
+    SUMMARY_CACHE_PATH,
+    SUMMARY_MAX_CONCURRENCY,
+    SUMMARY_MAX_RETRIES,
+    SUMMARY_REQUESTS_PER_MINUTE,
+    SUMMARY_TOKENS_PER_MINUTE,
+)
+from raptor.summary_cache import SummaryCache
+
+_default_cache: Optional[SummaryCache] = None
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute and tokens per minute.
+    Both buckets start full, so up to one minute's budget can be spent in a burst.
+    A limit of 0 or None disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        self.requests_per_minute = requests_per_minute or 0
+        self.tokens_per_minute = tokens_per_minute or 0
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = float(self.requests_per_minute)
+        self._tokens = float(self.tokens_per_minute)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    @property
+    def counts_tokens(self) -> bool:
+        return self.tokens_per_minute > 0
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens: int = 0):
+        """
+        Waits until one request and `tokens` tokens are available, then consumes them.
+        Requests larger than the whole per-minute token budget are clamped to it.
+        """
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        async with self._lock:
+            self._refill()
+            while (wait := self._wait_time(tokens)) > 0:
+                await self._sleep(wait)
+                self._refill()
+            if self.requests_per_minute:
+                self._requests -= 1
+            self._tokens -= tokens
+
+
+def default_chain():
+    """
+    The summarization chain from raptor.summarizer, imported lazily so tests can run without an OpenAI key.
+    Returns (chain, identity).
+    """
+    from raptor.summarizer import chain, identity
+    return chain, identity
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """
+    The process-wide summary cache at SUMMARY_CACHE_PATH, or None when caching is disabled.
+    """
+    global _default_cache
+    if _default_cache is None and SUMMARY_CACHE_PATH:
+        _default_cache = SummaryCache(SUMMARY_CACHE_PATH, SUMMARY_CACHE_MAX_ENTRIES, SUMMARY_CACHE_MAX_BYTES)
+    return _default_cache
+
+
+async def _summarize_one(chain, context: str, index: int, semaphore: asyncio.Semaphore,
+                         rate_limiter: Optional[RateLimiter], max_retries: int,
+                         base_delay: float, max_delay: float,
+                         cache: Optional[SummaryCache] = None, cache_key: Optional[str] = None) -> str:
+    tokens = 0
+    if rate_limiter is not None and rate_limiter.counts_tokens:
+        from ingestion.utils import num_tokens_from_string
+        tokens = num_tokens_from_string(context)
+    async with semaphore:
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                await rate_limiter.acquire(tokens)
+            try:
+                summary = await chain.ainvoke({"context": context})
+            except Exception as e:
+                attempt += 1
+                if attempt > max_retries:
+                    logging.error(f"Summary {index} failed after {max_retries} retries: {e}")
+                    raise
+                # Exponential backoff with full jitter.
+                wait_time = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+                logging.warning(f"Summary {index} attempt {attempt} failed: {e}. Retrying in {wait_time:.1f} seconds...")
+                await asyncio.sleep(wait_time)
+                continue
+            if cache is not None:
+                cache.put(cache_key, summary)
+            return summary
+
+
+async def asummarize_texts(contexts: Sequence[str], chain=None, max_concurrency: Optional[int] = None,
+                           max_retries: Optional[int] = None, rate_limiter: Optional[RateLimiter] = None,
+                           base_delay: float = 1.0, max_delay: float = 60.0,
+                           cache: Optional[SummaryCache] = None, identity: Optional[str] = None) -> List[str]:
+    """
+    Summarizes many contexts concurrently.
+    At most max_concurrency requests are in flight; failed requests are retried with exponential backoff.
+    The i-th summary always belongs to the i-th context.
+    Summaries are looked up in / stored to the summary cache when an identity (prompt + model) is known:
+    the default chain brings its own, a custom chain needs `identity` to be cached.
+    """
+    if chain is None:
+        chain, default_identity = default_chain()
+        identity = identity or default_identity
+    if identity is not None and cache is None:
+        cache = get_summary_cache()
+    if identity is None:
+        cache = None
+    max_concurrency = max_concurrency or SUMMARY_MAX_CONCURRENCY
+    max_retries = SUMMARY_MAX_RETRIES if max_retries is None else max_retries
+    if rate_limiter is None and (SUMMARY_REQUESTS_PER_MINUTE or SUMMARY_TOKENS_PER_MINUTE):
+        rate_limiter = RateLimiter(SUMMARY_REQUESTS_PER_MINUTE, SUMMARY_TOKENS_PER_MINUTE)
+    summaries: List[Optional[str]] = [None] * len(contexts)
+    keys: List[Optional[str]] = [None] * len(contexts)
+    if cache is not None:
+        keys = [SummaryCache.make_key(context, identity) for context in contexts]
+        cached = cache.get_many(keys)
+        summaries = [cached.get(key) for key in keys]
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    if cache is not None:
+        logging.info(f"Summary cache: {len(contexts) - len(missing)} hits, {len(missing)} misses")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        _summarize_one(chain, contexts[i], i, semaphore, rate_limiter, max_retries, base_delay, max_delay, cache, keys[i])
+        for i in missing
+    ]
+    for i, summary in zip(missing, await asyncio.gather(*tasks)):
+        summaries[i] = summary
+    return summaries
+
+
+def summarize_texts(contexts: Sequence[str], **kwargs) -> List[str]:
+    """
+    Synchronous wrapper around asummarize_texts.
+    Called from a running event loop (the query service, a notebook), the batch runs in its own loop on a
+    worker thread and the caller blocks until it is done; async code should await asummarize_texts instead.
+    """
+    if not contexts:
+        return []
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(asummarize_texts(contexts, **kwargs))
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarize") as executor:
+        return executor.submit(asyncio.run, asummarize_texts(contexts, **kwargs)).result()
@@ -0,0 +1,269 @@
+# checkpoint.py
+import glob
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import CHECKPOINT_SUMMARY_BATCH
+from raptor.clustering import ClusterModel
+from raptor.tree_builder import embed_fit_cluster_texts, expand_clusters, summarize_clusters
+
+TreeResults = Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]
+
+MANIFEST = "checkpoint.json"
+
+
+def _path(checkpoint_dir: str, name: str) -> str:
+    return os.path.join(checkpoint_dir, name)
+
+
+def _fingerprint(texts: List[str]) -> str:
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _write_table(table: pa.Table, path: str):
+    """
+    Writes through a temporary file so a crash never leaves a truncated Parquet file behind.
+    """
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def _write_json(data: dict, path: str):
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest(checkpoint_dir: str) -> Optional[dict]:
+    path = _path(checkpoint_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_clusters(checkpoint_dir: str, level: int, df_clusters: pd.DataFrame, cluster_model: ClusterModel):
+    """
+    Stores a level's texts, embeddings (fixed-size float32 lists) and cluster memberships, plus its fitted model.
+    """
+    vectors = np.stack(df_clusters["embd"].tolist()).astype(np.float32)
+    table = pa.table({
+        "text": pa.array(df_clusters["text"].tolist(), pa.string()),
+        "embd": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), vectors.shape[1]),
+        "cluster": pa.array([np.asarray(c, dtype=np.int64) for c in df_clusters["cluster"]], pa.list_(pa.int64())),
+    })
+    _write_table(table, _path(checkpoint_dir, f"level_{level}_clusters.parquet"))
+    with open(_path(checkpoint_dir, f"level_{level}_model.pkl.tmp"), "wb") as file:
+        pickle.dump(cluster_model, file)
+    os.replace(_path(checkpoint_dir, f"level_{level}_model.pkl.tmp"), _path(checkpoint_dir, f"level_{level}_model.pkl"))
+
+
+def read_clusters(checkpoint_dir: str, level: int) -> Tuple[pd.DataFrame, ClusterModel]:
+    table = pq.read_table(_path(checkpoint_dir, f"level_{level}_clusters.parquet"))
+    embd = table.column("embd").combine_chunks()
+    vectors = embd.flatten().to_numpy().reshape(len(table), embd.type.list_size)
+    df_clusters = pd.DataFrame({
+        "text": table.column("text").to_pylist(),
+        "embd": list(vectors),
+        "cluster": [np.asarray(c, dtype=np.int64) for c in table.column("cluster").to_pylist()],
+    })
+    with open(_path(checkpoint_dir, f"level_{level}_model.pkl"), "rb") as file:
+        cluster_model = pickle.load(file)
+    return df_clusters, cluster_model
+
+
+def write_summary(checkpoint_dir: str, level: int, df_summary: pd.DataFrame):
+    _write_table(pa.Table.from_pandas(df_summary, preserve_index=False),
+                 _path(checkpoint_dir, f"level_{level}_summary.parquet"))
+
+
+def read_summary(checkpoint_dir: str, level: int) -> pd.DataFrame:
+    return pq.read_table(_path(checkpoint_dir, f"level_{level}_summary.parquet")).to_pandas()
+
+
+def _parts_dir(checkpoint_dir: str, level: int) -> str:
+    return _path(checkpoint_dir, f"level_{level}_summary_parts")
+
+
+def _read_parts(checkpoint_dir: str, level: int) -> Dict[int, str]:
+    """
+    Summaries of the clusters finished before an interruption, by cluster id.
+    """
+    done: Dict[int, str] = {}
+    for part in sorted(glob.glob(os.path.join(_parts_dir(checkpoint_dir, level), "part-*.parquet"))):
+        table = pq.read_table(part)
+        done |= dict(zip(table.column("cluster").to_pylist(), table.column("summaries").to_pylist()))
+    return done
+
+
+def _write_part(checkpoint_dir: str, level: int, clusters: List[int], summaries: List[str]):
+    parts_dir = _parts_dir(checkpoint_dir, level)
+    os.makedirs(parts_dir, exist_ok=True)
+    n = len(glob.glob(os.path.join(parts_dir, "part-*.parquet")))
+    table = pa.table({"cluster": pa.array(clusters, pa.int64()), "summaries": pa.array(summaries, pa.string())})
+    _write_table(table, os.path.join(parts_dir, f"part-{n:05d}.parquet"))
+
+
+def _remove_parts(checkpoint_dir: str, level: int):
+    parts_dir = _parts_dir(checkpoint_dir, level)
+    for part in glob.glob(os.path.join(parts_dir, "part-*.parquet")):
+        os.remove(part)
+    if os.path.isdir(parts_dir):
+        os.rmdir(parts_dir)
+
+
+def _summarize_level(checkpoint_dir: str, level: int, df_clusters: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarizes the clusters of a level in batches, writing each finished batch to disk;
+    clusters summarized by an earlier, interrupted run are skipped.
+    """
+    expanded_df = expand_clusters(df_clusters)
+    all_clusters = [int(c) for c in expanded_df["cluster"].unique()]
+    done = _read_parts(checkpoint_dir, level)
+    todo = [c for c in all_clusters if c not in done]
+    print(f"--Generated {len(all_clusters)} clusters at level {level}, {len(all_clusters) - len(todo)} already summarized--")
+    for start in range(0, len(todo), CHECKPOINT_SUMMARY_BATCH):
+        batch = todo[start:start + CHECKPOINT_SUMMARY_BATCH]
+        summaries = summarize_clusters(expanded_df, batch)
+        _write_part(checkpoint_dir, level, batch, summaries)
+        done |= dict(zip(batch, summaries))
+    return pd.DataFrame({
+        "summaries": [done[c] for c in all_clusters],
+        "level": [level] * len(all_clusters),
+        "cluster": all_clusters,
+    })
+
+
+def _mark_complete(checkpoint_dir: str, manifest: dict, level: int, finished: bool):
+    manifest["completed"] = sorted(set(manifest["completed"]) | {level})
+    manifest["finished"] = finished
+    _write_json(manifest, _path(checkpoint_dir, MANIFEST))
+
+
+def load_checkpoint(checkpoint_dir: str) -> Tuple[TreeResults, Dict[int, ClusterModel]]:
+    """
+    Loads the completed levels of a checkpoint.
+    """
+    manifest = read_manifest(checkpoint_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No tree checkpoint in {checkpoint_dir}")
+    tree_results, cluster_models = {}, {}
+    for level in manifest["completed"]:
+        df_clusters, cluster_models[level] = read_clusters(checkpoint_dir, level)
+        tree_results[level] = (df_clusters, read_summary(checkpoint_dir, level))
+    return tree_results, cluster_models
+
+
+def save_checkpoint(checkpoint_dir: str, tree_results: TreeResults, cluster_models: Dict[int, ClusterModel],
+                    n_levels: Optional[int] = None):
+    """
+    Writes a complete tree as a finished checkpoint, dropping files of levels it no longer has.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    manifest = read_manifest(checkpoint_dir) or {}
+    for level in manifest.get("completed", []):
+        if level not in tree_results:
+            for name in (f"level_{level}_clusters.parquet", f"level_{level}_summary.parquet", f"level_{level}_model.pkl"):
+                if os.path.exists(_path(checkpoint_dir, name)):
+                    os.remove(_path(checkpoint_dir, name))
+    for level, (df_clusters, df_summary) in tree_results.items():
+        write_clusters(checkpoint_dir, level, df_clusters, cluster_models[level])
+        write_summary(checkpoint_dir, level, df_summary)
+    leaves = tree_results[min(tree_results)][0]["text"].tolist()
+    _write_table(pa.table({"text": pa.array(leaves, pa.string())}), _path(checkpoint_dir, "input.parquet"))
+    _write_json({
+        "n_levels": n_levels or manifest.get("n_levels") or max(tree_results),
+        "input": _fingerprint(leaves),
+        "completed": sorted(tree_results),
+        "finished": True,
+    }, _path(checkpoint_dir, MANIFEST))
+
+
+def clear_checkpoint(checkpoint_dir: str):
+    """
+    Removes the checkpoint files from checkpoint_dir, the manifest first so an interrupted clear
+    leaves no checkpoint rather than a partial one.
+    """
+    for name in (MANIFEST, "input.parquet"):
+        if os.path.exists(_path(checkpoint_dir, name)):
+            os.remove(_path(checkpoint_dir, name))
+    for path in glob.glob(_path(checkpoint_dir, "level_*")):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def build_tree_checkpointed(texts: List[str], checkpoint_dir: str, n_levels: int = 3,
+                            cluster_models: Optional[Dict[int, ClusterModel]] = None,
+                            resume: bool = False) -> TreeResults:
+    """
+    Builds the RAPTOR tree like recursive_embed_cluster_summarize, but checkpoints to checkpoint_dir:
+    each level's clusters and embeddings are written once clustered, its summaries once complete,
+    and cluster summaries in batches of CHECKPOINT_SUMMARY_BATCH while the level is summarized.
+    Calling it again with the same texts after an interruption skips everything already on disk.
+    A finished checkpoint or one of other texts is discarded and the tree built from scratch, unless
+    resume is set (resume_tree): then a finished checkpoint is loaded and other texts are an error.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    fingerprint = _fingerprint(texts)
+    manifest = read_manifest(checkpoint_dir)
+    if manifest is not None and manifest["input"] != fingerprint and resume:
+        raise ValueError(f"Checkpoint in {checkpoint_dir} was built from different texts")
+    if manifest is not None and not resume and (manifest["input"] != fingerprint or manifest["finished"]):
+        clear_checkpoint(checkpoint_dir)
+        manifest = None
+    if manifest is None:
+        _write_table(pa.table({"text": pa.array(texts, pa.string())}), _path(checkpoint_dir, "input.parquet"))
+        manifest = {"n_levels": n_levels, "input": fingerprint, "completed": [], "finished": False}
+        _write_json(manifest, _path(checkpoint_dir, MANIFEST))
+    manifest["n_levels"] = n_levels
+
+    cluster_models = {} if cluster_models is None else cluster_models
+    tree_results: TreeResults = {}
+    level, level_texts = 1, texts
+    while True:
+        if level in manifest["completed"]:
+            print(f"--Level {level} loaded from checkpoint--")
+            df_clusters, cluster_models[level] = read_clusters(checkpoint_dir, level)
+            df_summary = read_summary(checkpoint_dir, level)
+        else:
+            if os.path.exists(_path(checkpoint_dir, f"level_{level}_clusters.parquet")):
+                df_clusters, cluster_models[level] = read_clusters(checkpoint_dir, level)
+            else:
+                df_clusters, cluster_models[level] = embed_fit_cluster_texts(level_texts)
+                write_clusters(checkpoint_dir, level, df_clusters, cluster_models[level])
+            df_summary = _summarize_level(checkpoint_dir, level, df_clusters)
+            write_summary(checkpoint_dir, level, df_summary)
+        tree_results[level] = (df_clusters, df_summary)
+        finished = not (level < n_levels and df_summary["cluster"].nunique() > 1)
+        if level not in manifest["completed"] or finished != manifest["finished"]:
+            _mark_complete(checkpoint_dir, manifest, level, finished)
+            _remove_parts(checkpoint_dir, level)
+        if finished:
+            return tree_results
+        level, level_texts = level + 1, df_summary["summaries"].tolist()
+
+
+def resume_tree(checkpoint_dir: str, n_levels: Optional[int] = None) -> TreeResults:
+    """
+    Continues an interrupted build from its checkpoint, using the texts and level count it was started with.
+    """
+    manifest = read_manifest(checkpoint_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No tree checkpoint in {checkpoint_dir}")
+    texts = pq.read_table(_path(checkpoint_dir, "input.parquet")).column("text").to_pylist()
+    return build_tree_checkpointed(texts, checkpoint_dir, n_levels or manifest["n_levels"], resume=True)
@@ -2,60 +2,235 @@
 import numpy as np
 import umap
 from sklearn.mixture import GaussianMixture
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple
+from config import (CLUSTER_N_JOBS, CLUSTER_PARALLEL_MIN_SAMPLES, CLUSTER_SEARCH, CLUSTER_PATIENCE,
+                    CLUSTER_LOCAL_EXECUTOR, CLUSTER_LOCAL_WORKERS)
+from raptor.model_selection import get_executor, resolve_n_jobs, select_n_clusters
 
 RANDOM_SEED = 224  # Fixed seed for reproducibility
 
-def global_cluster_embeddings(embeddings: np.ndarray, dim: int, n_neighbors: Optional[int] = None, metric: str = "cosine") -> np.ndarray:
+def _fit_global_reducer(embeddings: np.ndarray, dim: int, n_neighbors: Optional[int] = None, metric: str = "cosine") -> Tuple[umap.UMAP, np.ndarray]:
     if n_neighbors is None:
         n_neighbors = int((len(embeddings) - 1) ** 0.5)
     reducer = umap.UMAP(n_neighbors=n_neighbors, n_components=dim, metric=metric, random_state=RANDOM_SEED)
-    return reducer.fit_transform(embeddings) # type: ignore
+    return reducer, reducer.fit_transform(embeddings) # type: ignore
 
-def local_cluster_embeddings(embeddings: np.ndarray, dim: int, num_neighbors: int = 10, metric: str = "cosine") -> np.ndarray:
+def _fit_local_reducer(embeddings: np.ndarray, dim: int, num_neighbors: int = 10, metric: str = "cosine") -> Tuple[umap.UMAP, np.ndarray]:
     reducer = umap.UMAP(n_neighbors=num_neighbors, n_components=dim, metric=metric, random_state=RANDOM_SEED)
-    return reducer.fit_transform(embeddings) # type: ignore
-
-def get_optimal_clusters(embeddings: np.ndarray, max_clusters: int = 50) -> int:
-    max_clusters = min(max_clusters, len(embeddings))
-    n_clusters = np.arange(1, max_clusters)
-    bics = []
-    for n in n_clusters:
-        gm = GaussianMixture(n_components=n, random_state=RANDOM_SEED)
-        gm.fit(embeddings)
-        bics.append(gm.bic(embeddings))
-    return int(n_clusters[np.argmin(bics)])
+    return reducer, reducer.fit_transform(embeddings) # type: ignore
 
-def GMM_cluster(embeddings: np.ndarray, threshold: float, random_state: int = 0):
-    n_clusters = get_optimal_clusters(embeddings)
+def global_cluster_embeddings(embeddings: np.ndarray, dim: int, n_neighbors: Optional[int] = None, metric: str = "cosine") -> np.ndarray:
+    return _fit_global_reducer(embeddings, dim, n_neighbors, metric)[1]
+
+def local_cluster_embeddings(embeddings: np.ndarray, dim: int, num_neighbors: int = 10, metric: str = "cosine") -> np.ndarray:
+    return _fit_local_reducer(embeddings, dim, num_neighbors, metric)[1]
+
+def get_optimal_clusters(embeddings: np.ndarray, max_clusters: int = 50, n_jobs: Optional[int] = None,
+                         search: Optional[str] = None, patience: Optional[int] = None) -> int:
+    """
+    Returns the GMM component count with the lowest BIC, see raptor.model_selection.select_n_clusters.
+    Unset arguments fall back to CLUSTER_N_JOBS, CLUSTER_SEARCH and CLUSTER_PATIENCE from config;
+    selections over fewer than CLUSTER_PARALLEL_MIN_SAMPLES embeddings run in this process.
+    """
+    result = select_n_clusters(
+        embeddings,
+        max_clusters=max_clusters,
+        random_state=RANDOM_SEED,
+        n_jobs=CLUSTER_N_JOBS if n_jobs is None else n_jobs,
+        search=search or CLUSTER_SEARCH,
+        patience=CLUSTER_PATIENCE if patience is None else patience,
+        min_parallel_samples=CLUSTER_PARALLEL_MIN_SAMPLES,
+    )
+    return result.n_clusters
+
+def _fit_gmm(embeddings: np.ndarray, threshold: float, random_state: int = 0, n_jobs: Optional[int] = None) -> Tuple[GaussianMixture, np.ndarray]:
+    n_clusters = get_optimal_clusters(embeddings, n_jobs=n_jobs)
     gm = GaussianMixture(n_components=n_clusters, random_state=random_state)
     gm.fit(embeddings)
     probs = gm.predict_proba(embeddings)
     # Each embedding may be associated with one or more clusters based on the threshold.
-    labels = [np.where(prob > threshold)[0] for prob in probs]
+    return gm, probs > threshold
+
+def GMM_membership(embeddings: np.ndarray, threshold: float, random_state: int = 0, n_jobs: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """
+    Fits a GMM and returns a boolean (n_samples, n_clusters) membership mask.
+    """
+    gm, mask = _fit_gmm(embeddings, threshold, random_state, n_jobs)
+    return mask, gm.n_components
+
+def GMM_cluster(embeddings: np.ndarray, threshold: float, random_state: int = 0):
+    mask, n_clusters = GMM_membership(embeddings, threshold, random_state)
+    labels = [np.flatnonzero(row) for row in mask]
     return labels, n_clusters
 
-def perform_clustering(embeddings: np.ndarray, dim: int, threshold: float) -> List[np.ndarray]:
+class LocalClusterModel:
+    """
+    Fitted local stage of one global cluster; reducer and gmm are None when the
+    cluster was too small to split (all members go to local cluster 0).
+    """
+
+    def __init__(self, global_cluster: int, offset: int, n_clusters: int,
+                 reducer: Optional[umap.UMAP] = None, gmm: Optional[GaussianMixture] = None):
+        self.global_cluster = global_cluster
+        self.offset = offset
+        self.n_clusters = n_clusters
+        self.reducer = reducer
+        self.gmm = gmm
+
+
+class ClusterModel:
+    """
+    Fitted reducers and mixtures of one cluster_membership call.
+    assign() maps new embeddings to the existing cluster ids without refitting.
+    """
+
+    def __init__(self, dim: int, threshold: float, n_clusters: int,
+                 global_reducer: Optional[umap.UMAP] = None, global_gmm: Optional[GaussianMixture] = None,
+                 local_models: Optional[List[LocalClusterModel]] = None, outlier_score: Optional[float] = None):
+        self.dim = dim
+        self.threshold = threshold
+        self.n_clusters = n_clusters
+        self.global_reducer = global_reducer
+        self.global_gmm = global_gmm
+        self.local_models = local_models or []
+        # Global log-likelihood below which a point counts as an outlier (5th percentile of the training data).
+        self.outlier_score = outlier_score
+
+    def assign(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns CSR membership (offsets, cluster_ids) of new embeddings plus a boolean outlier mask:
+        points no cluster accepts or that are unlikely under the global mixture.
+        """
+        n_rows = len(embeddings)
+        if self.global_gmm is None:
+            offsets = np.arange(n_rows + 1, dtype=np.int64)
+            return offsets, np.zeros(n_rows, dtype=np.int64), np.zeros(n_rows, dtype=bool)
+        reduced = self.global_reducer.transform(embeddings)
+        global_mask = self.global_gmm.predict_proba(reduced) > self.threshold
+        outliers = self.global_gmm.score_samples(reduced) < self.outlier_score
+        rows, cluster_ids = [], []
+        for local in self.local_models:
+            global_idx = np.flatnonzero(global_mask[:, local.global_cluster])
+            if len(global_idx) == 0:
+                continue
+            if local.gmm is None:
+                local_mask = np.ones((len(global_idx), 1), dtype=bool)
+            else:
+                local_reduced = local.reducer.transform(embeddings[global_idx])
+                local_mask = local.gmm.predict_proba(local_reduced) > self.threshold
+            member_pos, local_ids = np.nonzero(local_mask)
+            rows.append(global_idx[member_pos])
+            cluster_ids.append(local_ids + local.offset)
+        if rows:
+            offsets, ids = membership_to_csr(np.concatenate(rows), np.concatenate(cluster_ids), n_rows)
+        else:
+            offsets, ids = np.zeros(n_rows + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return offsets, ids, outliers | (np.diff(offsets) == 0)
+
+
+def _fit_local(embeddings: np.ndarray, dim: int, threshold: float, n_jobs: Optional[int] = None
+               ) -> Tuple[np.ndarray, Optional[umap.UMAP], Optional[GaussianMixture]]:
+    """
+    Runs the local reduction + GMM pass for the members of one global cluster.
+    Returns a boolean (n_members, n_local_clusters) membership mask and the fitted reducer and mixture.
+    """
     if len(embeddings) <= dim + 1:
-        return [np.array([0]) for _ in range(len(embeddings))]
-    reduced_embeddings_global = global_cluster_embeddings(embeddings, dim)
-    global_clusters, n_global_clusters = GMM_cluster(reduced_embeddings_global, threshold)
-    all_local_clusters = [np.array([]) for _ in range(len(embeddings))]
+        return np.ones((len(embeddings), 1), dtype=bool), None, None
+    reducer, reduced_embeddings_local = _fit_local_reducer(embeddings, dim)
+    gm, mask = _fit_gmm(reduced_embeddings_local, threshold, n_jobs=n_jobs)
+    return mask, reducer, gm
+
+def _local_fits(groups: List[np.ndarray], dim: int, threshold: float,
+                executor: Optional[str], max_workers: Optional[int]) -> List[Tuple[np.ndarray, Optional[umap.UMAP], Optional[GaussianMixture]]]:
+    """
+    Runs the local passes of all global clusters, sequentially or on a thread/process pool.
+    Returns (mask, reducer, gmm) per group, see _fit_local.
+    Results come back in the order of `groups` whichever mode is used.
+    """
+    if not executor or len(groups) <= 1:
+        return [_fit_local(group, dim, threshold) for group in groups]
+    if executor == "thread":
+        with ThreadPoolExecutor(max_workers=resolve_n_jobs(max_workers)) as pool:
+            return list(pool.map(lambda group: _fit_local(group, dim, threshold), groups))
+    if executor == "process":
+        # Each worker already is one of many parallel tasks: fit its BIC candidates in-process.
+        pool = get_executor(resolve_n_jobs(max_workers))
+        futures = [pool.submit(_fit_local, group, dim, threshold, 1) for group in groups]
+        return [future.result() for future in futures]
+    raise ValueError(f"Unknown local clustering executor: {executor}")
+
+def membership_to_csr(rows: np.ndarray, cluster_ids: np.ndarray, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Packs (row, cluster id) pairs into CSR form.
+    Returns (offsets, cluster_ids): the clusters of row i are cluster_ids[offsets[i]:offsets[i + 1]],
+    sorted ascending.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cluster_ids = np.asarray(cluster_ids, dtype=np.int64)
+    order = np.lexsort((cluster_ids, rows))
+    counts = np.bincount(rows, minlength=n_rows)
+    offsets = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, cluster_ids[order]
+
+def csr_to_labels(offsets: np.ndarray, cluster_ids: np.ndarray) -> List[np.ndarray]:
+    """
+    Expands CSR membership into one array of cluster ids per row.
+    """
+    return np.split(cluster_ids, offsets[1:-1])
+
+def fit_cluster_model(embeddings: np.ndarray, dim: int, threshold: float,
+                      executor: Optional[str] = None, max_workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, ClusterModel]:
+    """
+    cluster_membership that also returns the fitted ClusterModel, for incremental updates.
+    """
+    executor = CLUSTER_LOCAL_EXECUTOR if executor is None else executor
+    max_workers = CLUSTER_LOCAL_WORKERS if max_workers is None else max_workers
+    n_rows = len(embeddings)
+    if n_rows <= dim + 1:
+        offsets, ids = np.arange(n_rows + 1, dtype=np.int64), np.zeros(n_rows, dtype=np.int64)
+        return offsets, ids, ClusterModel(dim, threshold, n_clusters=1)
+    global_reducer, reduced_embeddings_global = _fit_global_reducer(embeddings, dim)
+    global_gmm, global_mask = _fit_gmm(reduced_embeddings_global, threshold)
+    global_indices = [(i, np.flatnonzero(global_mask[:, i])) for i in range(global_gmm.n_components)]
+    global_indices = [(i, idx) for i, idx in global_indices if len(idx) > 0]
+    local_fits = _local_fits([embeddings[idx] for _, idx in global_indices], dim, threshold, executor, max_workers)
+    rows, cluster_ids, local_models = [], [], []
     total_clusters = 0
-    for i in range(n_global_clusters):
-        global_cluster_embeddings_ = embeddings[np.array([i in gc for gc in global_clusters])]
-        if len(global_cluster_embeddings_) == 0:
-            continue
-        if len(global_cluster_embeddings_) <= dim + 1:
-            local_clusters = [np.array([0]) for _ in global_cluster_embeddings_]
-            n_local_clusters = 1
-        else:
-            reduced_embeddings_local = local_cluster_embeddings(global_cluster_embeddings_, dim)
-            local_clusters, n_local_clusters = GMM_cluster(reduced_embeddings_local, threshold)
-        for j in range(n_local_clusters):
-            local_cluster_embeddings_ = global_cluster_embeddings_[np.array([j in lc for lc in local_clusters])]
-            indices = np.where((embeddings == local_cluster_embeddings_[:, None]).all(-1))[1]
-            for idx in indices:
-                all_local_clusters[idx] = np.append(all_local_clusters[idx], j + total_clusters)
-        total_clusters += n_local_clusters
-    return all_local_clusters
+    for (i, global_idx), (local_mask, reducer, gmm) in zip(global_indices, local_fits):
+        member_pos, local_ids = np.nonzero(local_mask)
+        rows.append(global_idx[member_pos])
+        cluster_ids.append(local_ids + total_clusters)
+        local_models.append(LocalClusterModel(i, total_clusters, local_mask.shape[1], reducer, gmm))
+        total_clusters += local_mask.shape[1]
+    model = ClusterModel(
+        dim, threshold, total_clusters, global_reducer, global_gmm, local_models,
+        outlier_score=float(np.percentile(global_gmm.score_samples(reduced_embeddings_global), 5)),
+    )
+    if not rows:
+        return np.zeros(n_rows + 1, dtype=np.int64), np.zeros(0, dtype=np.int64), model
+    offsets, ids = membership_to_csr(np.concatenate(rows), np.concatenate(cluster_ids), n_rows)
+    return offsets, ids, model
+
+def cluster_membership(embeddings: np.ndarray, dim: int, threshold: float,
+                       executor: Optional[str] = None, max_workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Two-stage (global, then local) soft clustering.
+    Row indices are carried explicitly through both stages, so duplicate embeddings are
+    handled correctly and no pairwise embedding comparisons are needed.
+    The independent local passes run on a "thread" or "process" pool when executor is set
+    (default CLUSTER_LOCAL_EXECUTOR); cluster ids are assigned in global cluster order afterwards,
+    so the result is identical to the sequential path.
+    Returns CSR membership (offsets, cluster_ids), see membership_to_csr.
+    """
+    offsets, cluster_ids, _ = fit_cluster_model(embeddings, dim, threshold, executor, max_workers)
+    return offsets, cluster_ids
+
+def perform_clustering(embeddings: np.ndarray, dim: int, threshold: float,
+                       executor: Optional[str] = None, max_workers: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Returns, for every embedding, the array of cluster ids it belongs to.
+    """
+    offsets, cluster_ids = cluster_membership(embeddings, dim, threshold, executor, max_workers)
+    return csr_to_labels(offsets, cluster_ids)
@@ -0,0 +1,117 @@
+# incremental.py
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from config import INCREMENTAL_DRIFT_THRESHOLD
+from raptor.checkpoint import TreeResults, build_tree_checkpointed, load_checkpoint, save_checkpoint
+from raptor.clustering import ClusterModel, csr_to_labels
+from raptor.tree_builder import embed, expand_clusters, recursive_embed_cluster_summarize, summarize_clusters
+
+
+def save_tree_state(state_dir: str, tree_results: TreeResults, cluster_models: Dict[int, ClusterModel],
+                    n_levels: Optional[int] = None):
+    """
+    Persists the tree and the fitted cluster models in the checkpoint format of raptor.checkpoint.
+    """
+    save_checkpoint(state_dir, tree_results, cluster_models, n_levels)
+
+
+def load_tree_state(state_dir: str) -> Tuple[TreeResults, Dict[int, ClusterModel]]:
+    return load_checkpoint(state_dir)
+
+
+def build_tree(texts: List[str], state_dir: str, n_levels: int = 3) -> TreeResults:
+    """
+    Full build that also persists the state needed by update_tree.
+    The build is checkpointed, so calling it again after a crash resumes it; the state of an earlier
+    finished build (or of other texts) is replaced.
+    """
+    return build_tree_checkpointed(texts, state_dir, n_levels)
+
+
+def _refresh_texts(df_clusters: pd.DataFrame, positions: List[int], texts: List[str]):
+    """
+    Replaces the texts at the given row positions and re-embeds them.
+    """
+    all_texts = df_clusters["text"].tolist()
+    all_vectors = list(df_clusters["embd"])
+    for pos, text, vector in zip(positions, texts, embed(texts)):
+        all_texts[pos] = text
+        all_vectors[pos] = vector
+    df_clusters["text"] = all_texts
+    df_clusters["embd"] = all_vectors
+
+
+def update_tree(new_texts: List[str], state_dir: str, n_levels: int = 3,
+                drift_threshold: Optional[float] = None) -> TreeResults:
+    """
+    Adds leaves to a persisted tree without rebuilding it.
+
+    New texts are assigned to the existing clusters of each level with the fitted UMAP/GMM models.
+    Only clusters whose membership changed are re-summarized. Their summaries are the texts one
+    level up, so the change propagates as dirty flags: a changed summary is re-embedded and its
+    clusters are re-summarized. Summaries of clusters that had no members before are new texts
+    one level up and are assigned like new leaves. Existing texts keep their memberships.
+    If the share of outliers among a level's new texts exceeds drift_threshold, that level and
+    everything above it are re-clustered from scratch.
+    """
+    drift_threshold = INCREMENTAL_DRIFT_THRESHOLD if drift_threshold is None else drift_threshold
+    tree_results, cluster_models = load_tree_state(state_dir)
+    incoming: List[str] = list(new_texts)
+    changed: Dict[int, str] = {}
+    level = min(tree_results)
+    while level in tree_results and (incoming or changed):
+        df_clusters, df_summary = tree_results[level]
+        df_clusters = df_clusters.copy()
+        dirty: Set[int] = set()
+        if changed:
+            positions = sorted(changed)
+            _refresh_texts(df_clusters, positions, [changed[pos] for pos in positions])
+            for pos in positions:
+                dirty.update(int(c) for c in df_clusters.at[pos, "cluster"])
+        if incoming:
+            vectors = embed(incoming)
+            offsets, cluster_ids, outliers = cluster_models[level].assign(vectors)
+            drift = float(outliers.mean())
+            logging.info(f"Level {level}: {len(incoming)} new texts, drift {drift:.3f} (threshold {drift_threshold})")
+            if drift > drift_threshold:
+                logging.info(f"Drift above threshold, re-clustering levels {level}..{n_levels}")
+                texts = df_clusters["text"].tolist() + incoming
+                rebuilt_models: Dict[int, ClusterModel] = {}
+                rebuilt = recursive_embed_cluster_summarize(texts, level, n_levels, rebuilt_models)
+                tree_results = {l: r for l, r in tree_results.items() if l < level} | rebuilt
+                cluster_models = {l: m for l, m in cluster_models.items() if l < level} | rebuilt_models
+                save_tree_state(state_dir, tree_results, cluster_models, n_levels)
+                return tree_results
+            appended = pd.DataFrame({
+                "text": incoming,
+                "embd": list(vectors),
+                "cluster": csr_to_labels(offsets, cluster_ids),
+            })
+            df_clusters = pd.concat([df_clusters, appended], ignore_index=True)
+            dirty.update(int(c) for c in cluster_ids)
+
+        expanded_df = expand_clusters(df_clusters)
+        dirty_clusters = [c for c in expanded_df["cluster"].unique() if c in dirty]
+        print(f"--Re-summarizing {len(dirty_clusters)} changed clusters at level {level}--")
+        summaries = summarize_clusters(expanded_df, dirty_clusters)
+        positions = {int(c): pos for pos, c in enumerate(df_summary["cluster"])}
+        df_summary = df_summary.copy()
+        changed, incoming, new_rows = {}, [], []
+        for cluster, summary in zip(dirty_clusters, summaries):
+            pos = positions.get(int(cluster))
+            if pos is None:
+                new_rows.append({"summaries": summary, "level": level, "cluster": cluster})
+                incoming.append(summary)
+            elif df_summary.at[pos, "summaries"] != summary:
+                df_summary.at[pos, "summaries"] = summary
+                changed[pos] = summary
+        if new_rows:
+            df_summary = pd.concat([df_summary, pd.DataFrame(new_rows)], ignore_index=True)
+        tree_results[level] = (df_clusters, df_summary)
+        level += 1
+
+    save_tree_state(state_dir, tree_results, cluster_models, n_levels)
+    return tree_results
@@ -0,0 +1,177 @@
+# model_selection.py
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.mixture import GaussianMixture
+
+SEARCH_EXHAUSTIVE = "exhaustive"
+SEARCH_COARSE_TO_FINE = "coarse_to_fine"
+
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+class ModelSelectionResult(NamedTuple):
+    n_clusters: int
+    bics: Dict[int, float]      # BIC for every evaluated k
+    timings: Dict[int, float]   # fit time in seconds for every evaluated k
+    wall_time: float
+
+    def report(self) -> str:
+        """
+        Formats the per-k BIC and fit time as a small table.
+        """
+        lines = [f"{'k':>4} {'bic':>14} {'fit_s':>8}"]
+        for k in sorted(self.bics):
+            marker = " *" if k == self.n_clusters else ""
+            lines.append(f"{k:>4} {self.bics[k]:>14.2f} {self.timings[k]:>8.3f}{marker}")
+        fit_total = sum(self.timings.values())
+        lines.append(f"fit total {fit_total:.3f}s, wall {self.wall_time:.3f}s, speedup {fit_total / max(self.wall_time, 1e-9):.1f}x")
+        return "\n".join(lines)
+
+
+def fit_bic(embeddings: np.ndarray, n_components: int, random_state: int) -> Tuple[int, float, float]:
+    """
+    Fits one GaussianMixture and returns (k, bic, fit seconds).
+    """
+    start = time.perf_counter()
+    gm = GaussianMixture(n_components=n_components, random_state=random_state)
+    gm.fit(embeddings)
+    return n_components, float(gm.bic(embeddings)), time.perf_counter() - start
+
+
+def get_executor(n_jobs: int) -> ProcessPoolExecutor:
+    """
+    Returns a process pool shared by all model-selection calls with the same worker count.
+    Workers are spawned rather than forked: forking after UMAP/OpenMP threads have started can deadlock.
+    """
+    with _executors_lock:
+        if n_jobs not in _executors:
+            _executors[n_jobs] = ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"))
+        return _executors[n_jobs]
+
+
+@atexit.register
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+def resolve_n_jobs(n_jobs: Optional[int]) -> int:
+    if n_jobs is None or n_jobs <= 0:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def _evaluate(embeddings: np.ndarray, candidates: Sequence[int], random_state: int,
+              n_jobs: int, executor: Optional[Executor]) -> Dict[int, Tuple[float, float]]:
+    if n_jobs == 1 or len(candidates) <= 1:
+        results = [fit_bic(embeddings, k, random_state) for k in candidates]
+    else:
+        pool = executor or get_executor(n_jobs)
+        futures = [pool.submit(fit_bic, embeddings, k, random_state) for k in candidates]
+        results = [f.result() for f in futures]
+    return {k: (bic, seconds) for k, bic, seconds in results}
+
+
+def _first_stop(ks: Sequence[int], bics: Sequence[float], patience: Optional[int]) -> Optional[int]:
+    """
+    Position of the k at which a sequential scan would stop: BIC rose for `patience` consecutive k.
+    """
+    if not patience:
+        return None
+    rising = 0
+    for pos in range(1, len(ks)):
+        rising = rising + 1 if bics[pos] > bics[pos - 1] else 0
+        if rising >= patience:
+            return pos
+    return None
+
+
+def _scan(embeddings: np.ndarray, candidates: List[int], random_state: int, n_jobs: int,
+          patience: Optional[int], executor: Optional[Executor]) -> Dict[int, Tuple[float, float]]:
+    """
+    Evaluates candidates in ascending order, in waves of n_jobs, honouring early stopping.
+    Results past the sequential stopping point are discarded, so the outcome does not depend on n_jobs.
+    """
+    if not patience:
+        return _evaluate(embeddings, candidates, random_state, n_jobs, executor)
+    evaluated: Dict[int, Tuple[float, float]] = {}
+    for start in range(0, len(candidates), n_jobs):
+        evaluated |= _evaluate(embeddings, candidates[start:start + n_jobs], random_state, n_jobs, executor)
+        ks = candidates[:start + n_jobs]
+        stop = _first_stop(ks, [evaluated[k][0] for k in ks], patience)
+        if stop is not None:
+            return {k: evaluated[k] for k in ks[:stop + 1]}
+    return evaluated
+
+
+def geometric_candidates(max_k: int) -> List[int]:
+    """
+    1, 2, 4, 8, ... up to and including max_k.
+    """
+    ks, k = [], 1
+    while k < max_k:
+        ks.append(k)
+        k *= 2
+    ks.append(max_k)
+    return ks
+
+
+def select_n_clusters(embeddings: np.ndarray, max_clusters: int = 50, random_state: int = 0,
+                      n_jobs: Optional[int] = 1, search: str = SEARCH_EXHAUSTIVE,
+                      patience: Optional[int] = None, executor: Optional[Executor] = None,
+                      min_parallel_samples: int = 0) -> ModelSelectionResult:
+    """
+    Picks the GMM component count with the lowest BIC among k in [1, min(max_clusters, n) - 1].
+
+    search="exhaustive" fits every k; search="coarse_to_fine" fits a geometric sweep first and then
+    every k between the neighbours of the best coarse k. With patience set, the sweep stops once BIC
+    has risen for that many consecutive k. Candidate fits run concurrently in a process pool when
+    n_jobs != 1 and there are at least min_parallel_samples embeddings: smaller problems (such as most
+    local clusters) fit faster in this process than the pool takes to start and ship them. The pool is
+    shared by all calls with the same n_jobs. Each fit uses random_state, and ties go to the smaller k,
+    so the choice is identical for any n_jobs.
+    """
+    start = time.perf_counter()
+    n_jobs = resolve_n_jobs(n_jobs) if len(embeddings) >= min_parallel_samples else 1
+    max_k = min(max_clusters, len(embeddings)) - 1
+    if max_k < 1:
+        return ModelSelectionResult(1, {}, {}, 0.0)
+    if search == SEARCH_EXHAUSTIVE:
+        evaluated = _scan(embeddings, list(range(1, max_k + 1)), random_state, n_jobs, patience, executor)
+    elif search == SEARCH_COARSE_TO_FINE:
+        coarse = geometric_candidates(max_k)
+        evaluated = _scan(embeddings, coarse, random_state, n_jobs, patience, executor)
+        swept = sorted(evaluated)
+        best_pos = swept.index(min(swept, key=lambda k: (evaluated[k][0], k)))
+        low = swept[best_pos - 1] if best_pos > 0 else swept[best_pos]
+        high = swept[best_pos + 1] if best_pos + 1 < len(swept) else swept[best_pos]
+        fine = [k for k in range(low + 1, high) if k not in evaluated]
+        evaluated |= _evaluate(embeddings, fine, random_state, n_jobs, executor)
+    else:
+        raise ValueError(f"Unknown cluster search strategy: {search}")
+
+    best = min(evaluated, key=lambda k: (evaluated[k][0], k))
+    result = ModelSelectionResult(
+        n_clusters=best,
+        bics={k: v[0] for k, v in evaluated.items()},
+        timings={k: v[1] for k, v in evaluated.items()},
+        wall_time=time.perf_counter() - start,
+    )
+    for k in sorted(result.timings):
+        logging.debug(f"GMM k={k}: bic={result.bics[k]:.2f} fit={result.timings[k]:.3f}s")
+    logging.debug(
+        f"Selected k={best} from {len(evaluated)} fits ({search}, n_jobs={n_jobs}) "
+        f"in {result.wall_time:.3f}s (sum of fits {sum(result.timings.values()):.3f}s)"
+    )
+    return result
@@ -0,0 +1,144 @@
+# retriever.py
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents.base import Document
+
+from config import TRAVERSAL_BEAM_WIDTH
+from raptor.tree_store import TreeStore
+
+
+class TraversalHit(NamedTuple):
+    node: int
+    score: float
+    ancestors: List[int]  # summary nodes the leaf was reached through, level 1 first
+
+
+class TraversalResult(NamedTuple):
+    hits: List[TraversalHit]
+    n_scored: int  # vectors scored on the way down
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, best first.
+    """
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class TreeRetriever:
+    """
+    Cosine-similarity retrieval over a TreeStore.
+    traverse() walks the tree top-down: it scores the top-level summaries, keeps the beam_width best,
+    scores only their children, and so on down to the leaves, so only a small part of the embedding
+    matrix is read. collapsed_search() is the flat scan over all (or one level's) nodes.
+    """
+
+    def __init__(self, store: TreeStore, beam_width: Optional[int] = None, embeddings=None):
+        self.store = store
+        self.beam_width = beam_width or TRAVERSAL_BEAM_WIDTH
+        self._embeddings = embeddings
+
+    def _query_vector(self, query: str) -> np.ndarray:
+        if self._embeddings is None:
+            from embeddings.embedder import get_embedding_model
+            self._embeddings = get_embedding_model()
+        return np.asarray(self._embeddings.embed_query(query), dtype=np.float32)
+
+    def _scores(self, nodes: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        norms = np.asarray(self.store.norms[nodes])
+        return (np.asarray(self.store.embeddings[nodes]) @ query_vector) / np.maximum(norms, 1e-12)
+
+    def _children(self, beam: np.ndarray):
+        """
+        Children of the beam (best node first) and, for each child, the best beam node it was reached from.
+        """
+        offsets = self.store.child_offsets
+        slices = [self.store.child_ids[offsets[node]:offsets[node + 1]] for node in beam]
+        counts = np.fromiter((len(s) for s in slices), dtype=np.int64, count=len(slices))
+        if not counts.sum():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        children = np.concatenate(slices)
+        parents = np.repeat(beam, counts)
+        unique, first = np.unique(children, return_index=True)
+        return unique, parents[first]
+
+    def traverse(self, query_vector: Sequence[float], k: int = 5, beam_width: Optional[int] = None) -> TraversalResult:
+        """
+        Top-down beam search; returns the k best leaves found and how many vectors were scored.
+        """
+        beam_width = beam_width or self.beam_width
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        parent_of: Dict[int, int] = {}
+        frontier = np.sort(self.store.roots())
+        n_scored = 0
+        while len(frontier):
+            scores = self._scores(frontier, query_vector)
+            n_scored += len(frontier)
+            if self.store.levels[frontier[0]] == 0:
+                best = _top(scores, k)
+                return TraversalResult(
+                    [TraversalHit(int(frontier[i]), float(scores[i]), self._ancestors(int(frontier[i]), parent_of)) for i in best],
+                    n_scored,
+                )
+            beam = frontier[_top(scores, beam_width)]
+            frontier, parents = self._children(beam)
+            parent_of.update(zip(frontier.tolist(), parents.tolist()))
+        return TraversalResult([], n_scored)
+
+    @staticmethod
+    def _ancestors(node: int, parent_of: Dict[int, int]) -> List[int]:
+        ancestors = []
+        while node in parent_of:
+            node = parent_of[node]
+            ancestors.append(node)
+        return ancestors
+
+    def collapsed_search(self, query_vector: Sequence[float], k: int = 5, level: Optional[int] = None,
+                         block_size: int = 65536) -> List[TraversalHit]:
+        """
+        Flat scan over every node (or only the nodes of one level), block by block.
+        Nodes are stored level by level, so either way the scan reads one contiguous range.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        if level is None:
+            first, last = 0, len(self.store)
+        else:
+            nodes = self.store.level_nodes(level)
+            first, last = (int(nodes[0]), int(nodes[-1]) + 1) if len(nodes) else (0, 0)
+        best_nodes, best_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for start in range(first, last, block_size):
+            end = min(start + block_size, last)
+            norms = np.asarray(self.store.norms[start:end])
+            scores = (np.asarray(self.store.embeddings[start:end]) @ query_vector) / np.maximum(norms, 1e-12)
+            best_nodes = np.concatenate([best_nodes, np.arange(start, end)])
+            best_scores = np.concatenate([best_scores, scores])
+            keep = _top(best_scores, k)
+            best_nodes, best_scores = best_nodes[keep], best_scores[keep]
+        return [TraversalHit(int(node), float(score), []) for node, score in zip(best_nodes, best_scores)]
+
+    def retrieve(self, query: str, k: int = 5, beam_width: Optional[int] = None) -> List[Document]:
+        """
+        Tree-traversal retrieval for a query text. Each leaf Document carries its score, node id,
+        and the ids and texts of its ancestor summaries.
+        """
+        result = self.traverse(self._query_vector(query), k, beam_width)
+        documents = []
+        for hit in result.hits:
+            documents.append(Document(
+                page_content=self.store.text(hit.node),
+                metadata={
+                    "node_id": hit.node,
+                    "level": 0,
+                    "score": hit.score,
+                    "ancestors": hit.ancestors,
+                    "ancestor_summaries": self.store.texts(hit.ancestors),
+                },
+            ))
+        return documents
@@ -16,6 +16,9 @@ Please provide a detailed summary:"""
 prompt = ChatPromptTemplate.from_template(_TEMPLATE)
 chain = prompt | model | StrOutputParser()
 
+# Everything besides the cluster text that determines a summary; part of the summary cache key.
+identity = f"{model.model_name}|temperature={model.temperature}|{_TEMPLATE}"
+
 def summarize_text(context: str) -> str:
     """
     Given a block of text, invoke the LLM chain to produce a detailed summary.
@@ -0,0 +1,121 @@
+# summary_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+
+
+class SummaryCache:
+    """
+    Disk-backed (SQLite) cache of cluster summaries.
+    Entries are keyed by a hash of the formatted cluster text plus the prompt and model identity,
+    so a summary is reused only when all three are unchanged.
+    When max_entries or max_bytes is set, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries or None
+        self.max_bytes = max_bytes or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, summary TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+        # Logical clock for LRU order; wall-clock time can tie on coarse timers.
+        self._tick = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM summaries").fetchone()[0]
+
+    def _next_tick(self) -> int:
+        self._tick += 1
+        return self._tick
+
+    @staticmethod
+    def make_key(context: str, identity: str) -> str:
+        """
+        Content address of one summary request.
+        """
+        digest = hashlib.sha256()
+        digest.update(identity.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(context.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Bulk lookup; returns the cached summaries of the keys that are present.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, summary FROM summaries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found |= dict(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE summaries SET last_used = ? WHERE key = ?", [(self._next_tick(), k) for k in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, len(summary.encode("utf-8")), self._next_tick()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+            if count > self.max_entries:
+                self._delete_oldest(count - self.max_entries)
+        if self.max_bytes:
+            (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                rows = self._conn.execute("SELECT size FROM summaries ORDER BY last_used").fetchall()
+                n, freed = 0, 0
+                for (size,) in rows:
+                    if freed >= excess:
+                        break
+                    freed += size
+                    n += 1
+                self._delete_oldest(n)
+
+    def _delete_oldest(self, n: int):
+        self._conn.execute(
+            "DELETE FROM summaries WHERE key IN (SELECT key FROM summaries ORDER BY last_used LIMIT ?)", (n,)
+        )
+        self.evictions += n
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,33 +1,55 @@
 # tree_builder.py
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 import numpy as np
 import pandas as pd
 from embeddings.embedder import get_embedding_model
-from raptor.clustering import perform_clustering
-from raptor.summarizer import summarize_text
-
-# Load the embedding model (using intfloat/multilingual-e5-large)
-embd = get_embedding_model()
+from raptor.clustering import ClusterModel, csr_to_labels, fit_cluster_model
+from raptor.batch_summarizer import summarize_texts
 
 def embed(texts: List[str]) -> np.ndarray:
     """
     Generates embeddings for a list of text documents.
+    The embedding model (intfloat/multilingual-e5-large) is loaded once per process, on first use.
     """
+    embd = get_embedding_model()
+    if hasattr(embd, "embed_documents_array"):
+        return embd.embed_documents_array(texts)
     text_embeddings = embd.embed_documents(texts)
     return np.array(text_embeddings)
 
-def embed_cluster_texts(texts: List[str]) -> pd.DataFrame:
+def embed_fit_cluster_texts(texts: List[str]) -> Tuple[pd.DataFrame, ClusterModel]:
     """
     Embeds texts and clusters them.
-    Returns a DataFrame with the texts, their embeddings, and cluster labels.
+    Returns a DataFrame with the texts, their embeddings, and cluster labels,
+    plus the fitted cluster model (see raptor.incremental).
     """
     text_embeddings_np = embed(texts)
-    cluster_labels = perform_clustering(text_embeddings_np, dim=10, threshold=0.1)
+    offsets, cluster_ids, cluster_model = fit_cluster_model(text_embeddings_np, dim=10, threshold=0.1)
     df = pd.DataFrame()
     df["text"] = texts
     df["embd"] = list(text_embeddings_np)
-    df["cluster"] = cluster_labels
-    return df
+    df["cluster"] = csr_to_labels(offsets, cluster_ids)
+    return df, cluster_model
+
+def embed_cluster_texts(texts: List[str]) -> pd.DataFrame:
+    """
+    Embeds texts and clusters them.
+    Returns a DataFrame with the texts, their embeddings, and cluster labels.
+    """
+    return embed_fit_cluster_texts(texts)[0]
+
+def expand_clusters(df_clusters: pd.DataFrame) -> pd.DataFrame:
+    """
+    Expands the per-text cluster arrays into one row per (text, cluster) pair.
+    """
+    counts = df_clusters["cluster"].map(len).to_numpy()
+    rows = np.repeat(np.arange(len(df_clusters)), counts)
+    clusters = np.concatenate(df_clusters["cluster"].tolist()) if counts.sum() else np.zeros(0, dtype=np.int64)
+    return pd.DataFrame({
+        "text": df_clusters["text"].to_numpy()[rows],
+        "embd": df_clusters["embd"].to_numpy()[rows],
+        "cluster": clusters.astype(np.int64),
+    })
 
 def fmt_txt(df: pd.DataFrame) -> str:
     """
@@ -36,29 +58,31 @@ def fmt_txt(df: pd.DataFrame) -> str:
     unique_txt = df["text"].tolist()
     return "\n\n---\n\n".join(unique_txt)
 
-def embed_cluster_summarize_texts(texts: List[str], level: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def summarize_clusters(expanded_df: pd.DataFrame, clusters) -> List[str]:
+    """
+    Summarizes the given clusters of an expanded (text, cluster) DataFrame; summaries follow the order of `clusters`.
+    """
+    groups = expanded_df.groupby("cluster", sort=False)
+    formatted_txts = [fmt_txt(groups.get_group(i)) for i in clusters]
+    print(f">>>Summarizing {len(formatted_txts)} clusters::{sum(len(txt) for txt in formatted_txts)}")
+    summaries = summarize_texts(formatted_txts)
+    print(f"<<<Tolal suummaries: {len(summaries)}")
+    return summaries
+
+def embed_cluster_summarize_texts(texts: List[str], level: int,
+                                  cluster_models: Optional[Dict[int, ClusterModel]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Embeds, clusters, and then summarizes texts.
     Returns two DataFrames: one for clusters and one for summaries.
+    The fitted cluster model is stored in cluster_models[level] when a dict is passed.
     """
-    df_clusters = embed_cluster_texts(texts)
-    expanded_list = []
-    for index, row in df_clusters.iterrows():
-        expanded_list.extend(
-            {"text": row["text"], "embd": row["embd"], "cluster": cluster}
-            for cluster in row["cluster"]
-        )
-    expanded_df = pd.DataFrame(expanded_list)
+    df_clusters, cluster_model = embed_fit_cluster_texts(texts)
+    if cluster_models is not None:
+        cluster_models[level] = cluster_model
+    expanded_df = expand_clusters(df_clusters)
     all_clusters = expanded_df["cluster"].unique()
     print(f"--Generated {len(all_clusters)} clusters at level {level}--")
-    summaries = []
-    for i in all_clusters:
-        df_cluster = expanded_df[expanded_df["cluster"] == i]
-        formatted_txt = fmt_txt(df_cluster)
-        print(f">>>Summarizing {formatted_txt[:64]}::{len(formatted_txt)}")
-        summary = summarize_text(formatted_txt)
-        summaries.append(summary)
-        print(f"<<<Tolal suummaries: {len(summaries)} Summary ready {summary[:64]}::{len(summary)}")
+    summaries = summarize_clusters(expanded_df, all_clusters)
     df_summary = pd.DataFrame({
         "summaries": summaries,
         "level": [level] * len(summaries),
@@ -66,15 +90,38 @@ def embed_cluster_summarize_texts(texts: List[str], level: int) -> Tuple[pd.Data
     })
     return df_clusters, df_summary
 
-def recursive_embed_cluster_summarize(texts: List[str], level: int = 1, n_levels: int = 3) -> Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]:
+def recursive_embed_cluster_summarize(texts: List[str], level: int = 1, n_levels: int = 3,
+                                      cluster_models: Optional[Dict[int, ClusterModel]] = None) -> Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]:
     """
     Recursively builds the RAPTOR tree by embedding, clustering, and summarizing texts.
+    Pass a dict as cluster_models to collect the fitted cluster model of every level.
     """
-    df_clusters, df_summary = embed_cluster_summarize_texts(texts, level)
+    df_clusters, df_summary = embed_cluster_summarize_texts(texts, level, cluster_models)
     results = {level: (df_clusters, df_summary)}
     unique_clusters = df_summary["cluster"].nunique()
     if level < n_levels and unique_clusters > 1:
         new_texts = df_summary["summaries"].tolist()
-        next_level_results = recursive_embed_cluster_summarize(new_texts, level + 1, n_levels)
+        next_level_results = recursive_embed_cluster_summarize(new_texts, level + 1, n_levels, cluster_models)
         results |= next_level_results
     return results
+
+def tree_records(tree_results: Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]) -> List[Tuple[str, Optional[np.ndarray], dict]]:
+    """
+    Flattens the tree into (text, vector, metadata) triples for vector_store.faiss_store.build_faiss_index_from_embeddings.
+    Leaves and the summaries of every level but the top one reuse the vectors computed while clustering;
+    top-level summaries were never embedded and carry None.
+    """
+    levels = sorted(tree_results.keys())
+    leaves = tree_results[levels[0]][0]
+    records = [(text, embd, {"level": 0}) for text, embd in zip(leaves["text"], leaves["embd"])]
+    for level in levels:
+        df_summary = tree_results[level][1]
+        if level + 1 in tree_results:
+            vectors = list(tree_results[level + 1][0]["embd"])
+        else:
+            vectors = [None] * len(df_summary)
+        records.extend(
+            (summary, vector, {"level": level, "cluster": int(cluster)})
+            for summary, vector, cluster in zip(df_summary["summaries"], vectors, df_summary["cluster"])
+        )
+    return records
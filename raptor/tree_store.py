@@ -0,0 +1,177 @@
+# tree_store.py
+import json
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+TREE_FORMAT_VERSION = 1
+
+TreeResults = Dict[int, Tuple[pd.DataFrame, pd.DataFrame]]
+
+
+def _save_array(path: str, name: str, array: np.ndarray):
+    np.save(os.path.join(path, f"{name}.npy"), array)
+
+
+def _links(tree_results: TreeResults, bases: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (parent, child) node id pairs. Row i of a level's cluster table is node i of the level below
+    (leaves for level 1, the previous level's summaries otherwise); a row belongs to the summary of
+    every cluster in its membership array.
+    """
+    parents, children = [], []
+    for level in sorted(tree_results):
+        df_clusters, df_summary = tree_results[level]
+        counts = df_clusters["cluster"].map(len).to_numpy()
+        if not counts.sum():
+            continue
+        rows = np.repeat(np.arange(len(df_clusters), dtype=np.int64), counts)
+        clusters = np.concatenate(df_clusters["cluster"].tolist()).astype(np.int64)
+        summary_clusters = df_summary["cluster"].to_numpy(dtype=np.int64)
+        order = np.argsort(summary_clusters, kind="stable")
+        positions = order[np.searchsorted(summary_clusters[order], clusters)]
+        parents.append(bases[level] + positions)
+        children.append(bases[level - 1] + rows)
+    if not parents:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(parents), np.concatenate(children)
+
+
+def _csr(keys: np.ndarray, values: np.ndarray, n_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.lexsort((values, keys))
+    offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_nodes), out=offsets[1:])
+    return offsets, values[order]
+
+
+def write_tree_store(tree_results: TreeResults, path: str,
+                     embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None) -> "TreeStore":
+    """
+    Writes the tree in the on-disk format read by TreeStore.
+    Node ids: leaves first, then the summaries of level 1, 2, ... in cluster-table order.
+    Vectors computed while clustering are reused; only the top-level summaries are embedded (with embed_fn,
+    raptor.tree_builder.embed by default).
+    """
+    levels = sorted(tree_results)
+    leaves = tree_results[levels[0]][0]
+    bases = {levels[0] - 1: 0}
+    texts: List[str] = leaves["text"].tolist()
+    node_levels = [np.zeros(len(leaves), dtype=np.int16)]
+    node_clusters = [np.full(len(leaves), -1, dtype=np.int64)]
+    vectors = [np.stack(leaves["embd"].tolist()).astype(np.float32)]
+    for level in levels:
+        df_summary = tree_results[level][1]
+        bases[level] = len(texts)
+        texts += df_summary["summaries"].tolist()
+        node_levels.append(np.full(len(df_summary), level, dtype=np.int16))
+        node_clusters.append(df_summary["cluster"].to_numpy(dtype=np.int64))
+        if level + 1 in tree_results:
+            vectors.append(np.stack(tree_results[level + 1][0]["embd"].tolist()).astype(np.float32))
+        else:
+            if embed_fn is None:
+                from raptor.tree_builder import embed as embed_fn
+            vectors.append(np.asarray(embed_fn(df_summary["summaries"].tolist()), dtype=np.float32))
+
+    n_nodes = len(texts)
+    embeddings = np.vstack(vectors)
+    encoded = [text.encode("utf-8") for text in texts]
+    text_offsets = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=text_offsets[1:])
+    parents, children = _links(tree_results, bases)
+    child_offsets, child_ids = _csr(parents, children, n_nodes)
+    parent_offsets, parent_ids = _csr(children, parents, n_nodes)
+
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "texts.bin"), "wb") as file:
+        file.write(b"".join(encoded))
+    _save_array(path, "text_offsets", text_offsets)
+    _save_array(path, "levels", np.concatenate(node_levels))
+    _save_array(path, "clusters", np.concatenate(node_clusters))
+    _save_array(path, "child_offsets", child_offsets)
+    _save_array(path, "child_ids", child_ids)
+    _save_array(path, "parent_offsets", parent_offsets)
+    _save_array(path, "parent_ids", parent_ids)
+    _save_array(path, "embeddings", embeddings)
+    _save_array(path, "norms", np.linalg.norm(embeddings, axis=1).astype(np.float32))
+    with open(os.path.join(path, "tree.json"), "w", encoding="utf-8") as file:
+        json.dump({
+            "version": TREE_FORMAT_VERSION,
+            "n_nodes": n_nodes,
+            "dim": int(embeddings.shape[1]),
+            "n_levels": int(levels[-1]),
+        }, file)
+    return TreeStore(path)
+
+
+class TreeStore:
+    """
+    Read-only view of a tree written by write_tree_store.
+    All arrays are memory-mapped, so opening a tree costs a few file opens regardless of its size;
+    texts are decoded on access from one UTF-8 blob.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "tree.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta["version"] != TREE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported tree format version {meta['version']} in {path}")
+        self.n_nodes = meta["n_nodes"]
+        self.dim = meta["dim"]
+        self.n_levels = meta["n_levels"]
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.text_offsets = load("text_offsets")
+        self.levels = load("levels")
+        self.clusters = load("clusters")
+        self.child_offsets = load("child_offsets")
+        self.child_ids = load("child_ids")
+        self.parent_offsets = load("parent_offsets")
+        self.parent_ids = load("parent_ids")
+        self.embeddings = load("embeddings")
+        self.norms = load("norms")
+        blob_path = os.path.join(path, "texts.bin")
+        self._texts = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else b""
+
+    def __len__(self) -> int:
+        return self.n_nodes
+
+    def text(self, node: int) -> str:
+        start, end = self.text_offsets[node], self.text_offsets[node + 1]
+        return bytes(self._texts[start:end]).decode("utf-8")
+
+    def texts(self, nodes: Sequence[int]) -> List[str]:
+        return [self.text(int(node)) for node in nodes]
+
+    def children(self, node: int) -> np.ndarray:
+        return self.child_ids[self.child_offsets[node]:self.child_offsets[node + 1]]
+
+    def parents(self, node: int) -> np.ndarray:
+        return self.parent_ids[self.parent_offsets[node]:self.parent_offsets[node + 1]]
+
+    def level_nodes(self, level: int) -> np.ndarray:
+        return np.flatnonzero(self.levels == level)
+
+    def roots(self) -> np.ndarray:
+        """
+        Nodes without a parent at the top level of the tree.
+        """
+        return self.level_nodes(int(self.levels.max()))
+
+    def records(self) -> List[Tuple[str, np.ndarray, dict]]:
+        """
+        (text, vector, metadata) triples for vector_store.faiss_store.build_faiss_index_from_embeddings;
+        metadata carries the node id so search hits can be mapped back into the tree.
+        """
+        records = []
+        for node in range(self.n_nodes):
+            metadata = {"level": int(self.levels[node]), "node_id": node}
+            if self.levels[node] > 0:
+                metadata["cluster"] = int(self.clusters[node])
+            records.append((self.text(node), self.embeddings[node], metadata))
+        return records
+
+
+def load_tree_store(path: str) -> TreeStore:
+    return TreeStore(path)
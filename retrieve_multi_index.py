@@ -3,26 +3,21 @@
 import argparse
 from pathlib import Path
 from typing import List
-from langchain_experimental.open_clip import OpenCLIPEmbeddings
 from langchain_community.vectorstores.faiss import FAISS
-from langchain.retrievers import EnsembleRetriever
 from langchain.retrievers.contextual_compression import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import CrossEncoderReranker
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
 
-from config import INDEX_DIR, FAISS_INDEX_PATH, RERANKING_MODEL
+from config import INDEX_DIR, FAISS_INDEX_PATH
 from vector_store.faiss_store import load_faiss_index, query_faiss_index
+from vector_store.multi_index import MultiIndexRetriever, MultiIndexSearcher
+from embeddings.embedder import get_clip_model
+from query_service.reranker import BatchedCrossEncoderReranker, BatchedReranker
 
 
 def load_image_index() -> FAISS:
     """
     Reload the FAISS index and its CLIP embedder from disk.
     """
-    clip_embedder = OpenCLIPEmbeddings(
-        model_name="ViT-B-32",
-        checkpoint="laion2b_s34b_b79k",
-        load_fn_kwargs={"device": "cpu"},
-    )  # Embedder must match indexing settings :contentReference[oaicite:8]{index=8}
+    clip_embedder = get_clip_model()  # Embedder must match indexing settings :contentReference[oaicite:8]{index=8}
 
     return FAISS.load_local(
         INDEX_DIR,
@@ -88,12 +83,14 @@ if __name__ == "__main__":
     chats_vs = load_faiss_index("chats_index")
 
     k = 5
-    ensemble = EnsembleRetriever(
-        retrievers=[text_vs.as_retriever(search_kwargs={"k": k}), chats_vs.as_retriever(search_kwargs={"k": k})],
-        weights=[0.5, 0.5]                  # adjust to favor text vs. images
+    # Both indexes share the embedding model: the query is embedded once and they are searched in parallel.
+    ensemble = MultiIndexRetriever(
+        searcher=MultiIndexSearcher({"text": text_vs, "chats": chats_vs},
+                                    weights={"text": 0.5, "chats": 0.5}),  # adjust to favor text vs. chats
+        k=k,
     )
-    reranker_model = HuggingFaceCrossEncoder(model_name=RERANKING_MODEL)
-    RERANKER = CrossEncoderReranker(model=reranker_model, top_n=3)
+    # Pairs of concurrent queries share forward passes; repeated (query, chunk) pairs come from the cache.
+    RERANKER = BatchedCrossEncoderReranker(reranker=BatchedReranker(), top_n=3)
     retriever = ContextualCompressionRetriever(
             base_compressor=RERANKER, base_retriever=ensemble
             )
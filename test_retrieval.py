@@ -1,6 +1,6 @@
 # test_retrieval.py
 from vector_store.faiss_store import load_faiss_index, query_faiss_index
-from config import FAISS_INDEX_PATH
+from config import FAISS_INDEX_PATH, TREE_STORE_PATH
 
 def test_vectorstore_retrieval():
     # Load the FAISS index stored at FAISS_INDEX_PATH.
@@ -21,6 +21,34 @@ def test_vectorstore_retrieval():
         print(doc.page_content)
         print("-" * 80)
 
+def test_hybrid_retrieval():
+    # Dense + BM25 over the sparse index saved next to the FAISS files: exact ids such as requirement numbers match.
+    from vector_store.sparse_index import load_sparse_index
+    index = load_faiss_index(FAISS_INDEX_PATH)
+    sparse_index = load_sparse_index(FAISS_INDEX_PATH)
+
+    query_text = "Требование 1024"
+    print("Query:", query_text)
+    for i, doc in enumerate(query_faiss_index(index, query_text, k=5, sparse_index=sparse_index), 1):
+        print(f"\nResult {i}:")
+        print(doc.page_content)
+        print("-" * 80)
+
+def test_tree_retrieval():
+    # Top-down traversal over the persisted RAPTOR tree (written by main.py next to the index).
+    from raptor.retriever import TreeRetriever
+    from raptor.tree_store import load_tree_store
+    retriever = TreeRetriever(load_tree_store(TREE_STORE_PATH))
+
+    query_text = "Зачем нужен признак госзакупки в карточке клиента и в ЛЗ?"
+    print("Query:", query_text)
+    for i, doc in enumerate(retriever.retrieve(query_text, k=5), 1):
+        print(f"\nResult {i}: node {doc.metadata['node_id']}, score {doc.metadata['score']:.3f}")
+        for summary in doc.metadata["ancestor_summaries"]:
+            print("  summary:", summary[:200])
+        print(doc.page_content)
+        print("-" * 80)
+
 #def test_rag_assistant()
 
 if __name__ == "__main__":
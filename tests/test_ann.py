@@ -0,0 +1,73 @@
+# tests/test_ann.py
+import unittest
+
+import faiss
+import numpy as np
+
+from vector_store.ann import (
+    build_ann_index,
+    default_pq_m,
+    factory_string,
+    recall_report,
+    select_training_sample,
+    set_search_params,
+)
+
+
+def clustered_vectors(n=12000, dim=32, n_centers=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=5.0, size=(n_centers, dim))
+    return (centers[rng.integers(n_centers, size=n)] + rng.normal(size=(n, dim))).astype(np.float32)
+
+
+class TestAnnIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.vectors = clustered_vectors()
+        cls.queries = cls.vectors[:100] + np.random.default_rng(1).normal(scale=0.1, size=(100, 32)).astype(np.float32)
+
+    def test_factory_strings(self):
+        self.assertEqual(factory_string("flat", 32, 100), "Flat")
+        self.assertEqual(factory_string("ivf_flat", 32, 100_000, nlist=256), "IVF256,Flat")
+        self.assertEqual(factory_string("ivf_pq", 1024, 100_000, nlist=256), "IVF256,PQ64")
+        self.assertEqual(factory_string("hnsw", 32, 100, hnsw_m=16), "HNSW16,Flat")
+        # Too few vectors to train the quantizers.
+        self.assertEqual(factory_string("ivf_pq", 32, 5000, nlist=16), "Flat")
+        self.assertEqual(default_pq_m(768), 48)
+        with self.assertRaises(ValueError):
+            factory_string("lsh", 32, 100)
+
+    def test_training_sample(self):
+        sample = select_training_sample(self.vectors, 500)
+        self.assertEqual(sample.shape, (500, 32))
+        np.testing.assert_array_equal(sample, select_training_sample(self.vectors, 500))
+        self.assertIs(select_training_sample(self.vectors, len(self.vectors)), self.vectors)
+
+    def test_ivf_flat_recall_grows_with_nprobe(self):
+        index = build_ann_index(self.vectors, "ivf_flat", nlist=64)
+        self.assertEqual(index.ntotal, len(self.vectors))
+        rows = recall_report(index, self.vectors, self.queries, k=10, nprobes=(1, 64))
+        self.assertEqual([row["nprobe"] for row in rows], [1, 64])
+        self.assertAlmostEqual(rows[-1]["recall@10"], 1.0)
+        self.assertLessEqual(rows[0]["recall@10"], rows[-1]["recall@10"])
+
+    def test_hnsw_and_pq(self):
+        hnsw = build_ann_index(self.vectors, "hnsw", hnsw_m=16)
+        rows = recall_report(hnsw, self.vectors, self.queries, k=10, ef_searches=(128,))
+        self.assertGreater(rows[0]["recall@10"], 0.9)
+        pq = build_ann_index(self.vectors, "ivf_pq", nlist=16, pq_m=8)
+        self.assertIn("IVF", type(faiss.downcast_index(pq)).__name__)
+        rows = recall_report(pq, self.vectors, self.queries, k=10, nprobes=(16,))
+        self.assertGreater(rows[0]["recall@10"], 0.3)
+
+    def test_search_params_survive_serialization(self):
+        index = build_ann_index(self.vectors, "ivf_flat", nlist=64)
+        loaded = faiss.deserialize_index(faiss.serialize_index(index))
+        set_search_params(loaded, nprobe=8)
+        set_search_params(index, nprobe=8)
+        self.assertEqual(faiss.extract_index_ivf(loaded).nprobe, 8)
+        np.testing.assert_array_equal(loaded.search(self.queries, 5)[1], index.search(self.queries, 5)[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+# tests/test_batch_summarizer.py
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from raptor.batch_summarizer import RateLimiter, asummarize_texts, summarize_texts
+from raptor.summary_cache import SummaryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestBatchSummarizer(unittest.TestCase):
+    def test_fake_chat_model(self):
+        model = FakeListChatModel(responses=["summary"])
+        chain = ChatPromptTemplate.from_template("{context}") | model | StrOutputParser()
+        summaries = summarize_texts(["a", "b", "c"], chain=chain, max_concurrency=2)
+        self.assertEqual(summaries, ["summary"] * 3)
+
+    def test_results_keep_input_order(self):
+        async def slow_echo(inputs: dict) -> str:
+            context = inputs["context"]
+            # Later contexts finish first.
+            await asyncio.sleep(0.01 * (10 - int(context)))
+            return f"summary {context}"
+
+        contexts = [str(i) for i in range(10)]
+        summaries = summarize_texts(contexts, chain=RunnableLambda(slow_echo), max_concurrency=10)
+        self.assertEqual(summaries, [f"summary {c}" for c in contexts])
+
+    def test_sync_wrapper_inside_running_loop(self):
+        async def echo(inputs: dict) -> str:
+            await asyncio.sleep(0.01)
+            return f"summary {inputs['context']}"
+
+        async def caller():
+            return summarize_texts(["a", "b"], chain=RunnableLambda(echo))
+
+        self.assertEqual(asyncio.run(caller()), ["summary a", "summary b"])
+
+    def test_concurrency_is_bounded(self):
+        in_flight, peak = 0, 0
+
+        async def track(inputs: dict) -> str:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return inputs["context"]
+
+        summarize_texts([str(i) for i in range(12)], chain=RunnableLambda(track), max_concurrency=3)
+        self.assertEqual(peak, 3)
+
+    def test_retries_transient_errors(self):
+        attempts = {}
+
+        async def flaky(inputs: dict) -> str:
+            context = inputs["context"]
+            attempts[context] = attempts.get(context, 0) + 1
+            if attempts[context] < 3:
+                raise RuntimeError("rate limited")
+            return context.upper()
+
+        summaries = summarize_texts(["x", "y"], chain=RunnableLambda(flaky), max_retries=3, base_delay=0.001)
+        self.assertEqual(summaries, ["X", "Y"])
+        self.assertEqual(attempts, {"x": 3, "y": 3})
+
+    def test_gives_up_after_max_retries(self):
+        async def broken(inputs: dict) -> str:
+            raise RuntimeError("down")
+
+        with self.assertRaises(RuntimeError):
+            summarize_texts(["x"], chain=RunnableLambda(broken), max_retries=1, base_delay=0.001)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_tokens_per_minute(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=120, clock=clock, sleep=clock.sleep)
+
+        async def run():
+            await limiter.acquire(100)
+            await limiter.acquire(50)
+
+        asyncio.run(run())
+        # 30 missing tokens at 2 tokens per second.
+        self.assertEqual(clock.sleeps, [15.0])
+
+    def test_requests_per_minute(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=2, clock=clock, sleep=clock.sleep)
+
+        async def run():
+            for _ in range(3):
+                await limiter.acquire()
+
+        asyncio.run(run())
+        self.assertEqual(clock.sleeps, [30.0])
+
+    def test_limiter_used_by_summarizer(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+        chain = RunnableLambda(lambda inputs: inputs["context"])
+        summaries = asyncio.run(asummarize_texts([str(i) for i in range(61)], chain=chain, rate_limiter=limiter))
+        self.assertEqual(len(summaries), 61)
+        self.assertEqual(clock.sleeps, [1.0])
+
+
+class TestSummaryCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "summaries.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_rerun_makes_no_llm_calls(self):
+        calls = []
+
+        def count(inputs: dict) -> str:
+            calls.append(inputs["context"])
+            return f"summary {inputs['context']}"
+
+        chain = RunnableLambda(count)
+        cache = SummaryCache(self.path)
+        first = summarize_texts(["a", "b"], chain=chain, cache=cache, identity="model-1")
+        cache.close()
+        cache = SummaryCache(self.path)
+        second = summarize_texts(["a", "b"], chain=chain, cache=cache, identity="model-1")
+        self.assertEqual(first, second)
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+        # A different prompt/model identity does not reuse the summaries.
+        summarize_texts(["a"], chain=chain, cache=cache, identity="model-2")
+        self.assertEqual(calls, ["a", "b", "a"])
+        cache.close()
+
+    def test_lru_eviction(self):
+        cache = SummaryCache(self.path, max_entries=2)
+        cache.put("k1", "one")
+        cache.put("k2", "two")
+        cache.get("k1")
+        cache.put("k3", "three")
+        self.assertEqual(cache.get_many(["k1", "k2", "k3"]), {"k1": "one", "k3": "three"})
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.close()
+
+    def test_size_bound(self):
+        cache = SummaryCache(self.path, max_bytes=10)
+        cache.put("k1", "x" * 6)
+        cache.put("k2", "y" * 6)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("k2"), "y" * 6)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+# tests/test_checkpoint.py
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+import numpy as np
+
+from raptor.checkpoint import build_tree_checkpointed, load_checkpoint, read_manifest, resume_tree
+
+DIM = 16
+CENTERS = np.random.default_rng(1).normal(scale=10.0, size=(4, DIM))
+
+
+def fake_embed(texts: List[str]) -> np.ndarray:
+    vectors = []
+    for text in texts:
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        noise = np.random.default_rng(seed).normal(size=DIM)
+        vectors.append(CENTERS[int(text[1])] + noise if text.startswith("b") else noise)
+    return np.stack(vectors)
+
+
+class FlakySummarizer:
+    """
+    Summarizes until `fail_after` contexts have been handled, then raises like an LLM timeout.
+    """
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.contexts: List[str] = []
+
+    def __call__(self, contexts: List[str]) -> List[str]:
+        if self.fail_after is not None and len(self.contexts) + len(contexts) > self.fail_after:
+            raise TimeoutError("LLM timeout")
+        self.contexts += contexts
+        return ["summary " + hashlib.md5(c.encode("utf-8")).hexdigest()[:8] for c in contexts]
+
+
+class TestCheckpointedBuild(unittest.TestCase):
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.checkpoint_dir)
+        self.embed = mock.MagicMock(side_effect=fake_embed)
+        patch = mock.patch("raptor.tree_builder.embed", self.embed)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.texts = [f"b{b}-{i}" for b in range(4) for i in range(20)]
+
+    def build(self, summarizer, resume=False):
+        with mock.patch("raptor.tree_builder.summarize_texts", summarizer), \
+                mock.patch("raptor.checkpoint.CHECKPOINT_SUMMARY_BATCH", 2):
+            if resume:
+                return resume_tree(self.checkpoint_dir)
+            return build_tree_checkpointed(self.texts, self.checkpoint_dir, n_levels=2)
+
+    def test_resume_after_crash_skips_finished_work(self):
+        reference_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reference_dir)
+        with mock.patch("raptor.tree_builder.summarize_texts", FlakySummarizer()):
+            reference = build_tree_checkpointed(self.texts, reference_dir, n_levels=2)
+        n_level_1 = len(reference[1][1])
+        self.embed.reset_mock()
+
+        # Crash in the middle of level 2, after its first batch of two clusters.
+        with self.assertRaises(TimeoutError):
+            self.build(FlakySummarizer(fail_after=n_level_1 + 2))
+        self.assertEqual(read_manifest(self.checkpoint_dir)["completed"], [1])
+        self.assertEqual(self.embed.call_count, 2)
+
+        self.embed.reset_mock()
+        summarizer = FlakySummarizer()
+        tree = self.build(summarizer, resume=True)
+        # Level 1 and the level-2 clustering come from disk; only unfinished level-2 clusters are summarized.
+        self.embed.assert_not_called()
+        self.assertEqual(len(summarizer.contexts), len(tree[2][1]) - 2)
+        self.assertTrue(read_manifest(self.checkpoint_dir)["finished"])
+        self.assertFalse(os.path.exists(os.path.join(self.checkpoint_dir, "level_2_summary_parts")))
+
+        for level in (1, 2):
+            self.assertEqual(tree[level][0]["text"].tolist(), reference[level][0]["text"].tolist())
+            self.assertEqual(tree[level][1]["summaries"].tolist(), reference[level][1]["summaries"].tolist())
+
+    def test_finished_checkpoint_loads_without_work(self):
+        tree = self.build(FlakySummarizer())
+        self.embed.reset_mock()
+        summarizer = FlakySummarizer()
+        again = self.build(summarizer, resume=True)
+        self.embed.assert_not_called()
+        self.assertEqual(summarizer.contexts, [])
+        loaded, models = load_checkpoint(self.checkpoint_dir)
+        self.assertEqual(sorted(loaded), sorted(tree))
+        self.assertEqual(sorted(models), sorted(tree))
+        for level in tree:
+            np.testing.assert_allclose(np.stack(loaded[level][0]["embd"].tolist()), np.stack(tree[level][0]["embd"].tolist()))
+            self.assertEqual([c.tolist() for c in again[level][0]["cluster"]], [c.tolist() for c in tree[level][0]["cluster"]])
+        with self.assertRaises(ValueError):
+            build_tree_checkpointed(self.texts[:-1], self.checkpoint_dir, n_levels=2, resume=True)
+
+    def test_full_build_replaces_finished_or_foreign_checkpoint(self):
+        self.build(FlakySummarizer())
+        self.texts = self.texts[:-1]
+        self.embed.reset_mock()
+        tree = self.build(FlakySummarizer())
+        self.assertEqual(tree[1][0]["text"].tolist(), self.texts)
+        self.embed.assert_called()
+        self.assertEqual(load_checkpoint(self.checkpoint_dir)[0][1][0]["text"].tolist(), self.texts)
+        # Finished with the same texts: a full build starts over as well.
+        self.embed.reset_mock()
+        self.build(FlakySummarizer())
+        self.embed.assert_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
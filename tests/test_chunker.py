@@ -0,0 +1,62 @@
+# tests/test_chunker.py
+import random
+import unittest
+from unittest import mock
+
+from langchain_core.documents.base import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import ingestion.chunker as chunker
+from config import CHUNK_OVERLAP, CHUNK_SIZE
+from ingestion.utils import get_encoding, num_tokens_from_string, num_tokens_from_strings
+
+
+def encodings_available():
+    """
+    tiktoken downloads its encodings on first use; without network access (and no cache) they are missing.
+    """
+    try:
+        get_encoding("gpt2")
+        get_encoding("cl100k_base")
+        return True
+    except Exception:
+        return False
+
+
+def make_docs(n):
+    rng = random.Random(0)
+    words = ["слово", "word", "the", "инцидент", "ITIL", "\n\n", "\n", "process", "сервис.", "<b>"]
+    return [Document(page_content=" ".join(rng.choice(words) for _ in range(rng.randint(1, 3000))), metadata={"i": i})
+            for i in range(n)]
+
+
+def reference_chunks(docs):
+    """
+    The chunks the chunker produced before its splitter was cached: one fresh splitter per document.
+    """
+    chunks = []
+    for doc in docs:
+        splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        chunks.extend((chunk.encode("utf-8"), doc.metadata) for chunk in splitter.split_text(doc.page_content))
+    return chunks
+
+
+@unittest.skipUnless(encodings_available(), "tiktoken encodings cannot be loaded")
+class TestChunker(unittest.TestCase):
+    def test_chunks_match_reference(self):
+        docs = make_docs(60)
+        expected = reference_chunks(docs)
+        self.assertIs(chunker.get_splitter(), chunker.get_splitter())
+        sequential = [(d.page_content.encode("utf-8"), d.metadata) for d in chunker.chunk_documents(docs)]
+        self.assertEqual(sequential, expected)
+        with mock.patch.object(chunker, "CHUNK_POOL_MIN_DOCS", 25), mock.patch.object(chunker, "CHUNK_POOL_BATCH_SIZE", 4):
+            pooled = [(d.page_content.encode("utf-8"), d.metadata) for d in chunker.iter_chunks(iter(docs), workers=2)]
+        self.assertEqual(pooled, expected)
+
+    def test_batched_token_counts(self):
+        texts = [doc.page_content for doc in make_docs(40)] + [""]
+        self.assertEqual(num_tokens_from_strings(texts), [num_tokens_from_string(text) for text in texts])
+
+
+if __name__ == "__main__":
+    unittest.main()
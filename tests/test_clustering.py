@@ -0,0 +1,119 @@
+# tests/test_clustering.py
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from raptor.clustering import (
+    GMM_cluster,
+    cluster_membership,
+    csr_to_labels,
+    local_cluster_embeddings,
+    global_cluster_embeddings,
+    membership_to_csr,
+    perform_clustering,
+)
+from raptor.model_selection import SEARCH_COARSE_TO_FINE, select_n_clusters
+
+
+def make_blobs(n_per_blob: int = 20, dim: int = 16, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=10.0, size=(3, dim))
+    return np.vstack([c + rng.normal(size=(n_per_blob, dim)) for c in centers])
+
+
+def legacy_perform_clustering(embeddings: np.ndarray, dim: int, threshold: float):
+    # Reference implementation: recovers rows by comparing embeddings.
+    reduced_embeddings_global = global_cluster_embeddings(embeddings, dim)
+    global_clusters, n_global_clusters = GMM_cluster(reduced_embeddings_global, threshold)
+    all_local_clusters = [np.array([], dtype=np.int64) for _ in range(len(embeddings))]
+    total_clusters = 0
+    for i in range(n_global_clusters):
+        global_cluster_embeddings_ = embeddings[np.array([i in gc for gc in global_clusters])]
+        if len(global_cluster_embeddings_) == 0:
+            continue
+        if len(global_cluster_embeddings_) <= dim + 1:
+            local_clusters = [np.array([0]) for _ in global_cluster_embeddings_]
+            n_local_clusters = 1
+        else:
+            reduced_embeddings_local = local_cluster_embeddings(global_cluster_embeddings_, dim)
+            local_clusters, n_local_clusters = GMM_cluster(reduced_embeddings_local, threshold)
+        for j in range(n_local_clusters):
+            local_cluster_embeddings_ = global_cluster_embeddings_[np.array([j in lc for lc in local_clusters])]
+            indices = np.where((embeddings == local_cluster_embeddings_[:, None]).all(-1))[1]
+            for idx in indices:
+                all_local_clusters[idx] = np.append(all_local_clusters[idx], j + total_clusters)
+        total_clusters += n_local_clusters
+    return all_local_clusters
+
+
+class TestClusterMembership(unittest.TestCase):
+    def test_csr_roundtrip(self):
+        rows = np.array([2, 0, 2, 0, 3])
+        cluster_ids = np.array([5, 1, 4, 0, 2])
+        offsets, ids = membership_to_csr(rows, cluster_ids, n_rows=4)
+        self.assertEqual(offsets.tolist(), [0, 2, 2, 4, 5])
+        labels = csr_to_labels(offsets, ids)
+        self.assertEqual([l.tolist() for l in labels], [[0, 1], [], [4, 5], [2]])
+
+    def test_small_input_single_cluster(self):
+        embeddings = np.random.default_rng(1).normal(size=(5, 8))
+        labels = perform_clustering(embeddings, dim=10, threshold=0.1)
+        self.assertEqual([l.tolist() for l in labels], [[0]] * 5)
+
+    def test_matches_legacy_mapping(self):
+        embeddings = make_blobs()
+        expected = legacy_perform_clustering(embeddings, dim=2, threshold=0.1)
+        labels = perform_clustering(embeddings, dim=2, threshold=0.1)
+        self.assertEqual([l.tolist() for l in labels], [l.astype(np.int64).tolist() for l in expected])
+
+    def test_executor_modes_match_sequential(self):
+        embeddings = make_blobs(n_per_blob=25)
+        expected = cluster_membership(embeddings, dim=2, threshold=0.1, executor="")
+        for executor in ("thread", "process"):
+            offsets, cluster_ids = cluster_membership(embeddings, dim=2, threshold=0.1, executor=executor, max_workers=2)
+            np.testing.assert_array_equal(offsets, expected[0])
+            np.testing.assert_array_equal(cluster_ids, expected[1])
+
+    def test_duplicates_keep_own_membership(self):
+        embeddings = make_blobs()
+        embeddings = np.vstack([embeddings, embeddings[:5]])
+        offsets, cluster_ids = cluster_membership(embeddings, dim=2, threshold=0.1)
+        self.assertEqual(len(offsets), len(embeddings) + 1)
+        # No row may pick up the memberships of an identical row as well as its own.
+        for label in csr_to_labels(offsets, cluster_ids):
+            self.assertEqual(len(np.unique(label)), len(label))
+
+
+class TestModelSelection(unittest.TestCase):
+    def setUp(self):
+        self.embeddings = make_blobs(n_per_blob=15, dim=2, seed=3)
+
+    def test_parallel_matches_sequential(self):
+        sequential = select_n_clusters(self.embeddings, max_clusters=12, n_jobs=1)
+        parallel = select_n_clusters(self.embeddings, max_clusters=12, n_jobs=2)
+        self.assertEqual(sequential.n_clusters, parallel.n_clusters)
+        self.assertEqual(sequential.bics, parallel.bics)
+        self.assertEqual(sorted(parallel.timings), list(range(1, 12)))
+
+    def test_small_inputs_skip_the_pool(self):
+        with mock.patch("raptor.model_selection.get_executor", side_effect=AssertionError("pool used")):
+            result = select_n_clusters(self.embeddings, max_clusters=12, n_jobs=2,
+                                       min_parallel_samples=len(self.embeddings) + 1)
+        self.assertEqual(result.bics, select_n_clusters(self.embeddings, max_clusters=12, n_jobs=1).bics)
+
+    def test_early_stopping_independent_of_workers(self):
+        one = select_n_clusters(self.embeddings, max_clusters=20, n_jobs=1, patience=2)
+        three = select_n_clusters(self.embeddings, max_clusters=20, n_jobs=3, patience=2)
+        self.assertEqual(one.bics, three.bics)
+        self.assertEqual(one.n_clusters, three.n_clusters)
+
+    def test_coarse_to_fine_fits_fewer_models(self):
+        exhaustive = select_n_clusters(self.embeddings, max_clusters=40, n_jobs=1)
+        coarse = select_n_clusters(self.embeddings, max_clusters=40, n_jobs=1, search=SEARCH_COARSE_TO_FINE)
+        self.assertLess(len(coarse.bics), len(exhaustive.bics))
+        self.assertEqual(coarse.bics[coarse.n_clusters], min(coarse.bics.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
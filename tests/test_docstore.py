@@ -0,0 +1,89 @@
+# tests/test_docstore.py
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+
+from vector_store.ann import read_index_mmap
+from vector_store.docstore import SQLiteDocstore, SQLiteIdMap, read_sqlite_docstore, write_sqlite_docstore
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return np.random.default_rng(sum(map(ord, text))).normal(size=16).tolist()
+
+
+class TestSQLiteDocstore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.embeddings = HashEmbeddings()
+        self.texts = [f"документ {i}" for i in range(50)]
+        self.store = FAISS.from_texts(self.texts, self.embeddings, metadatas=[{"n": i} for i in range(50)])
+        self.store.save_local(self.path)
+        write_sqlite_docstore(self.store, os.path.join(self.path, "docstore.sqlite")).close()
+
+    def open_lazy(self):
+        docstore = SQLiteDocstore(os.path.join(self.path, "docstore.sqlite"), read_only=True)
+        self.addCleanup(docstore.close)
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=read_index_mmap(os.path.join(self.path, "index.faiss")),
+            docstore=docstore,
+            index_to_docstore_id=SQLiteIdMap(docstore),
+        )
+
+    def test_lazy_store_matches_pickled_store(self):
+        lazy = self.open_lazy()
+        for query in ("документ 7", "документ 31", "другое"):
+            expected = self.store.similarity_search_with_score(query, k=4)
+            found = lazy.similarity_search_with_score(query, k=4)
+            self.assertEqual([(d.page_content, d.metadata) for d, _ in found],
+                             [(d.page_content, d.metadata) for d, _ in expected])
+            np.testing.assert_allclose([s for _, s in found], [s for _, s in expected], rtol=1e-5)
+
+    def test_id_map(self):
+        id_map = SQLiteIdMap(self.open_lazy().docstore)
+        self.assertEqual(len(id_map), 50)
+        self.assertEqual(dict(id_map.items()), self.store.index_to_docstore_id)
+        with self.assertRaises(KeyError):
+            id_map[50]
+
+    def test_add_and_delete(self):
+        docstore = SQLiteDocstore(os.path.join(self.path, "new.sqlite"))
+        docstore.add({"a": Document(page_content="A", metadata={"x": 1}), "b": Document(page_content="B")})
+        self.assertEqual(docstore.search("a").metadata, {"x": 1})
+        self.assertEqual(docstore.id_at(1), "b")
+        docstore.delete(["a"])
+        self.assertEqual(docstore.search("a"), "ID a not found.")
+        self.assertEqual(len(docstore), 1)
+        docstore.close()
+
+    def test_refuses_to_overwrite_own_docstore(self):
+        lazy = self.open_lazy()
+        with self.assertRaises(ValueError):
+            write_sqlite_docstore(lazy, os.path.join(self.path, "docstore.sqlite"))
+        self.assertEqual(lazy.similarity_search("документ 7", k=1)[0].page_content, "документ 7")
+
+    def test_read_back_into_memory_is_writable(self):
+        docstore, index_to_id = read_sqlite_docstore(os.path.join(self.path, "docstore.sqlite"))
+        self.assertEqual(index_to_id, self.store.index_to_docstore_id)
+        store = FAISS(embedding_function=self.embeddings, index=self.store.index, docstore=docstore,
+                      index_to_docstore_id=index_to_id)
+        store.add_texts(["новый документ"])
+        store.save_local(os.path.join(self.path, "copy"))
+        copy = FAISS.load_local(os.path.join(self.path, "copy"), self.embeddings, allow_dangerous_deserialization=True)
+        self.assertEqual(copy.similarity_search("новый документ", k=1)[0].page_content, "новый документ")
+        self.assertEqual(copy.similarity_search("документ 7", k=1)[0].metadata, {"n": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_document_store.py
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from langchain_core.documents.base import Document
+
+from ingestion.document_store import DocumentStore, open_document_store
+
+
+def make_docs(n, start=0):
+    return [Document(page_content=f"текст {i} " * 20, metadata={"source": f"f{i}.txt", "page": i}) for i in range(start, start + n)]
+
+
+class TestDocumentStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store_path = os.path.join(self.path, "store")
+
+    def test_append_iterate_and_get(self):
+        # Small segments so the documents span several files.
+        with DocumentStore(self.store_path, segment_max_bytes=1000) as store:
+            ids = store.add_documents(make_docs(10), batch_size=3)
+        self.assertGreater(len([f for f in os.listdir(self.store_path) if f.endswith(".jsonl")]), 1)
+        with DocumentStore(self.store_path, segment_max_bytes=1000) as store:
+            ids += store.add_documents(make_docs(5, start=10), ids=[f"doc-{i}" for i in range(10, 15)])
+            self.assertEqual(len(store), 15)
+            docs = list(store)
+            self.assertEqual([d.metadata["page"] for d in docs], list(range(15)))
+            self.assertEqual([d.id for d in docs], ids)
+            self.assertEqual(list(store.ids()), ids)
+            self.assertEqual(store.get("doc-12").page_content, make_docs(1, start=12)[0].page_content)
+            self.assertEqual(store.get(ids[3]).metadata, {"source": "f3.txt", "page": 3})
+            self.assertIsNone(store.get("missing"))
+            self.assertIn("doc-14", store)
+            with self.assertRaises(ValueError):
+                store.add_documents(make_docs(1), ids=["doc-12"])
+            self.assertEqual(len(list(store)), 15)
+
+    def test_unindexed_tail_is_dropped(self):
+        with DocumentStore(self.store_path) as store:
+            store.add_documents(make_docs(3))
+        with open(os.path.join(self.store_path, "segment-00000.jsonl"), "ab") as file:
+            file.write(b'{"id": "half-written", "page_co')
+        with DocumentStore(self.store_path) as store:
+            store.add_documents(make_docs(1, start=3))
+            self.assertEqual([d.metadata["page"] for d in store], [0, 1, 2, 3])
+
+    def test_pickle_migration(self):
+        pickle_path = os.path.join(self.path, "docstore.pkl")
+        with open(pickle_path, "wb") as file:
+            pickle.dump(make_docs(4), file)
+        with open_document_store(self.store_path, legacy_pickle=pickle_path) as store:
+            self.assertEqual([d.page_content for d in store], [d.page_content for d in make_docs(4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# tests/test_embedding_cache.py
+import shutil
+import tempfile
+import unittest
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embeddings.cache import CachedEmbeddings, EmbeddingStore, text_key
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(sum(map(ord, t)) % 97), 1.0] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_embeds_each_text_once(self):
+        model = CountingEmbeddings()
+        cached = CachedEmbeddings(model, EmbeddingStore(self.test_dir), batch_size=2)
+        first = cached.embed_documents(["a", "bb", "a", "ccc"])
+        self.assertEqual(model.calls, [["a", "bb"], ["ccc"]])
+        second = cached.embed_documents(["ccc", "a", "dddd"])
+        self.assertEqual(model.calls[-1], ["dddd"])
+        self.assertEqual(second[:2], [first[3], first[0]])
+
+    def test_persists_across_instances(self):
+        model = CountingEmbeddings()
+        store = EmbeddingStore(self.test_dir, dtype="float16")
+        expected = CachedEmbeddings(model, store).embed_documents_array(["x", "yy"])
+        store.close()
+        reopened = CachedEmbeddings(model, EmbeddingStore(self.test_dir))
+        np.testing.assert_allclose(reopened.embed_documents_array(["yy", "x"]), expected[::-1], rtol=1e-3)
+        self.assertEqual(len(model.calls), 1)
+
+    def test_eviction_reuses_rows(self):
+        store = EmbeddingStore(self.test_dir, max_entries=2)
+        store.put_many([text_key("a"), text_key("b")], np.ones((2, 3)))
+        store.get_many([text_key("a")])
+        store.put_many([text_key("c")], np.full((1, 3), 2.0))
+        self.assertEqual(sorted(store.get_many([text_key(t) for t in "abc"])), sorted([text_key("a"), text_key("c")]))
+        store.put_many([text_key("d")], np.full((1, 3), 3.0))
+        self.assertEqual(store._next_row, 3)
+        np.testing.assert_array_equal(store.get_many([text_key("d")])[text_key("d")], [3.0, 3.0, 3.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
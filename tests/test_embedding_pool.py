@@ -0,0 +1,80 @@
+# tests/test_embedding_pool.py
+import unittest
+from unittest import mock
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embeddings.pool import EmbeddingPool
+
+
+class BatchEchoModel(Embeddings):
+    """
+    Fake worker model. Each row is (text number, text length, shortest and longest text of its batch),
+    so the test can check both the order of the results and how texts were grouped into batches.
+    Like HuggingFaceEmbeddings without query_encode_kwargs, it encodes queries as documents.
+    """
+
+    encode_kwargs = {}
+
+    def embed_documents(self, texts):
+        lengths = [len(text) for text in texts]
+        return [[float(text.split()[0]), float(len(text)), float(min(lengths)), float(max(lengths))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def load_echo_model(model_name, torch_threads):
+    return BatchEchoModel()
+
+
+def char_lengths(texts):
+    return np.asarray([len(text) for text in texts], dtype=np.int64)
+
+
+class TestEmbeddingPool(unittest.TestCase):
+    def setUp(self):
+        # Token lengths are computed in this process; characters stand in for tokens.
+        patch = mock.patch("embeddings.pool.token_lengths", char_lengths)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.pool = EmbeddingPool("fake", n_workers=2, torch_threads=1, batch_size=3, window_batches=2,
+                                  model_loader=load_echo_model)
+        self.addCleanup(self.pool.close)
+        rng = np.random.default_rng(0)
+        # 27 texts of mixed lengths: windows of 2 workers * 2 batches * 3 texts = 12, the last one partial.
+        self.texts = [f"{i} " + "x" * int(rng.integers(1, 60)) for i in range(27)]
+
+    def test_rows_follow_input_order_across_windows(self):
+        blocks = list(self.pool.iter_embeddings(self.texts))
+        self.assertEqual([len(block) for block in blocks], [12, 12, 3])
+        vectors = np.vstack(blocks)
+        self.assertEqual(vectors[:, 0].tolist(), list(range(27)))
+        self.assertEqual(vectors[:, 1].tolist(), [len(text) for text in self.texts])
+        np.testing.assert_array_equal(self.pool.embed_documents_array(self.texts), vectors)
+
+    def test_batches_group_similar_lengths_within_a_window(self):
+        vectors = np.vstack(list(self.pool.iter_embeddings(self.texts)))
+        for start in range(0, len(self.texts), 12):
+            window = self.texts[start:start + 12]
+            order = np.argsort(char_lengths(window), kind="stable")
+            for batch_start in range(0, len(order), 3):
+                batch = order[batch_start:batch_start + 3]
+                lengths = [len(window[i]) for i in batch]
+                for i in batch:
+                    self.assertEqual(vectors[start + i, 2:].tolist(), [min(lengths), max(lengths)])
+
+    def test_queries_are_embedded_in_batches(self):
+        # Rows of one batch report the same shortest and longest text: 3 queries, one worker call.
+        queries = ["0 short", "1 a longer query", "2 mid query"]
+        vectors = self.pool.embed_queries(queries)
+        self.assertEqual(vectors[:, 0].tolist(), [0.0, 1.0, 2.0])
+        self.assertEqual({tuple(row) for row in vectors[:, 2:].tolist()}, {(7.0, 16.0)})
+
+    def test_empty_input(self):
+        self.assertEqual(list(self.pool.iter_embeddings([])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
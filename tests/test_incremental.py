@@ -0,0 +1,98 @@
+# tests/test_incremental.py
+import hashlib
+import shutil
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+import numpy as np
+
+from raptor.incremental import build_tree, load_tree_state, update_tree
+
+DIM = 16
+rng = np.random.default_rng(0)
+CENTERS = rng.normal(scale=10.0, size=(3, DIM))
+
+
+def vector_for(text: str) -> np.ndarray:
+    # Leaves "b<blob>-<i>" sit around their blob center; other texts get a pseudo-random vector.
+    seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+    noise = np.random.default_rng(seed).normal(size=DIM)
+    if text.startswith("b") and "-" in text:
+        return CENTERS[int(text[1:text.index("-")])] + noise
+    if text.startswith("far-"):
+        return 200.0 + noise
+    return noise
+
+
+def fake_embed(texts: List[str]) -> np.ndarray:
+    return np.stack([vector_for(t) for t in texts])
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, contexts: List[str]) -> List[str]:
+        self.calls += len(contexts)
+        return ["summary " + hashlib.md5(c.encode("utf-8")).hexdigest()[:8] for c in contexts]
+
+
+class TestIncrementalUpdate(unittest.TestCase):
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.summarizer = FakeSummarizer()
+        patches = [
+            mock.patch("raptor.tree_builder.embed", fake_embed),
+            mock.patch("raptor.incremental.embed", fake_embed),
+            mock.patch("raptor.tree_builder.summarize_texts", self.summarizer),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.leaves = [f"b{b}-{i}" for b in range(3) for i in range(25)]
+        self.tree = build_tree(self.leaves, self.state_dir, n_levels=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.state_dir)
+
+    def test_only_changed_clusters_are_resummarized(self):
+        n_clusters = len(self.tree[1][1])
+        self.summarizer.calls = 0
+        updated = update_tree(["b0-100", "b0-101"], self.state_dir, n_levels=2, drift_threshold=1.0)
+        self.assertEqual(len(updated[1][0]), len(self.leaves) + 2)
+        self.assertEqual(len(updated[1][1]), n_clusters)
+        new_clusters = set(np.concatenate(updated[1][0]["cluster"].tolist()[-2:]).tolist())
+        # Level-1 clusters of the new leaves plus the level-2 clusters above them.
+        level_2_dirty = len(self.tree[2][1])
+        self.assertLessEqual(self.summarizer.calls, len(new_clusters) + level_2_dirty)
+        self.assertLess(len(new_clusters), n_clusters)
+        reloaded, models = load_tree_state(self.state_dir)
+        self.assertEqual(reloaded[1][0]["text"].tolist(), updated[1][0]["text"].tolist())
+        self.assertEqual(sorted(models), [1, 2])
+
+    def test_drift_triggers_rebuild(self):
+        far = [f"far-{i}" for i in range(10)]
+        self.summarizer.calls = 0
+        updated = update_tree(far, self.state_dir, n_levels=2, drift_threshold=0.2)
+        self.assertEqual(updated[1][0]["text"].tolist(), self.leaves + far)
+        # Re-clustered: every level-1 cluster is summarized again and the far texts have clusters of their own.
+        self.assertGreaterEqual(self.summarizer.calls, len(updated[1][1]))
+        far_clusters = set(np.concatenate(updated[1][0]["cluster"].tolist()[-10:]).tolist())
+        leaf_clusters = set(np.concatenate(updated[1][0]["cluster"].tolist()[:-10]).tolist())
+        self.assertTrue(far_clusters)
+        self.assertFalse(far_clusters & leaf_clusters)
+
+    def test_full_rebuild_after_update_and_on_changed_texts(self):
+        update_tree(["b0-100", "b0-101"], self.state_dir, n_levels=2, drift_threshold=1.0)
+        changed = self.leaves[5:] + ["b1-200", "b2-201"]
+        rebuilt = build_tree(changed, self.state_dir, n_levels=2)
+        self.assertEqual(rebuilt[1][0]["text"].tolist(), changed)
+        reloaded, _ = load_tree_state(self.state_dir)
+        self.assertEqual(reloaded[1][0]["text"].tolist(), changed)
+        self.assertEqual(build_tree(self.leaves, self.state_dir, n_levels=2)[1][0]["text"].tolist(), self.leaves)
+
+
+if __name__ == "__main__":
+    unittest.main()
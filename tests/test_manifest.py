@@ -0,0 +1,116 @@
+# tests/test_manifest.py
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from langchain_core.documents.base import Document
+
+from ingestion.document_store import DocumentStore
+from ingestion.manifest import IngestManifest, apply_ingest
+from ingestion.parallel import FileResult
+
+
+def settings(path):
+    return "test-v1"
+
+
+class TestIngestManifest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.data = os.path.join(self.dir, "data")
+        os.makedirs(self.data)
+        self.parsed = []
+
+    def write(self, name, content):
+        path = os.path.join(self.data, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def paths(self):
+        return sorted(os.path.join(self.data, name) for name in os.listdir(self.data))
+
+    def parse(self, paths):
+        """
+        Toy parser: one Document per line, "bad" files fail.
+        """
+        for path in paths:
+            self.parsed.append(os.path.basename(path))
+            with open(path, encoding="utf-8") as file:
+                content = file.read()
+            if content == "bad":
+                yield FileResult(path, None, "ValueError: cannot parse", 0.0)
+                continue
+            rel_path = os.path.relpath(path, self.data)
+            docs = [Document(page_content=line, metadata={"relative_path": rel_path}) for line in content.splitlines()]
+            yield FileResult(path, docs, None, 0.0)
+
+    def ingest(self, store, manifest):
+        self.parsed = []
+        return apply_ingest(self.data, self.paths(), manifest, store, self.parse, settings)
+
+    def test_only_changed_files_are_parsed(self):
+        self.write("a.txt", "a1\na2")
+        self.write("b.txt", "b1")
+        self.write("c.txt", "bad")
+        with DocumentStore(os.path.join(self.dir, "store")) as store, \
+                IngestManifest(os.path.join(self.dir, "manifest.sqlite")) as manifest:
+            delta = self.ingest(store, manifest)
+            self.assertEqual(sorted(d.page_content for d in delta.added), ["a1", "a2", "b1"])
+            self.assertEqual([os.path.basename(p) for p in delta.failed], ["c.txt"])
+            self.assertEqual(len(store), 3)
+
+            # Nothing changed: only the failed file is retried.
+            delta = self.ingest(store, manifest)
+            self.assertEqual(self.parsed, ["c.txt"])
+            self.assertEqual((delta.added, delta.removed_ids), ([], []))
+
+            # Touching a file without changing it does not re-parse it.
+            os.utime(os.path.join(self.data, "a.txt"), ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+            self.ingest(store, manifest)
+            self.assertEqual(self.parsed, ["c.txt"])
+
+            old_b = manifest.doc_ids("b.txt")
+            self.write("b.txt", "b1 changed")
+            os.remove(os.path.join(self.data, "a.txt"))
+            delta = self.ingest(store, manifest)
+            self.assertEqual(self.parsed, ["b.txt", "c.txt"])
+            self.assertEqual([d.page_content for d in delta.added], ["b1 changed"])
+            self.assertEqual(len(delta.removed_ids), 3)
+            self.assertEqual([d.page_content for d in store], ["b1 changed"])
+            self.assertNotIn(old_b[0], store)
+            self.assertEqual(manifest.doc_ids("a.txt"), [])
+
+            # A deleted file that comes back is ingested again, with the same ids as before.
+            self.write("a.txt", "a1\na2")
+            delta = self.ingest(store, manifest)
+            self.assertEqual([d.page_content for d in delta.added], ["a1", "a2"])
+            self.assertEqual(len(store), 3)
+
+    def test_settings_change_reparses(self):
+        self.write("a.txt", "a1")
+        with DocumentStore(os.path.join(self.dir, "store")) as store, \
+                IngestManifest(os.path.join(self.dir, "manifest.sqlite")) as manifest:
+            self.ingest(store, manifest)
+            self.parsed = []
+            apply_ingest(self.data, self.paths(), manifest, store, self.parse, lambda path: "test-v2")
+            self.assertEqual(self.parsed, ["a.txt"])
+            self.assertEqual(len(store), 1)
+
+    def test_existing_store_is_adopted(self):
+        self.write("a.txt", "a1")
+        self.write("b.txt", "b1")
+        with DocumentStore(os.path.join(self.dir, "store")) as store:
+            store.add_documents([Document(page_content="a1", metadata={"relative_path": "a.txt"})])
+            with IngestManifest(os.path.join(self.dir, "manifest.sqlite")) as manifest:
+                self.ingest(store, manifest)
+                self.assertEqual(self.parsed, ["b.txt"])
+                self.assertEqual(len(manifest), 2)
+                self.assertEqual(len(store), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# tests/test_multi_index.py
+import time
+import unittest
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from vector_store.multi_index import MultiIndexSearcher, weighted_rrf
+
+DIM = 16
+
+
+class ToyEmbeddings(Embeddings):
+    """
+    Deterministic toy embedding (a random vector seeded by the document number) that counts query calls.
+    """
+
+    def __init__(self):
+        self.query_calls = 0
+
+    def embed_documents(self, texts):
+        return [np.random.default_rng(int(text.split()[1])).standard_normal(DIM).tolist() for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return self.embed_documents([text])[0]
+
+
+class SlowIndex:
+    """
+    Wraps a FAISS index and answers after a delay.
+    """
+
+    def __init__(self, index, seconds):
+        self.index, self.seconds = index, seconds
+
+    def search(self, vectors, k):
+        time.sleep(self.seconds)
+        return self.index.search(vectors, k)
+
+
+def reference_rrf(rankings, weights, rrf_k):
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+    return scores
+
+
+def make_store(embeddings, numbers):
+    texts = [f"doc {i}" for i in numbers]
+    return FAISS.from_embeddings(list(zip(texts, embeddings.embed_documents(texts))), embeddings,
+                                 metadatas=[{"i": i} for i in numbers])
+
+
+class TestWeightedRRF(unittest.TestCase):
+    def test_matches_reference(self):
+        rng = np.random.default_rng(0)
+        rankings = [list(rng.choice([f"d{i}" for i in range(30)], size=10, replace=False)) for _ in range(3)]
+        weights = [0.5, 0.3, 0.2]
+        keys, scores = weighted_rrf(rankings, weights, rrf_k=60)
+        expected = reference_rrf(rankings, weights, 60)
+        self.assertEqual(set(keys), set(expected))
+        for key, score in zip(keys, scores):
+            self.assertAlmostEqual(score, expected[key])
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_empty(self):
+        keys, scores = weighted_rrf([[], []], [1.0, 1.0])
+        self.assertEqual((len(keys), len(scores)), (0, 0))
+
+
+class TestMultiIndexSearcher(unittest.TestCase):
+    def test_one_embedding_per_model_and_fusion(self):
+        embeddings = ToyEmbeddings()
+        stores = {"text": make_store(embeddings, range(0, 50)), "chats": make_store(embeddings, range(25, 75))}
+        searcher = MultiIndexSearcher(stores, weights={"text": 0.7, "chats": 0.3})
+        self.addCleanup(searcher.close)
+        results = searcher.search_with_scores("doc 30", k=3)
+        self.assertEqual(embeddings.query_calls, 1)
+        # In both indexes and first in both: 0.7 / 61 + 0.3 / 61.
+        self.assertEqual(results[0][0].page_content, "doc 30")
+        self.assertAlmostEqual(results[0][1], 1.0 / 61)
+        self.assertEqual(len(results), 3)
+
+    def test_slow_index_is_skipped(self):
+        embeddings, other = ToyEmbeddings(), ToyEmbeddings()
+        stores = {"fast": make_store(embeddings, range(0, 20)), "slow": make_store(other, range(0, 20))}
+        stores["slow"].index = SlowIndex(stores["slow"].index, 1.0)
+        searcher = MultiIndexSearcher(stores, timeouts_ms={"slow": 100})
+        self.addCleanup(searcher.close)
+        start = time.monotonic()
+        with self.assertLogs(level="WARNING"):
+            results = searcher.search("doc 3", k=2)
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual((embeddings.query_calls, other.query_calls), (1, 1))
+        self.assertEqual(results[0].page_content, "doc 3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# tests/test_parallel_ingest.py
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ingestion.parallel import IngestStats, imap_files
+
+
+def read_file(path):
+    """
+    Toy parser: "sleep" files hang, "bad" files fail, others return their content.
+    """
+    with open(path, encoding="utf-8") as file:
+        content = file.read()
+    if content == "sleep":
+        time.sleep(60)
+    if content == "bad":
+        raise ValueError("cannot parse")
+    return [content]
+
+
+class TestImapFiles(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def make(self, contents, ext=".txt"):
+        paths = []
+        for i, content in enumerate(contents):
+            path = os.path.join(self.dir, f"{i:03d}{ext}")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(content)
+            paths.append(path)
+        return paths
+
+    def test_ordered_results_with_isolated_errors_and_timeouts(self):
+        contents = [f"doc {i}" for i in range(12)]
+        contents[3] = "bad"
+        contents[5] = "sleep"
+        paths = self.make(contents)
+        start = time.monotonic()
+        results = list(imap_files(read_file, paths, workers=2, timeout=5, max_pending=3))
+        self.assertLess(time.monotonic() - start, 50)
+        self.assertEqual([r.path for r in results], paths)
+        self.assertIn("ValueError: cannot parse", results[3].error)
+        self.assertTrue(results[5].timed_out)
+        for i, result in enumerate(results):
+            if i not in (3, 5):
+                self.assertIsNone(result.error)
+                self.assertEqual(result.value, [f"doc {i}"])
+
+        stats = IngestStats()
+        for result in results:
+            stats.add(result, len(result.value or []))
+        summary = stats.summary()[".txt"]
+        self.assertEqual((summary["files"], summary["documents"], summary["errors"], summary["timeouts"]), (12, 10, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
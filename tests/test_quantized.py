@@ -0,0 +1,67 @@
+# tests/test_quantized.py
+import importlib.util
+import unittest
+
+import numpy as np
+
+from config import EMBEDDING_MODEL_NAME, RERANKING_MODEL
+from embeddings.quantized import PARITY_PASSAGES, PARITY_QUERIES, embedding_parity, ranking_parity
+
+HAS_TORCH = all(importlib.util.find_spec(name) for name in ("torch", "sentence_transformers"))
+HAS_ONNX = HAS_TORCH and all(importlib.util.find_spec(name) for name in ("onnxruntime", "optimum"))
+
+# Minimum agreement with fp32 torch: (embedding min cosine, reranker mean Spearman)
+THRESHOLDS = {"int8": (0.98, 0.9), "onnx": (0.9999, 0.99), "onnx_int8": (0.98, 0.9)}
+
+
+class TestParityMetrics(unittest.TestCase):
+    def test_embedding_parity(self):
+        rng = np.random.default_rng(0)
+        reference = rng.standard_normal((5, 8))
+        self.assertAlmostEqual(embedding_parity(reference, reference * 3)["min_cosine"], 1.0)
+        self.assertLess(embedding_parity(reference, -reference)["mean_cosine"], 0)
+
+    def test_ranking_parity(self):
+        report = ranking_parity([[0.1, 0.9, 0.5], [3, 2, 1]], [[0.2, 0.8, 0.3], [1, 2, 3]])
+        self.assertEqual(report["top1_agreement"], 0.5)
+        self.assertAlmostEqual(report["mean_spearman"], 0.0)
+
+
+@unittest.skipUnless(HAS_TORCH, "torch / sentence-transformers not installed")
+class TestBackendParity(unittest.TestCase):
+    """
+    Every quantized backend against fp32 torch on the fixed sample in embeddings.quantized.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        from embeddings.quantized import load_cross_encoder, load_embeddings
+        cls.load_embeddings, cls.load_cross_encoder = load_embeddings, load_cross_encoder
+        cls.pairs = [[(query, passage) for passage in PARITY_PASSAGES] for query in PARITY_QUERIES]
+        cls.reference_vectors = np.asarray(load_embeddings(EMBEDDING_MODEL_NAME, "torch").embed_documents(PARITY_PASSAGES))
+        reranker = load_cross_encoder(RERANKING_MODEL, "torch")
+        cls.reference_scores = [list(reranker.score(pairs)) for pairs in cls.pairs]
+
+    def check(self, backend):
+        min_cosine, min_spearman = THRESHOLDS[backend]
+        vectors = self.load_embeddings(EMBEDDING_MODEL_NAME, backend).embed_documents(PARITY_PASSAGES)
+        self.assertGreaterEqual(embedding_parity(self.reference_vectors, vectors)["min_cosine"], min_cosine)
+        reranker = self.load_cross_encoder(RERANKING_MODEL, backend)
+        report = ranking_parity(self.reference_scores, [reranker.score(pairs) for pairs in self.pairs])
+        self.assertGreaterEqual(report["mean_spearman"], min_spearman)
+        self.assertEqual(report["top1_agreement"], 1.0)
+
+    def test_int8(self):
+        self.check("int8")
+
+    @unittest.skipUnless(HAS_ONNX, "onnxruntime / optimum not installed")
+    def test_onnx(self):
+        self.check("onnx")
+
+    @unittest.skipUnless(HAS_ONNX, "onnxruntime / optimum not installed")
+    def test_onnx_int8(self):
+        self.check("onnx_int8")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+# tests/test_query_service.py
+import asyncio
+import json
+import shutil
+import tempfile
+import unittest
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents.base import Document
+
+from embeddings.quantized import SentenceTransformerEmbeddings
+from query_service.api import RetrievalService, SearchRequest, create_app, embed_queries
+from query_service.batching import MicroBatcher
+from vector_store.docstore import SQLiteDocstore, SQLiteIdMap
+from vector_store.streaming import build_index_streaming
+
+DIM = 16
+
+
+def embed(texts):
+    """
+    Deterministic toy embedding: a random vector seeded by the document number.
+    """
+    return np.asarray([np.random.default_rng(int(text.split()[1])).standard_normal(DIM) for text in texts], dtype=np.float32)
+
+
+async def call(app, method, path, body=None):
+    """
+    Sends one HTTP request straight to an ASGI app and returns (status, decoded JSON body).
+    """
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "http", "method": method, "path": path, "headers": []}, receive, send)
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_items_share_batches(self):
+        batches = []
+
+        def double(items):
+            batches.append(len(items))
+            return [item * 2 for item in items]
+
+        async def run():
+            batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50)
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+            batcher.close()
+            return results
+
+        self.assertEqual(asyncio.run(run()), [i * 2 for i in range(20)])
+        self.assertEqual(sum(batches), 20)
+        self.assertLessEqual(max(batches), 8)
+        self.assertLess(len(batches), 20)
+
+    def test_errors_reach_every_caller(self):
+        def fail(items):
+            raise ValueError("model crashed")
+
+        async def run():
+            batcher = MicroBatcher(fail, max_wait_ms=1)
+            results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+            batcher.close()
+            return results
+
+        self.assertTrue(all(isinstance(result, ValueError) for result in asyncio.run(run())))
+
+
+class TestRetrievalService(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        docs = (Document(page_content=f"doc {i}", metadata={"i": i}) for i in range(200))
+        build_index_streaming(docs, self.path, embed, index_type="flat")
+        docstore = SQLiteDocstore(f"{self.path}/docstore.sqlite", read_only=True)
+        self.addCleanup(docstore.close)
+        store = FAISS(embedding_function=None, index=faiss.read_index(f"{self.path}/index.faiss"),
+                      docstore=docstore, index_to_docstore_id=SQLiteIdMap(docstore))
+        self.embed_calls = []
+
+        def counting_embed(texts):
+            self.embed_calls.append(len(texts))
+            return embed(texts)
+
+        self.service = RetrievalService({"kb": store, "copy": store}, counting_embed, max_batch_size=16, max_wait_ms=20)
+
+    def test_batched_search_over_http(self):
+        app = create_app(lambda: self.service)
+
+        async def run():
+            responses = await asyncio.gather(*(
+                call(app, "POST", "/search", {"query": f"doc {i}", "k": 3, "index": "copy" if i % 2 else None})
+                for i in range(30)
+            ))
+            errors = [
+                await call(app, "POST", "/search", {"k": 3}),
+                await call(app, "POST", "/search", {"query": "doc 1", "index": "missing"}),
+                await call(app, "GET", "/search"),
+            ]
+            metrics = await call(app, "GET", "/metrics")
+            self.service.close()
+            return responses, errors, metrics
+
+        responses, errors, metrics = asyncio.run(run())
+        for i, (status, body) in enumerate(responses):
+            self.assertEqual(status, 200)
+            self.assertEqual(len(body["results"]), 3)
+            self.assertEqual(body["results"][0]["metadata"], {"i": i})
+            self.assertEqual(body["results"][0]["index"], "copy" if i % 2 else "kb")
+        self.assertLess(len(self.embed_calls), 30)
+        self.assertEqual([status for status, _ in errors], [400, 404, 405])
+        status, snapshot = metrics
+        self.assertEqual((status, snapshot["requests"]), (200, 30))
+        self.assertGreater(snapshot["mean_batch_size"], 1)
+        self.assertGreaterEqual(snapshot["p99_ms"], snapshot["p50_ms"])
+
+
+class CountingEncoder:
+    """
+    Stands in for a sentence-transformers model: records the texts of every encode call.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return embed(texts)
+
+
+class TestQueryEmbedding(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        build_index_streaming((Document(page_content=f"doc {i}") for i in range(50)), self.path, embed, index_type="flat")
+        docstore = SQLiteDocstore(f"{self.path}/docstore.sqlite", read_only=True)
+        self.addCleanup(docstore.close)
+        self.store = FAISS(embedding_function=None, index=faiss.read_index(f"{self.path}/index.faiss"),
+                           docstore=docstore, index_to_docstore_id=SQLiteIdMap(docstore))
+
+    def test_batch_of_queries_is_one_encode_call(self):
+        # A CPU-backend embedder (INFERENCE_BACKEND other than torch) without loading a model.
+        embeddings = SentenceTransformerEmbeddings.__new__(SentenceTransformerEmbeddings)
+        embeddings.batch_size, embeddings.client = 32, CountingEncoder()
+        service = RetrievalService({"kb": self.store}, lambda texts: embed_queries(embeddings, texts))
+        self.addCleanup(service.close)
+        queries = [f"doc {i}" for i in range(8)]
+        results = service.search_batch([SearchRequest(query, 1, "kb") for query in queries])
+        self.assertEqual(embeddings.client.calls, [queries])
+        self.assertEqual([result[0]["page_content"] for result in results], queries)
+
+    def test_models_with_a_query_encoding_are_asked_per_query(self):
+        class PrefixedQueries:
+            def embed_query(self, text):
+                return embed([text])[0]
+
+        vectors = embed_queries(PrefixedQueries(), ["doc 1", "doc 2"])
+        np.testing.assert_array_equal(vectors, embed(["doc 1", "doc 2"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+# tests/test_registry.py
+import threading
+import time
+import unittest
+
+from embeddings.registry import get_model, loaded_models, release_model
+
+
+class TestModelRegistry(unittest.TestCase):
+    def tearDown(self):
+        release_model("test:model")
+
+    def test_loads_once_under_concurrency(self):
+        loads = []
+
+        def factory():
+            loads.append(1)
+            time.sleep(0.05)
+            return object()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_model("test:model", factory))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(loads), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_release_reloads(self):
+        first = get_model("test:model", object)
+        self.assertIn("test:model", loaded_models())
+        self.assertTrue(release_model("test:model"))
+        self.assertFalse(release_model("test:model"))
+        self.assertIsNot(get_model("test:model", object), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
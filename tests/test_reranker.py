@@ -0,0 +1,81 @@
+# tests/test_reranker.py
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents.base import Document
+
+from query_service.reranker import BatchedCrossEncoderReranker, BatchedReranker, ScoreCache
+
+
+class OverlapModel:
+    """
+    Toy cross-encoder: the score is the number of query words in the passage. Records every forward pass.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def score(self, pairs):
+        time.sleep(0.01)
+        with self.lock:
+            self.calls.append(list(pairs))
+        return [float(sum(word in passage.split() for word in query.split())) for query, passage in pairs]
+
+
+def docs(*texts):
+    return [Document(page_content=text, id=f"doc-{i}") for i, text in enumerate(texts)]
+
+
+class TestBatchedReranker(unittest.TestCase):
+    def setUp(self):
+        self.model = OverlapModel()
+        self.reranker = BatchedReranker(self.model, max_batch_pairs=64, max_wait_ms=30, model_batch_size=8,
+                                        cache_size=1000, truncate_fn=lambda text: text[:40])
+        self.addCleanup(self.reranker.close)
+
+    def test_concurrent_requests_share_batches_and_cache(self):
+        candidates = docs("incident management process", "change request", "incident", "problem record")
+
+        def rerank(i):
+            return self.reranker.rerank(f"incident process {i}", candidates)
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(rerank, range(8)))
+        for ranked in results:
+            self.assertEqual([doc.id for doc, _ in ranked], ["doc-0", "doc-2", "doc-1", "doc-3"])
+            self.assertEqual([score for _, score in ranked], [2.0, 1.0, 0.0, 0.0])
+        pairs = [pair for call in self.model.calls for pair in call]
+        self.assertEqual(len(pairs), 32)
+        self.assertLessEqual(max(len(call) for call in self.model.calls), 8)
+        # 32 pairs of 8 requests in fewer passes than one per request.
+        self.assertLess(len(self.model.calls), 8)
+
+        self.model.calls.clear()
+        self.assertEqual(self.reranker.score("incident process 3", candidates), [2.0, 0.0, 1.0, 0.0])
+        self.assertEqual(self.model.calls, [])
+        self.assertEqual(self.reranker.cache.hits, 4)
+
+    def test_passages_are_truncated(self):
+        self.reranker.score("tail", docs("x" * 50 + " tail"))
+        self.assertEqual(self.model.calls[0][0][1], "x" * 40)
+
+    def test_compressor(self):
+        compressor = BatchedCrossEncoderReranker(reranker=self.reranker, top_n=1)
+        top = compressor.compress_documents(docs("change request", "incident record"), "incident")
+        self.assertEqual([doc.id for doc in top], ["doc-1"])
+
+
+class TestScoreCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = ScoreCache(max_entries=2)
+        cache.put_many({("q", "a"): 1.0, ("q", "b"): 2.0})
+        cache.get_many([("q", "a")])
+        cache.put_many({("q", "c"): 3.0})
+        self.assertEqual(cache.get_many([("q", "a"), ("q", "b"), ("q", "c")]), {("q", "a"): 1.0, ("q", "c"): 3.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# tests/test_retriever.py
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from raptor.retriever import TreeRetriever
+from raptor.tree_store import write_tree_store
+
+DIM = 32
+
+
+def synthetic_tree(n_top=4, n_mid=5, n_leaves=20, seed=0):
+    """
+    Three-level tree of well separated blobs: summaries are the means of their children.
+    """
+    rng = np.random.default_rng(seed)
+    top = rng.normal(scale=20.0, size=(n_top, DIM))
+    mid = np.repeat(top, n_mid, axis=0) + rng.normal(scale=5.0, size=(n_top * n_mid, DIM))
+    leaves = np.repeat(mid, n_leaves, axis=0) + rng.normal(size=(n_top * n_mid * n_leaves, DIM))
+    mid_of_leaf = np.repeat(np.arange(len(mid)), n_leaves)
+    top_of_mid = np.repeat(np.arange(n_top), n_mid)
+    level_1 = (
+        pd.DataFrame({
+            "text": [f"leaf {i}" for i in range(len(leaves))],
+            "embd": list(leaves),
+            "cluster": [np.array([c]) for c in mid_of_leaf],
+        }),
+        pd.DataFrame({"summaries": [f"mid {i}" for i in range(len(mid))], "level": 1, "cluster": np.arange(len(mid))}),
+    )
+    mid_means = np.stack([leaves[mid_of_leaf == i].mean(axis=0) for i in range(len(mid))])
+    level_2 = (
+        pd.DataFrame({
+            "text": level_1[1]["summaries"].tolist(),
+            "embd": list(mid_means),
+            "cluster": [np.array([c]) for c in top_of_mid],
+        }),
+        pd.DataFrame({"summaries": [f"top {i}" for i in range(n_top)], "level": 2, "cluster": np.arange(n_top)}),
+    )
+    top_means = np.stack([mid_means[top_of_mid == i].mean(axis=0) for i in range(n_top)])
+    return {1: level_1, 2: level_2}, lambda texts: top_means[[int(t.split()[1]) for t in texts]]
+
+
+class FakeQueryEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector.tolist()
+
+
+class TestTreeRetriever(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        tree, embed_fn = synthetic_tree()
+        self.store = write_tree_store(tree, self.path, embed_fn=embed_fn)
+        self.n_leaves = len(tree[1][0])
+
+    def test_traversal_matches_flat_scan_and_touches_fewer_vectors(self):
+        retriever = TreeRetriever(self.store, beam_width=2)
+        rng = np.random.default_rng(1)
+        for leaf in rng.choice(self.n_leaves, size=10, replace=False):
+            query = np.asarray(self.store.embeddings[leaf]) + rng.normal(scale=0.1, size=DIM)
+            result = retriever.traverse(query, k=5)
+            flat = retriever.collapsed_search(query, k=5, level=0)
+            self.assertEqual([hit.node for hit in result.hits], [hit.node for hit in flat])
+            self.assertLess(result.n_scored, self.n_leaves / 2)
+            self.assertEqual(result.hits[0].node, leaf)
+
+    def test_ancestors_follow_the_tree(self):
+        retriever = TreeRetriever(self.store)
+        leaf = 123
+        query = np.asarray(self.store.embeddings[leaf])
+        hit = retriever.traverse(query, k=1).hits[0]
+        self.assertEqual(hit.node, leaf)
+        parent, root = hit.ancestors
+        self.assertIn(leaf, self.store.children(parent).tolist())
+        self.assertIn(parent, self.store.children(root).tolist())
+        self.assertEqual(self.store.levels[root], 2)
+
+    def test_retrieve_returns_documents_with_ancestor_summaries(self):
+        query = np.asarray(self.store.embeddings[42])
+        retriever = TreeRetriever(self.store, embeddings=FakeQueryEmbeddings(query))
+        documents = retriever.retrieve("question", k=3)
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(documents[0].page_content, "leaf 42")
+        self.assertEqual(documents[0].metadata["ancestor_summaries"], ["mid 2", "top 0"])
+
+    def test_collapsed_search_covers_all_levels(self):
+        retriever = TreeRetriever(self.store)
+        root = int(self.store.roots()[1])
+        hits = retriever.collapsed_search(np.asarray(self.store.embeddings[root]), k=1, block_size=7)
+        self.assertEqual(hits[0].node, root)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# tests/test_sparse_index.py
+import importlib.util
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents.base import Document
+from langchain_core.embeddings import Embeddings
+
+from vector_store.sparse_index import SPARSE_INDEX_FILE, build_sparse_index, hybrid_search, load_sparse_index, tokenize
+from vector_store.streaming import build_index_streaming
+
+DIM = 16
+TEXTS = [
+    "Требование 1024: система должна сохранять историю изменений карточки клиента.",
+    "Требование 1025: карточка клиента содержит признак госзакупки.",
+    "Инцидент — это незапланированное прерывание ИТ-услуги.",
+    "Service desk agents log every incident with its priority.",
+    "Задача 58213 в Битрикс: обновить карточку клиента.",
+    "Проблема — это причина одного или нескольких инцидентов.",
+]
+
+
+class ToyEmbeddings(Embeddings):
+    """
+    Deterministic toy embedding: a random vector seeded by the text.
+    """
+
+    def embed_documents(self, texts):
+        return [np.random.default_rng(sum(map(ord, text))).standard_normal(DIM).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def reference_bm25(texts, query, k1=1.2, b=0.75):
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths)
+    scores = [0.0] * len(docs)
+    for term in set(tokenize(query)):
+        df = sum(term in doc for doc in docs)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            tf = doc[term]
+            if tf:
+                scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[i] / avg_length))
+    return scores
+
+
+class TestSparseIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_bm25_scores_match_reference(self):
+        index = build_sparse_index(TEXTS, analyzer="plain")
+        for query in ("карточки клиента", "требование 1024", "incident priority", "58213"):
+            expected = reference_bm25(TEXTS, query)
+            positions, scores = index.search(query, k=3)
+            self.assertEqual(len(positions), min(3, sum(score > 0 for score in expected)))
+            for position, score in zip(positions, scores):
+                self.assertAlmostEqual(float(score), expected[position], places=4)
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+        self.assertEqual(index.search("1024", k=5)[0].tolist(), [0])
+        self.assertEqual(len(index.search("нет такого слова", k=5)[0]), 0)
+
+    def test_save_and_load(self):
+        texts = [f"документ {i} задача {i % 97} клиента {i % 7}" for i in range(5000)]
+        index = build_sparse_index(texts, analyzer="plain")
+        index.save(self.path)
+        loaded = load_sparse_index(self.path)
+        np.testing.assert_array_equal(loaded.doc_ids, index.doc_ids)
+        np.testing.assert_allclose(loaded.impacts, index.impacts)
+        for query in ("задача 42", "клиента 3 документ 4000"):
+            np.testing.assert_array_equal(loaded.search(query, 10)[0], index.search(query, 10)[0])
+        # Gap-encoded, deflated postings are far smaller than the raw doc numbers and frequencies.
+        raw_size = index.doc_ids.nbytes + index.tfs.nbytes
+        self.assertLess(os.path.getsize(os.path.join(self.path, SPARSE_INDEX_FILE)), raw_size / 2)
+        self.assertIsNone(load_sparse_index(tempfile.gettempdir() + "/no-such-index"))
+
+    @unittest.skipUnless(importlib.util.find_spec("snowballstemmer"), "snowballstemmer is not installed")
+    def test_russian_stemming(self):
+        index = build_sparse_index(TEXTS)
+        self.assertEqual(index.analyzer_name, "snowball")
+        # "инциденты" and "инцидентов" share their stem.
+        self.assertIn(5, index.search("инциденты", k=5)[0].tolist())
+
+    def test_hybrid_finds_identifiers(self):
+        embeddings = ToyEmbeddings()
+        store = FAISS.from_texts(TEXTS, embeddings)
+        sparse = build_sparse_index(TEXTS, analyzer="plain")
+        results = hybrid_search(store, sparse, "Задача 58213", k=3)
+        self.assertEqual(results[0][0].page_content, TEXTS[4])
+        self.assertEqual(len(results), 3)
+        dense_only = hybrid_search(store, sparse, "Задача 58213", k=3, sparse_weight=0.0)
+        self.assertEqual([doc.page_content for doc, _ in dense_only],
+                         [doc.page_content for doc in store.similarity_search("Задача 58213", k=3)])
+
+    def test_streaming_build_writes_sparse_index(self):
+        documents = (Document(page_content=text) for text in TEXTS)
+        build_index_streaming(documents, self.path, ToyEmbeddings().embed_documents, index_type="flat", batch_size=2)
+        sparse = load_sparse_index(self.path)
+        self.assertEqual(sparse.n_docs, len(TEXTS))
+        self.assertEqual(sparse.search("58213", k=1)[0].tolist(), [4])
+
+
+if __name__ == "__main__":
+    unittest.main()
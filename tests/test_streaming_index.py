@@ -0,0 +1,132 @@
+# tests/test_streaming_index.py
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import faiss
+import numpy as np
+from langchain_core.documents.base import Document
+
+from vector_store.docstore import SQLiteDocstore
+from vector_store.streaming import batched, build_index_streaming, prefetch
+
+DIM = 16
+
+
+def embed(texts):
+    """
+    Deterministic toy embedding: a random vector seeded by the document number.
+    """
+    return [np.random.default_rng(int(text.split()[1])).standard_normal(DIM).tolist() for text in texts]
+
+
+def docs(n):
+    for i in range(n):
+        yield Document(page_content=f"doc {i}", metadata={"i": i})
+
+
+class TestStreamingIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_prefetch_is_bounded(self):
+        produced = []
+
+        def items():
+            for i in range(50):
+                produced.append(i)
+                yield i
+
+        consumed = 0
+        for item in prefetch(items(), 3):
+            time.sleep(0.005)
+            consumed += 1
+            # At most the queue, the item being put and the one being consumed are ahead.
+            self.assertLessEqual(len(produced) - consumed, 3 + 2)
+        self.assertEqual(consumed, 50)
+
+    def test_prefetch_reraises_and_stops(self):
+        def failing():
+            yield 1
+            raise RuntimeError("parser crashed")
+
+        with self.assertRaises(RuntimeError):
+            list(prefetch(failing(), 2))
+
+        threads = threading.active_count()
+        for _ in prefetch(iter(range(10 ** 6)), 2):
+            break
+        time.sleep(0.5)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_ivf_index_matches_documents(self):
+        n = build_index_streaming(docs(3000), self.path, embed, index_type="ivf_flat", batch_size=128, train_size=2000)
+        self.assertEqual(n, 3000)
+        index = faiss.read_index(f"{self.path}/index.faiss")
+        self.assertEqual(index.ntotal, 3000)
+        self.assertIsInstance(index, faiss.IndexIVFFlat)
+        index.nprobe = index.nlist
+        docstore = SQLiteDocstore(f"{self.path}/docstore.sqlite", read_only=True)
+        self.addCleanup(docstore.close)
+        self.assertEqual(len(docstore), 3000)
+        for i in (0, 1999, 2000, 2999):
+            _, positions = index.search(np.asarray(embed([f"doc {i}"]), dtype=np.float32), 1)
+            doc = docstore.search(docstore.id_at(positions[0][0]))
+            self.assertEqual((doc.page_content, doc.metadata), (f"doc {i}", {"i": i}))
+
+    def test_small_stream_is_trained_on_close(self):
+        n = build_index_streaming(docs(10), self.path, embed, index_type="ivf_pq", batch_size=4, train_size=1000)
+        self.assertEqual(n, 10)
+        self.assertEqual(faiss.read_index(f"{self.path}/index.faiss").ntotal, 10)
+
+    def test_empty_stream_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            build_index_streaming(docs(0), self.path, embed, index_type="flat")
+        self.assertEqual(os.listdir(self.path), [])
+
+        def failing():
+            raise RuntimeError("loader crashed")
+            yield
+
+        with self.assertRaises(RuntimeError):
+            build_index_streaming(failing(), self.path, embed, index_type="flat")
+        self.assertEqual(os.listdir(self.path), [])
+
+    def test_failed_rebuild_keeps_previous_index(self):
+        build_index_streaming(docs(50), self.path, embed, index_type="flat", batch_size=8)
+        before = {name: open(os.path.join(self.path, name), "rb").read() for name in os.listdir(self.path)}
+
+        def failing():
+            for i, doc in enumerate(docs(50)):
+                if i == 30:
+                    raise RuntimeError("loader crashed")
+                yield doc
+
+        with self.assertRaises(RuntimeError):
+            build_index_streaming(failing(), self.path, embed, index_type="flat", batch_size=8)
+        after = {name: open(os.path.join(self.path, name), "rb").read() for name in os.listdir(self.path)}
+        self.assertEqual(after, before)
+        self.assertEqual(faiss.read_index(f"{self.path}/index.faiss").ntotal, 50)
+        parent = os.path.dirname(self.path)
+        self.assertFalse([name for name in os.listdir(parent) if name.startswith(f".{os.path.basename(self.path)}.")])
+
+    def test_rebuild_replaces_files(self):
+        build_index_streaming(docs(50), self.path, embed, index_type="flat", batch_size=8)
+        open(os.path.join(self.path, "index.pkl"), "wb").close()
+        build_index_streaming(docs(20), self.path, embed, index_type="flat", batch_size=8)
+        self.assertEqual(faiss.read_index(f"{self.path}/index.faiss").ntotal, 20)
+        self.assertFalse(os.path.exists(os.path.join(self.path, "index.pkl")))
+        docstore = SQLiteDocstore(f"{self.path}/docstore.sqlite", read_only=True)
+        self.addCleanup(docstore.close)
+        self.assertEqual(len(docstore), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# tests/test_tree_records.py
+import importlib.util
+import unittest
+from typing import List
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from raptor.tree_builder import tree_records
+
+DIM = 8
+
+
+def vector_for(text: str) -> np.ndarray:
+    return np.random.default_rng(sum(map(ord, text))).normal(size=DIM).astype(np.float32)
+
+
+class CountingEmbeddings(Embeddings):
+    """
+    Deterministic toy embedding that records every text it is asked to embed.
+    """
+
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts):
+        self.embedded += texts
+        return [vector_for(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return vector_for(text).tolist()
+
+
+def make_tree():
+    """
+    Two levels: six leaves in three clusters, whose three summaries form two clusters one level up.
+    """
+    leaves = [f"leaf {i}" for i in range(6)]
+    summaries_1 = ["summary 1-0", "summary 1-1", "summary 1-2"]
+    summaries_2 = ["summary 2-0", "summary 2-1"]
+    level_1 = pd.DataFrame({
+        "text": leaves,
+        "embd": [vector_for(text) for text in leaves],
+        "cluster": [np.array([i // 2]) for i in range(6)],
+    })
+    level_2 = pd.DataFrame({
+        "text": summaries_1,
+        "embd": [vector_for(text) for text in summaries_1],
+        "cluster": [np.array([0]), np.array([0]), np.array([1])],
+    })
+    return {
+        1: (level_1, pd.DataFrame({"summaries": summaries_1, "level": [1] * 3, "cluster": [0, 1, 2]})),
+        2: (level_2, pd.DataFrame({"summaries": summaries_2, "level": [2] * 2, "cluster": [0, 1]})),
+    }
+
+
+class TestTreeRecords(unittest.TestCase):
+    def setUp(self):
+        self.tree = make_tree()
+        self.records = tree_records(self.tree)
+
+    def test_texts_and_metadata(self):
+        texts = [text for text, _, _ in self.records]
+        self.assertEqual(texts, [f"leaf {i}" for i in range(6)] + ["summary 1-0", "summary 1-1", "summary 1-2",
+                                                                    "summary 2-0", "summary 2-1"])
+        metadatas = [metadata for _, _, metadata in self.records]
+        self.assertEqual(metadatas[:6], [{"level": 0}] * 6)
+        self.assertEqual(metadatas[6:], [{"level": 1, "cluster": 0}, {"level": 1, "cluster": 1},
+                                         {"level": 1, "cluster": 2}, {"level": 2, "cluster": 0},
+                                         {"level": 2, "cluster": 1}])
+
+    def test_vectors_reused_from_clustering(self):
+        # Leaves keep their own vectors, level-1 summaries take the "embd" column of level 2.
+        for (text, vector, _), expected in zip(self.records[:6], self.tree[1][0]["embd"]):
+            self.assertIs(vector, expected)
+        for (text, vector, _), expected in zip(self.records[6:9], self.tree[2][0]["embd"]):
+            self.assertIs(vector, expected)
+            np.testing.assert_array_equal(vector, vector_for(text))
+        # Top-level summaries were never embedded.
+        self.assertEqual([vector for _, vector, _ in self.records[9:]], [None, None])
+
+    @unittest.skipUnless(importlib.util.find_spec("torch"), "torch is not installed")
+    def test_index_matches_from_texts(self):
+        from vector_store import faiss_store
+
+        embeddings = CountingEmbeddings()
+        with mock.patch.object(faiss_store, "get_embedding_model", return_value=embeddings), \
+                mock.patch.object(faiss_store, "ANN_INDEX_TYPE", "flat"):
+            store = faiss_store.build_faiss_index_from_embeddings(self.records)
+        # Only the top-level summaries are embedded fresh.
+        self.assertEqual(embeddings.embedded, ["summary 2-0", "summary 2-1"])
+
+        texts = [text for text, _, _ in self.records]
+        reference = FAISS.from_texts(texts, CountingEmbeddings(), metadatas=[m for _, _, m in self.records])
+        self.assertEqual(store.index.ntotal, reference.index.ntotal)
+        np.testing.assert_allclose(store.index.reconstruct_n(0, len(texts)), reference.index.reconstruct_n(0, len(texts)))
+        for query in ("leaf 3", "summary 1-2", "summary 2-1"):
+            found = store.similarity_search_with_score(query, k=4)
+            expected = reference.similarity_search_with_score(query, k=4)
+            self.assertEqual([(d.page_content, d.metadata) for d, _ in found],
+                             [(d.page_content, d.metadata) for d, _ in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+# tests/test_tree_store.py
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from raptor.tree_store import load_tree_store, write_tree_store
+
+
+def level_tables(texts, vectors, memberships, summaries, level, clusters):
+    df_clusters = pd.DataFrame({
+        "text": texts,
+        "embd": list(np.asarray(vectors, dtype=np.float32)),
+        "cluster": [np.asarray(m, dtype=np.int64) for m in memberships],
+    })
+    df_summary = pd.DataFrame({"summaries": summaries, "level": [level] * len(summaries), "cluster": clusters})
+    return df_clusters, df_summary
+
+
+class TestTreeStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        # Four leaves in clusters 7 and 3 (leaf 2 in both); summaries listed in a different order than cluster ids.
+        self.tree = {
+            1: level_tables(["a", "b", "c — ü", "d"], np.eye(4), [[7], [7], [7, 3], [3]], ["S7", "S3"], 1, [7, 3]),
+            2: level_tables(["S7", "S3"], [[1, 1, 0, 0], [0, 0, 1, 1]], [[0], [0]], ["TOP"], 2, [0]),
+        }
+        self.store = write_tree_store(self.tree, self.path, embed_fn=lambda texts: np.full((len(texts), 4), 2.0))
+
+    def test_round_trip(self):
+        store = load_tree_store(self.path)
+        self.assertEqual(len(store), 7)
+        self.assertEqual(store.texts(range(7)), ["a", "b", "c — ü", "d", "S7", "S3", "TOP"])
+        self.assertEqual(store.levels.tolist(), [0, 0, 0, 0, 1, 1, 2])
+        self.assertEqual(store.clusters.tolist(), [-1, -1, -1, -1, 7, 3, 0])
+        self.assertIsInstance(store.embeddings, np.memmap)
+        np.testing.assert_array_equal(store.embeddings[4], [1, 1, 0, 0])
+        np.testing.assert_array_equal(store.embeddings[6], [2, 2, 2, 2])
+        np.testing.assert_allclose(store.norms, np.linalg.norm(store.embeddings, axis=1))
+
+    def test_links(self):
+        store = load_tree_store(self.path)
+        self.assertEqual(store.children(4).tolist(), [0, 1, 2])
+        self.assertEqual(store.children(5).tolist(), [2, 3])
+        self.assertEqual(store.children(6).tolist(), [4, 5])
+        self.assertEqual(store.children(0).tolist(), [])
+        self.assertEqual(store.parents(2).tolist(), [4, 5])
+        self.assertEqual(store.parents(5).tolist(), [6])
+        self.assertEqual(store.roots().tolist(), [6])
+        records = store.records()
+        self.assertEqual(records[5][2], {"level": 1, "node_id": 5, "cluster": 3})
+        self.assertEqual(records[0][2], {"level": 0, "node_id": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+# ann.py
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from config import (
+    ANN_EF_CONSTRUCTION,
+    ANN_EF_SEARCH,
+    ANN_HNSW_M,
+    ANN_INDEX_TYPE,
+    ANN_NLIST,
+    ANN_NPROBE,
+    ANN_PQ_M,
+    ANN_TRAIN_SAMPLE,
+)
+
+ANN_INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# k-means wants at least this many training points per centroid (faiss warns below 39).
+MIN_POINTS_PER_CENTROID = 39
+
+
+def default_nlist(n_vectors: int) -> int:
+    """
+    About 4 * sqrt(n) inverted lists, but never more than the data can train.
+    """
+    return max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def default_pq_m(dim: int) -> int:
+    """
+    Sub-quantizer count for IVF-PQ: the divisor of dim closest to dim / 16 (64 bytes per 1024-d vector).
+    """
+    divisors = [m for m in range(1, dim + 1) if dim % m == 0]
+    return min(divisors, key=lambda m: (abs(m - dim / 16), m))
+
+
+def factory_string(index_type: str, dim: int, n_vectors: int, nlist: Optional[int] = None,
+                   pq_m: Optional[int] = None, hnsw_m: Optional[int] = None) -> str:
+    """
+    faiss.index_factory description of an index type. IVF types fall back to Flat when there are
+    too few vectors to train the coarse quantizer (or, for PQ, its 256-centroid codebooks).
+    """
+    if index_type not in ANN_INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {ANN_INDEX_TYPES}")
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m or ANN_HNSW_M},Flat"
+    if index_type == "flat":
+        return "Flat"
+    nlist = nlist or ANN_NLIST or default_nlist(n_vectors)
+    min_vectors = MIN_POINTS_PER_CENTROID * max(nlist, 256 if index_type == "ivf_pq" else 1)
+    if n_vectors < min_vectors:
+        logging.warning(f"{n_vectors} vectors are too few to train {index_type} (need {min_vectors}); using a flat index")
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    return f"IVF{nlist},PQ{pq_m or ANN_PQ_M or default_pq_m(dim)}"
+
+
+def select_training_sample(vectors: np.ndarray, n_samples: int, seed: int = 0) -> np.ndarray:
+    """
+    Uniform random sample of rows (without replacement, in storage order) to train quantizers on.
+    """
+    if n_samples >= len(vectors):
+        return vectors
+    rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size=n_samples, replace=False))
+    return vectors[rows]
+
+
+def train_ann_index(vectors: np.ndarray, index_type: Optional[str] = None, nlist: Optional[int] = None,
+                    pq_m: Optional[int] = None, hnsw_m: Optional[int] = None,
+                    train_sample: Optional[int] = None) -> faiss.Index:
+    """
+    Creates an empty L2 index of the configured type (ANN_INDEX_TYPE by default) and trains it
+    on a sample of `vectors`. The caller adds the vectors, e.g. through LangChain's FAISS wrapper.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+    description = factory_string(index_type or ANN_INDEX_TYPE, dim, n_vectors, nlist, pq_m, hnsw_m)
+    index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = ANN_EF_CONSTRUCTION
+    if not index.is_trained:
+        ivf = faiss.extract_index_ivf(index)
+        n_samples = train_sample or ANN_TRAIN_SAMPLE or max(64 * ivf.nlist, 256 * MIN_POINTS_PER_CENTROID)
+        sample = select_training_sample(vectors, n_samples)
+        logging.info(f"Training {description} on {len(sample)} of {n_vectors} vectors")
+        start = time.perf_counter()
+        index.train(sample)
+        logging.info(f"Trained in {time.perf_counter() - start:.1f}s")
+    set_search_params(index)
+    return index
+
+
+def build_ann_index(vectors: np.ndarray, index_type: Optional[str] = None, **kwargs) -> faiss.Index:
+    """
+    Trains an index of the configured type and adds all vectors to it.
+    """
+    index = train_ann_index(vectors, index_type, **kwargs)
+    index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """
+    Query-time accuracy/speed knobs: nprobe for IVF indexes, efSearch for HNSW (ANN_NPROBE/ANN_EF_SEARCH by default).
+    Flat indexes have none and are left unchanged.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe or ANN_NPROBE, ivf.nlist)
+    hnsw = faiss.downcast_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW):
+        hnsw.hnsw.efSearch = ef_search or ANN_EF_SEARCH
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """
+    Reads an index file with its vectors / inverted lists memory-mapped instead of copied into RAM,
+    so processes that open the same file share its pages through the OS page cache.
+    The result is read-only: adding vectors to it fails.
+    """
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC)
+    except RuntimeError:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return flat.search(np.ascontiguousarray(queries, dtype=np.float32), k)[1]
+
+
+def recall_at_k(index: faiss.Index, queries: np.ndarray, ground_truth: np.ndarray, k: int) -> float:
+    """
+    Mean share of the exact k nearest neighbours that the index returns among its top k.
+    """
+    found = index.search(np.ascontiguousarray(queries, dtype=np.float32), k)[1]
+    return float(np.mean([len(set(f) & set(t[:k])) / k for f, t in zip(found, ground_truth)]))
+
+
+def recall_report(index: faiss.Index, vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                  nprobes: Sequence[int] = (1, 4, 16, 64), ef_searches: Sequence[int] = (16, 32, 64, 128)) -> List[Dict]:
+    """
+    recall@k against the flat index and query latency for every search setting of the index:
+    each nprobe for IVF, each efSearch for HNSW, a single row for flat indexes.
+    The index is left with its ANN_NPROBE/ANN_EF_SEARCH defaults.
+    """
+    ground_truth = exact_neighbours(vectors, queries, k)
+    if faiss.try_extract_index_ivf(index) is not None:
+        settings = [{"nprobe": n} for n in nprobes]
+    elif isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        settings = [{"ef_search": ef} for ef in ef_searches]
+    else:
+        settings = [{}]
+    rows = []
+    for params in settings:
+        set_search_params(index, **params)
+        start = time.perf_counter()
+        recall = recall_at_k(index, queries, ground_truth, k)
+        elapsed = time.perf_counter() - start
+        rows.append({**params, f"recall@{k}": recall, "ms_per_query": 1000 * elapsed / len(queries)})
+    set_search_params(index)
+    return rows
@@ -0,0 +1,138 @@
+# docstore.py
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents.base import Document
+
+# SQLite maps up to this many bytes of the database file, so its pages live in the OS page cache
+# and are shared by every process that opens the same file.
+MMAP_SIZE = 1 << 40
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    LangChain docstore backed by a SQLite file, read lazily by id instead of unpickled as a whole.
+    Rows are keyed by their position in the FAISS index, so SQLiteIdMap can serve index_to_docstore_id
+    from the same table.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "pos INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        self._conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute("SELECT content, metadata FROM docs WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]), id=search)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        with self._lock:
+            (next_pos,) = self._conn.execute("SELECT COALESCE(MAX(pos) + 1, 0) FROM docs").fetchone()
+            self._conn.executemany(
+                "INSERT INTO docs (pos, id, content, metadata) VALUES (?, ?, ?, ?)",
+                [(next_pos + i, id_, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                 for i, (id_, doc) in enumerate(texts.items())],
+            )
+            self._conn.commit()
+
+    def add_at(self, rows: List[tuple]):
+        """
+        Bulk insert of (pos, id, Document) rows with explicit FAISS positions.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO docs (pos, id, content, metadata) VALUES (?, ?, ?, ?)",
+                [(pos, id_, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                 for pos, id_, doc in rows],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM docs WHERE id = ?", [(id_,) for id_ in ids])
+            self._conn.commit()
+
+    def id_at(self, pos: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM docs WHERE pos = ?", (int(pos),)).fetchone()
+        return row[0] if row else None
+
+    def positions(self) -> List[int]:
+        with self._lock:
+            return [pos for (pos,) in self._conn.execute("SELECT pos FROM docs ORDER BY pos")]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteIdMap(Mapping):
+    """
+    Read-only index_to_docstore_id for LangChain's FAISS wrapper: position -> docstore id, looked up on access.
+    """
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def __getitem__(self, pos: int) -> str:
+        id_ = self.docstore.id_at(pos)
+        if id_ is None:
+            raise KeyError(pos)
+        return id_
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.docstore.positions())
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+
+def write_sqlite_docstore(store, path: str) -> SQLiteDocstore:
+    """
+    Copies the documents of a LangChain FAISS store into a fresh SQLite docstore at path.
+    A store that reads its documents from that very file is refused: the file would be removed under it.
+    """
+    if isinstance(store.docstore, SQLiteDocstore) and os.path.exists(path) \
+            and os.path.samefile(store.docstore.path, path):
+        raise ValueError(f"The store reads its documents from {path}; write the docstore somewhere else")
+    if os.path.exists(path):
+        os.remove(path)
+    docstore = SQLiteDocstore(path)
+    rows = [(pos, id_, store.docstore.search(id_)) for pos, id_ in store.index_to_docstore_id.items()]
+    for start in range(0, len(rows), 10_000):
+        docstore.add_at(rows[start:start + 10_000])
+    return docstore
+
+
+def read_sqlite_docstore(path: str) -> Tuple[InMemoryDocstore, Dict[int, str]]:
+    """
+    Reads a whole SQLite docstore into LangChain's InMemoryDocstore and index_to_docstore_id map,
+    for stores that are added to and saved again.
+    """
+    docstore = SQLiteDocstore(path, read_only=True)
+    try:
+        index_to_id = {pos: docstore.id_at(pos) for pos in docstore.positions()}
+        return InMemoryDocstore({id_: docstore.search(id_) for id_ in index_to_id.values()}), index_to_id
+    finally:
+        docstore.close()
@@ -1,11 +1,21 @@
 # faiss_store.py
-from typing import List, Any
-import logging, sys, time
+from typing import List, Any, Iterable, Optional, Sequence, Tuple
+import logging, os, sys, time
 
+import faiss
+import numpy as np
 import torch
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents.base import Document
+from config import ANN_INDEX_TYPE, FAISS_MMAP, SPARSE_INDEX
 from embeddings.embedder import get_embedding_model
+from vector_store.ann import read_index_mmap, set_search_params, train_ann_index
+from vector_store.docstore import SQLiteDocstore, SQLiteIdMap, read_sqlite_docstore, write_sqlite_docstore
+from vector_store.sparse_index import build_sparse_index, hybrid_search, store_texts
+from vector_store.streaming import build_index_streaming
+
+SQLITE_DOCSTORE = "docstore.sqlite"
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,13 +29,53 @@ logging.basicConfig(
 def get_device():
     return "cuda" if torch.cuda.is_available() else "cpu"
 
-def build_faiss_index(texts: List[str]):
+def _build_ann_store(text_embeddings: List[Tuple[str, Sequence[float]]], embed_model,
+                     metadatas: Optional[List[dict]], index_type: str):
+    """
+    LangChain FAISS store over an index from vector_store.ann, trained on the vectors before they are added.
+    """
+    vectors = np.asarray([vector for _, vector in text_embeddings], dtype=np.float32)
+    index = train_ann_index(vectors, index_type)
+    store = FAISS(embedding_function=embed_model, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+    store.add_embeddings(text_embeddings, metadatas=metadatas)
+    return store
+
+def build_faiss_index(texts: List[str], index_type: Optional[str] = None):
     """
     Builds a FAISS index from the given texts using the HuggingFace embedding model.
+    index_type selects the FAISS index ("flat", "ivf_flat", "ivf_pq", "hnsw"; ANN_INDEX_TYPE by default).
     """
     embed_model = get_embedding_model()
-    # Use the FAISS wrapper from LangChain to build the vector store.
-    return FAISS.from_texts(texts, embed_model)
+    index_type = index_type or ANN_INDEX_TYPE
+    if index_type == "flat":
+        # Use the FAISS wrapper from LangChain to build the vector store.
+        return FAISS.from_texts(texts, embed_model)
+    return _build_ann_store(list(zip(texts, embed_model.embed_documents(texts))), embed_model, None, index_type)
+
+def build_faiss_index_from_embeddings(records: Iterable[Tuple[str, Optional[Sequence[float]], Optional[dict]]],
+                                      index_type: Optional[str] = None):
+    """
+    Builds a FAISS index from (text, vector, metadata) triples, e.g. raptor.tree_builder.tree_records.
+    Only the texts without a precomputed vector (vector is None) are embedded.
+    """
+    embed_model = get_embedding_model()
+    records = list(records)
+    texts = [text for text, _, _ in records]
+    vectors = [vector for _, vector, _ in records]
+    metadatas = [metadata or {} for _, _, metadata in records]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    logging.info(f"Indexing {len(records)} texts, {len(missing)} of them need embedding.")
+    if missing:
+        for i, vector in zip(missing, embed_model.embed_documents([texts[i] for i in missing])):
+            vectors[i] = vector
+    index_type = index_type or ANN_INDEX_TYPE
+    if index_type != "flat":
+        return _build_ann_store(list(zip(texts, vectors)), embed_model, metadatas, index_type)
+    return FAISS.from_embeddings(
+        text_embeddings=list(zip(texts, vectors)),
+        embedding=embed_model,
+        metadatas=metadatas,
+    )
 
 def build_faiss_index_from_docs_chunked(documents: list[Document], batch_size: int = 500, max_retries: int = 3):
     """
@@ -76,29 +126,84 @@ def build_faiss_index_from_docs_chunked(documents: list[Document], batch_size: i
 
 
 
-def build_faiss_index_from_docs(docs: list[Document]):
+def build_faiss_index_from_docs(docs: list[Document], index_type: Optional[str] = None):
     """
     Builds a FAISS index from the given texts using the HuggingFace embedding model.
     """
     embed_model = get_embedding_model()
-    # Use the FAISS wrapper from LangChain to build the vector store.
-    return FAISS.from_documents(docs, embed_model)
+    index_type = index_type or ANN_INDEX_TYPE
+    if index_type == "flat":
+        # Use the FAISS wrapper from LangChain to build the vector store.
+        return FAISS.from_documents(docs, embed_model)
+    texts = [doc.page_content for doc in docs]
+    return _build_ann_store(list(zip(texts, embed_model.embed_documents(texts))), embed_model,
+                            [doc.metadata for doc in docs], index_type)
+
+def build_faiss_index_streaming(documents: Iterable[Document], path: str, index_type: Optional[str] = None,
+                                batch_size: Optional[int] = None) -> int:
+    """
+    Embeds and indexes a stream of Documents in batches, writing the index and its SQLite docstore
+    to path as it goes (no index.pkl: load it with load_faiss_index). Returns the number indexed;
+    an empty or failing stream raises and leaves the index previously at path as it was.
+    """
+    embed_model = get_embedding_model()
+    return build_index_streaming(documents, path, embed_model.embed_documents, index_type, batch_size)
 
 def save_faiss_index(index, path: str):
     """
     Saves the FAISS index locally.
+    Besides LangChain's index.faiss / index.pkl, the documents are written to a SQLite docstore
+    that load_faiss_index reads lazily, and (with SPARSE_INDEX) indexed for BM25 (load_sparse_index).
+    Stores loaded with read_only=True cannot be saved: load them writable to change them.
     """
+    if isinstance(index.docstore, SQLiteDocstore):
+        raise ValueError("A read-only store (load_faiss_index(read_only=True)) cannot be saved")
     index.save_local(path)
+    write_sqlite_docstore(index, os.path.join(path, SQLITE_DOCSTORE)).close()
+    if SPARSE_INDEX:
+        build_sparse_index(store_texts(index)).save(path)
 
-def load_faiss_index(path: str):
+def load_faiss_index(path: str, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                     read_only: bool = False, mmap: Optional[bool] = None):
     """
     Loads a FAISS index from the specified local directory.
+    By default the store is writable: the index and all documents are read into RAM (from index.pkl, or
+    from the SQLite docstore of streamed builds), so it can be added to and saved with save_faiss_index.
+    With read_only, mmap (FAISS_MMAP by default) and a SQLite docstore next to the index, the index is
+    memory-mapped and documents are fetched by id on demand, so startup does not depend on the index size
+    and worker processes share the pages; such a store can only be searched.
+    IVF and HNSW indexes get their query-time nprobe / efSearch (ANN_NPROBE / ANN_EF_SEARCH by default).
     """
     embed_model = get_embedding_model()
-    return FAISS.load_local(path, embed_model, allow_dangerous_deserialization=True)
-
-def query_faiss_index(index, query: str, k: int = 5):
+    mmap = read_only and (FAISS_MMAP if mmap is None else mmap)
+    sqlite_path = os.path.join(path, SQLITE_DOCSTORE)
+    index_path = os.path.join(path, "index.faiss")
+    pickled = os.path.exists(os.path.join(path, "index.pkl"))
+    if os.path.exists(sqlite_path) and mmap:
+        docstore = SQLiteDocstore(sqlite_path, read_only=True)
+        store = FAISS(
+            embedding_function=embed_model,
+            index=read_index_mmap(index_path),
+            docstore=docstore,
+            index_to_docstore_id=SQLiteIdMap(docstore),
+        )
+    elif os.path.exists(sqlite_path) and not pickled:
+        docstore, index_to_docstore_id = read_sqlite_docstore(sqlite_path)
+        store = FAISS(embedding_function=embed_model, index=faiss.read_index(index_path),
+                      docstore=docstore, index_to_docstore_id=index_to_docstore_id)
+    else:
+        if mmap:
+            logging.info(f"No {SQLITE_DOCSTORE} in {path}; loading the whole index (save it again to enable mmap loading)")
+        store = FAISS.load_local(path, embed_model, allow_dangerous_deserialization=True)
+    set_search_params(store.index, nprobe, ef_search)
+    return store
+
+def query_faiss_index(index, query: str, k: int = 5, sparse_index=None):
     """
     Runs a similarity search on the FAISS index.
+    Given the index's sparse index (vector_store.sparse_index.load_sparse_index), the search is hybrid:
+    dense and BM25 scores are fused, so exact identifiers and terms are found as well.
     """
+    if sparse_index is not None:
+        return [doc for doc, _ in hybrid_search(index, sparse_index, query, k)]
     return index.similarity_search(query, k=k)
@@ -0,0 +1,124 @@
+# multi_index.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents.base import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from config import MULTI_INDEX_RRF_K, MULTI_INDEX_TIMEOUT_MS
+
+
+def weighted_rrf(rankings: Sequence[Sequence[str]], weights: Sequence[float], rrf_k: int = MULTI_INDEX_RRF_K,
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted reciprocal-rank fusion: every key scores sum(weight / (rrf_k + rank)) over the rankings it
+    appears in (rank 1 = best). Returns (keys, scores), best first; ties keep first-seen order.
+    """
+    if not any(len(ranking) for ranking in rankings):
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+    keys = np.concatenate([np.asarray(ranking, dtype=object) for ranking in rankings])
+    ranks = np.concatenate([np.arange(1, len(ranking) + 1) for ranking in rankings])
+    contributions = np.repeat(np.asarray(weights, dtype=np.float64), [len(ranking) for ranking in rankings]) / (rrf_k + ranks)
+    unique, first_seen, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    scores = np.bincount(inverse.ravel(), weights=contributions, minlength=len(unique))
+    order = np.lexsort((first_seen, -scores))
+    return unique[order], scores[order]
+
+
+class MultiIndexSearcher:
+    """
+    Fan-out search over several LangChain FAISS stores. The query is embedded once per embedding model
+    (stores loaded through embeddings.embedder share the model object); all stores are then searched
+    concurrently on a thread pool (FAISS releases the GIL) and the rankings are fused with weighted RRF.
+    A store that has not answered within its timeout is left out of the fusion for that query instead
+    of holding it up.
+    """
+
+    def __init__(self, stores: Dict[str, Any], weights: Optional[Dict[str, float]] = None,
+                 timeouts_ms: Optional[Dict[str, float]] = None, rrf_k: int = MULTI_INDEX_RRF_K,
+                 id_key: Optional[str] = None):
+        if not stores:
+            raise ValueError("No indexes to search")
+        self.stores = stores
+        self.weights = {name: (weights or {}).get(name, 1.0) for name in stores}
+        self.timeouts = {name: (timeouts_ms or {}).get(name, MULTI_INDEX_TIMEOUT_MS) / 1000 for name in stores}
+        self.rrf_k = rrf_k
+        # Documents are merged across stores by this metadata key, or by content (as EnsembleRetriever does).
+        self.id_key = id_key
+        self._executor = ThreadPoolExecutor(max_workers=len(stores), thread_name_prefix="multi-index")
+        groups: Dict[int, List[str]] = {}
+        for name, store in stores.items():
+            groups.setdefault(id(store.embedding_function), []).append(name)
+        self.groups = list(groups.values())
+
+    def _embed(self, store, query: str) -> np.ndarray:
+        embed = store.embedding_function
+        vector = embed.embed_query(query) if hasattr(embed, "embed_query") else embed(query)
+        return np.asarray(vector, dtype=np.float32).reshape(1, -1)
+
+    def _search(self, name: str, vector: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        store = self.stores[name]
+        distances, positions = store.index.search(vector, k)
+        hits = []
+        for distance, position in zip(distances[0], positions[0]):
+            if position >= 0:
+                hits.append((store.docstore.search(store.index_to_docstore_id[int(position)]), float(distance)))
+        return hits
+
+    def _key(self, doc: Document) -> str:
+        return str(doc.metadata.get(self.id_key)) if self.id_key else doc.page_content
+
+    def search_with_scores(self, query: str, k: int = 5, fetch_k: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """
+        The k best documents with their fused scores; every store contributes its fetch_k (default k) nearest.
+        """
+        fetch_k = fetch_k or k
+        start = time.monotonic()
+        futures = {}
+        for names in self.groups:
+            vector = self._embed(self.stores[names[0]], query)
+            for name in names:
+                futures[name] = self._executor.submit(self._search, name, vector, fetch_k)
+
+        rankings, weights, docs = [], [], {}
+        for name, future in futures.items():
+            try:
+                hits = future.result(timeout=max(0.0, start + self.timeouts[name] - time.monotonic()))
+            except FutureTimeoutError:
+                logging.warning(f"Index {name} did not answer within {self.timeouts[name] * 1000:.0f} ms; skipped")
+                continue
+            except Exception:
+                logging.exception(f"Search in index {name} failed; skipped")
+                continue
+            keys = [self._key(doc) for doc, _ in hits]
+            for key, (doc, _) in zip(keys, hits):
+                docs.setdefault(key, doc)
+            rankings.append(keys)
+            weights.append(self.weights[name])
+        keys, scores = weighted_rrf(rankings, weights, self.rrf_k)
+        return [(docs[key], float(score)) for key, score in zip(keys[:k], scores[:k])]
+
+    def search(self, query: str, k: int = 5, fetch_k: Optional[int] = None) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query, k, fetch_k)]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class MultiIndexRetriever(BaseRetriever):
+    """
+    LangChain retriever over a MultiIndexSearcher, a drop-in replacement for EnsembleRetriever.
+    """
+
+    searcher: Any
+    k: int = 5
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.searcher.search(query, self.k)
@@ -0,0 +1,268 @@
+# sparse_index.py
+import json
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents.base import Document
+
+from config import BM25_B, BM25_K1, HYBRID_SPARSE_WEIGHT
+
+SPARSE_INDEX_FILE = "sparse_index.npz"
+SPARSE_INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r"\w+")
+CYRILLIC_RE = re.compile(r"[а-я]")
+LATIN_RE = re.compile(r"^[a-z]+$")
+
+
+@lru_cache(maxsize=None)
+def _stemmers():
+    import snowballstemmer
+    return snowballstemmer.stemmer("russian"), snowballstemmer.stemmer("english")
+
+
+@lru_cache(maxsize=200_000)
+def stem(token: str) -> str:
+    """
+    Snowball stem of a lowercased token: Russian for Cyrillic words, English for Latin ones.
+    Numbers and mixed identifiers (ids, task numbers) are kept as they are.
+    """
+    russian, english = _stemmers()
+    if token.isdigit():
+        return token
+    if CYRILLIC_RE.search(token):
+        return russian.stemWord(token)
+    if LATIN_RE.match(token):
+        return english.stemWord(token)
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+def get_analyzer(name: Optional[str] = None) -> Tuple[str, Callable[[str], List[str]]]:
+    """
+    (name, text -> terms). "snowball" stems with snowballstemmer; "plain" only lowercases and splits.
+    By default "snowball" when snowballstemmer is installed. An index is always queried with the analyzer
+    it was built with.
+    """
+    if name is None:
+        try:
+            _stemmers()
+            name = "snowball"
+        except ImportError:
+            logging.warning("snowballstemmer is not installed; the sparse index is built without stemming")
+            name = "plain"
+    if name == "snowball":
+        _stemmers()
+        return name, lambda text: [stem(token) for token in tokenize(text)]
+    if name == "plain":
+        return name, tokenize
+    raise ValueError(f"Unknown analyzer {name!r}")
+
+
+class SparseIndex:
+    """
+    BM25 inverted index whose document numbers are positions in the FAISS index it was built with.
+    Postings are kept term by term in flat arrays (doc numbers and precomputed BM25 impacts, with offsets
+    per term), so a query only slices the postings of its terms and sums them with numpy.
+    """
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, analyzer: str, k1: float = BM25_K1, b: float = BM25_B):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets.astype(np.int64)
+        self.doc_ids = doc_ids.astype(np.uint32)
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths.astype(np.uint32)
+        self.analyzer_name, self.analyze = get_analyzer(analyzer)
+        self.k1, self.b = k1, b
+        self.impacts = self._impacts()
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    def _impacts(self) -> np.ndarray:
+        df = np.diff(self.offsets)
+        idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+        tf = self.tfs.astype(np.float32)
+        lengths = self.doc_lengths[self.doc_ids].astype(np.float32)
+        avg_length = max(float(self.doc_lengths.mean()) if self.n_docs else 0.0, 1.0)
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        return (np.repeat(idf, df).astype(np.float32) * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def search(self, query: str, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (positions, BM25 scores) of the k best documents, best first.
+        """
+        counts = Counter(self.analyze(query))
+        ids, weights = [], []
+        for term, count in counts.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                ids.append(self.doc_ids[start:end])
+                weights.append(self.impacts[start:end] * count if count > 1 else self.impacts[start:end])
+        if not ids:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        n_postings = sum(len(postings) for postings in ids)
+        if len(ids) == 1:
+            positions, scores = ids[0], weights[0]
+        elif n_postings * 8 < self.n_docs:
+            # Few postings: merge them by sorting.
+            positions, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(weights)).astype(np.float32)
+        else:
+            # Long postings (frequent words): accumulate into one slot per document instead.
+            scores = np.bincount(np.concatenate(ids), weights=np.concatenate(weights), minlength=self.n_docs)
+            positions = np.arange(len(scores))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            positions, scores = positions[top], scores[top]
+        matched = scores > 0
+        positions, scores = positions[matched], scores[matched].astype(np.float32)
+        order = np.lexsort((positions, -scores))
+        return positions[order].astype(np.int64), scores[order]
+
+    def save(self, path: str):
+        """
+        Writes the index to path/SPARSE_INDEX_FILE. Doc numbers are stored as gaps from the previous
+        posting of the same term in the narrowest integer type that holds them, and the file is deflated.
+        """
+        starts = self.offsets[:-1][np.diff(self.offsets) > 0]
+        gaps = np.diff(self.doc_ids.astype(np.int64), prepend=0)
+        gaps[starts] = self.doc_ids[starts]
+        meta = {"version": SPARSE_INDEX_VERSION, "analyzer": self.analyzer_name}
+        tmp_path = os.path.join(path, f"{SPARSE_INDEX_FILE}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+                terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+                offsets=self.offsets,
+                gaps=gaps.astype(np.min_scalar_type(int(gaps.max()) if len(gaps) else 0)),
+                tfs=self.tfs,
+                doc_lengths=self.doc_lengths,
+            )
+        os.replace(tmp_path, os.path.join(path, SPARSE_INDEX_FILE))
+        logging.info(f"Saved sparse index ({self.n_docs} documents, {len(self.terms)} terms, "
+                     f"{len(self.doc_ids)} postings) to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "SparseIndex":
+        with np.load(os.path.join(path, SPARSE_INDEX_FILE)) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != SPARSE_INDEX_VERSION:
+                raise ValueError(f"Unsupported sparse index version {meta.get('version')} in {path}")
+            text = data["terms"].tobytes().decode("utf-8")
+            offsets, gaps = data["offsets"], data["gaps"].astype(np.int64)
+            tfs, doc_lengths = data["tfs"], data["doc_lengths"]
+        # Undo the gap encoding: a running sum restarted at the first posting of every term.
+        df = np.diff(offsets)
+        totals = np.cumsum(gaps)
+        bases = totals[offsets[:-1][df > 0]] - gaps[offsets[:-1][df > 0]]
+        doc_ids = totals - np.repeat(bases, df[df > 0])
+        return cls(text.split("\n") if text else [], offsets, doc_ids, tfs, doc_lengths, meta["analyzer"])
+
+
+class SparseIndexBuilder:
+    """
+    Accumulates the texts of an index in position order and builds its SparseIndex.
+    """
+
+    def __init__(self, analyzer: Optional[str] = None):
+        self.analyzer_name, self.analyze = get_analyzer(analyzer)
+        self.vocabulary: Dict[str, int] = {}
+        self._postings: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.doc_lengths: List[int] = []
+
+    def add(self, texts: Iterable[str]):
+        term_ids, doc_ids, tfs = [], [], []
+        for text in texts:
+            doc = len(self.doc_lengths)
+            terms = self.analyze(text)
+            self.doc_lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc)
+                tfs.append(min(count, np.iinfo(np.uint16).max))
+        self._postings.append((np.asarray(term_ids, dtype=np.int64), np.asarray(doc_ids, dtype=np.uint32),
+                               np.asarray(tfs, dtype=np.uint16)))
+
+    def build(self) -> SparseIndex:
+        term_ids = np.concatenate([p[0] for p in self._postings]) if self._postings else np.array([], np.int64)
+        doc_ids = np.concatenate([p[1] for p in self._postings]) if self._postings else np.array([], np.uint32)
+        tfs = np.concatenate([p[2] for p in self._postings]) if self._postings else np.array([], np.uint16)
+        order = np.lexsort((doc_ids, term_ids))
+        offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=offsets[1:])
+        if len(tfs) and tfs.max() < 256:
+            tfs = tfs.astype(np.uint8)
+        return SparseIndex(list(self.vocabulary), offsets, doc_ids[order], tfs[order],
+                           np.asarray(self.doc_lengths, dtype=np.uint32), self.analyzer_name)
+
+
+def build_sparse_index(texts: Iterable[str], analyzer: Optional[str] = None) -> SparseIndex:
+    builder = SparseIndexBuilder(analyzer)
+    builder.add(texts)
+    return builder.build()
+
+
+def store_texts(store) -> Iterable[str]:
+    """
+    The texts of a LangChain FAISS store in index position order.
+    """
+    for position in range(store.index.ntotal):
+        doc = store.docstore.search(store.index_to_docstore_id[position])
+        yield doc.page_content if isinstance(doc, Document) else ""
+
+
+def load_sparse_index(path: str) -> Optional[SparseIndex]:
+    """
+    The sparse index saved next to the FAISS files in path, or None if it was built without one.
+    """
+    if not os.path.exists(os.path.join(path, SPARSE_INDEX_FILE)):
+        return None
+    return SparseIndex.load(path)
+
+
+def _normalize(scores: np.ndarray) -> np.ndarray:
+    low, high = float(scores.min()), float(scores.max())
+    return (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+
+def hybrid_search(store, sparse: SparseIndex, query: str, k: int = 5, fetch_k: Optional[int] = None,
+                  sparse_weight: float = HYBRID_SPARSE_WEIGHT) -> List[Tuple[Document, float]]:
+    """
+    Fuses dense (FAISS) and BM25 scores: both candidate lists (fetch_k each, 4 * k by default) are scaled to
+    [0, 1] (dense by min-max, BM25 by its maximum) and summed with weights 1 - sparse_weight and
+    sparse_weight; a document missing from one list gets 0 there. Returns (document, score), best first.
+    """
+    fetch_k = fetch_k or 4 * k
+    fused: Dict[int, float] = {}
+    if sparse_weight < 1:
+        vector = np.asarray(store.embedding_function.embed_query(query), dtype=np.float32).reshape(1, -1)
+        distances, positions = store.index.search(vector, fetch_k)
+        found = positions[0] >= 0
+        positions, similarities = positions[0][found], distances[0][found]
+        if store.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            similarities = -similarities
+        if len(positions):
+            for position, score in zip(positions, _normalize(similarities)):
+                fused[int(position)] = (1 - sparse_weight) * float(score)
+    if sparse_weight > 0:
+        positions, scores = sparse.search(query, fetch_k)
+        if len(positions):
+            for position, score in zip(positions, scores / scores[0]):
+                fused[int(position)] = fused.get(int(position), 0.0) + sparse_weight * float(score)
+    ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:k]
+    return [(store.docstore.search(store.index_to_docstore_id[position]), score) for position, score in ranked]
@@ -0,0 +1,214 @@
+# streaming.py
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_core.documents.base import Document
+
+from config import ANN_INDEX_TYPE, SPARSE_INDEX, STREAM_BATCH_SIZE, STREAM_PREFETCH_BATCHES, STREAM_TRAIN_SIZE
+from vector_store.ann import train_ann_index
+from vector_store.docstore import SQLiteDocstore
+from vector_store.sparse_index import SPARSE_INDEX_FILE, SparseIndexBuilder
+
+INDEX_FILE = "index.faiss"
+SQLITE_DOCSTORE = "docstore.sqlite"
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """
+    Groups an iterable into lists of batch_size items (the last one may be shorter).
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def prefetch(items: Iterable, max_items: int) -> Iterator:
+    """
+    Pulls items on a background thread, at most max_items ahead of the consumer: the producer blocks
+    while the queue is full, so a slow consumer (the embedder) throttles loading instead of letting it
+    pile up in memory. Exceptions of the producer are re-raised in the consumer.
+    """
+    done = object()
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, max_items))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # The consumer stopped early or failed: let the producer exit at its next put.
+        stop.set()
+
+
+class StreamingIndexWriter:
+    """
+    Builds a FAISS index and its SQLite docstore at path from batches of Documents, holding only the
+    current batch (and, until an IVF index is trained, the first train_size vectors) besides the index.
+    With sparse, the BM25 index (vector_store.sparse_index) is built from the same batches and saved with it.
+    Everything is written to a temporary sibling directory and moved over the files at path only when
+    close() succeeds, so a failed or abandoned build leaves the previous index untouched.
+    The result is read by vector_store.faiss_store.load_faiss_index.
+    """
+
+    def __init__(self, path: str, embed_fn: Callable[[List[str]], Sequence[Sequence[float]]],
+                 index_type: Optional[str] = None, train_size: Optional[int] = None,
+                 sparse: Optional[bool] = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        parent, name = os.path.split(os.path.abspath(path))
+        self.build_dir = tempfile.mkdtemp(prefix=f".{name}.building-", dir=parent)
+        self.embed_fn = embed_fn
+        self.index_type = index_type or ANN_INDEX_TYPE
+        self.train_size = train_size or STREAM_TRAIN_SIZE
+        self.index: Optional[faiss.Index] = None
+        self.docstore = SQLiteDocstore(os.path.join(self.build_dir, SQLITE_DOCSTORE))
+        self._pending: List[tuple] = []  # (vectors, documents) waiting for the index to be trained
+        self._pending_count = 0
+        self.sparse = SparseIndexBuilder() if (SPARSE_INDEX if sparse is None else sparse) else None
+
+    def add(self, documents: List[Document]):
+        texts = [doc.page_content for doc in documents]
+        vectors = np.asarray(self.embed_fn(texts), dtype=np.float32).reshape(len(texts), -1)
+        if self.index is None:
+            self._pending.append((vectors, documents))
+            self._pending_count += len(documents)
+            # Flat and HNSW need no training: start adding as soon as the dimension is known.
+            if self.index_type in ("flat", "hnsw") or self._pending_count >= self.train_size:
+                self._train()
+            return
+        self._add(vectors, documents)
+
+    def _train(self):
+        vectors = np.concatenate([v for v, _ in self._pending])
+        self.index = train_ann_index(vectors, self.index_type, train_sample=len(vectors))
+        pending, self._pending, self._pending_count = self._pending, [], 0
+        for vectors, documents in pending:
+            self._add(vectors, documents)
+
+    def _add(self, vectors: np.ndarray, documents: List[Document]):
+        start = self.index.ntotal
+        self.index.add(np.ascontiguousarray(vectors))
+        if self.sparse is not None:
+            self.sparse.add(doc.page_content for doc in documents)
+        self.docstore.add_at([
+            (start + i, doc.id or uuid.uuid4().hex, doc) for i, doc in enumerate(documents)
+        ])
+
+    @property
+    def empty(self) -> bool:
+        return self.index is None and not self._pending
+
+    def close(self) -> int:
+        """
+        Trains the index if the stream ended before train_size vectors, writes it and returns its size.
+        Without any document the dimension is unknown: nothing is written and ValueError is raised.
+        """
+        if self.empty:
+            self.discard()
+            raise ValueError(f"No documents to index in {self.path}")
+        try:
+            if self.index is None:
+                self._train()
+            faiss.write_index(self.index, os.path.join(self.build_dir, INDEX_FILE))
+            if self.sparse is not None:
+                self.sparse.build().save(self.build_dir)
+            self.docstore.close()
+            self._publish()
+        except BaseException:
+            self.discard()
+            raise
+        return self.index.ntotal
+
+    def _publish(self):
+        """
+        Moves the finished files over those at path; the index file goes last, so a reader never finds
+        a new index.faiss next to the previous docstore. A stale index.pkl (whose pickled docstore
+        load_faiss_index would prefer) and a sparse index this build did not produce are removed.
+        path may hold other state (tree, manifests), so files are replaced one by one rather than the directory.
+        """
+        built = [name for name in (SQLITE_DOCSTORE, SPARSE_INDEX_FILE) if os.path.exists(os.path.join(self.build_dir, name))]
+        for name in ("index.pkl", SPARSE_INDEX_FILE):
+            if name not in built and os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        for name in built + [INDEX_FILE]:
+            os.replace(os.path.join(self.build_dir, name), os.path.join(self.path, name))
+        shutil.rmtree(self.build_dir, ignore_errors=True)
+
+    def discard(self):
+        """
+        Closes the writer without writing anything to path, removing its temporary directory.
+        """
+        self.docstore.close()
+        shutil.rmtree(self.build_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+def build_index_streaming(documents: Iterable[Document], path: str,
+                          embed_fn: Callable[[List[str]], Sequence[Sequence[float]]],
+                          index_type: Optional[str] = None, batch_size: Optional[int] = None,
+                          prefetch_batches: Optional[int] = None, train_size: Optional[int] = None) -> int:
+    """
+    Indexes a stream of Documents (e.g. chunks from ingestion.chunker.iter_chunks) in fixed-size batches.
+    Up to prefetch_batches batches are produced ahead on a background thread while the current one is
+    embedded, so loading and embedding overlap and memory stays bounded whatever the corpus size.
+    Returns the number of indexed documents. An empty or failing stream raises and leaves the index
+    previously at path as it was.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    prefetch_batches = prefetch_batches or STREAM_PREFETCH_BATCHES
+    start = time.perf_counter()
+    n_documents = 0
+    with StreamingIndexWriter(path, embed_fn, index_type, train_size) as writer:
+        for batch in prefetch(batched(documents, batch_size), prefetch_batches):
+            writer.add(batch)
+            n_documents += len(batch)
+            elapsed = time.perf_counter() - start
+            logging.info(f"Indexed {n_documents} documents ({n_documents / max(elapsed, 1e-9):.1f} docs/s)")
+    return n_documents